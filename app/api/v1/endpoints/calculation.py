@@ -4,15 +4,71 @@ from __future__ import annotations
 API Endpoints untuk Perhitungan Warisan
 """
 
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
 from typing import Dict, Any, List
-from app.schemas.calculation import CalculationInput, CalculationResult
+import asyncio
+import time
+from app.schemas.calculation import (
+    BatchCalculationInput, BatchCalculationResult, CalculationInput, CalculationResult
+)
 from app.schemas.response import APIResponse, ErrorResponse
 from app.core.calculator import calculate_inheritance
+from app.core.outcome_table import get_outcome_table
+from app.core.batch import (
+    calculate_batch, calculate_ndjson_chunk, iter_ndjson_lines, iter_spooled_chunks,
+    merge_batch_results, split_batch, spool_chunks
+)
+from app.core.executor import ExecutorBusyError, get_executor
+from app.core.single_flight import calculation_flight, calculation_key
+from app.config import settings
+from app.utils.constants import NoteVerbosity
 
 router = APIRouter()
 
 
+def executor_busy(e: ExecutorBusyError) -> HTTPException:
+    """HTTPException 503 + Retry-After untuk antrian executor yang penuh"""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=str(e),
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
+
+async def run_calculation(fn, *args, wait: bool = False):
+    """
+    Jalankan perhitungan sinkron di executor (tidak memblokir event loop)
+    
+    Raises:
+        HTTPException 503 + Retry-After jika antrian executor penuh
+    """
+    try:
+        return await get_executor().run(fn, *args, wait=wait)
+    except ExecutorBusyError as e:
+        raise executor_busy(e)
+
+
+async def run_batch_on_executor(items: List[CalculationInput]) -> BatchCalculationResult:
+    """
+    Bagi batch ke worker executor process (tanpa process pool kedua)
+    
+    Bentuk ahli waris yang sama selalu berada di bagian yang sama, lalu hasil
+    setiap bagian digabung kembali sesuai urutan input.
+    
+    Raises:
+        HTTPException 503 + Retry-After jika antrian executor penuh
+    """
+    executor = get_executor()
+    started = time.perf_counter()
+    parts = split_batch(items, min(executor.workers, executor.max_in_flight))
+    results = await asyncio.gather(*(
+        run_calculation(calculate_batch, [items[index] for index in part]) for part in parts
+    ))
+    duration_ms = (time.perf_counter() - started) * 1000
+    return merge_batch_results(len(items), list(zip(parts, results)), duration_ms)
+
+
 @router.post(
     "/calculate",
     response_model=APIResponse[CalculationResult],
@@ -47,8 +103,19 @@ async def calculate_faraid(calculation_input: CalculationInput) -> APIResponse[C
                 detail="Tirkah harus lebih besar dari 0"
             )
         
-        # Hitung
-        result = calculate_inheritance(calculation_input)
+        # Hitung (lookup outcome table dulu jika dikonfigurasi; tabel tidak
+        # menyimpan catatan, jadi hanya untuk verbosity "none")
+        result = None
+        if calculation_input.notes_verbosity == NoteVerbosity.NONE:
+            table = get_outcome_table(settings.OUTCOME_TABLE_PATH)
+            if table is not None:
+                result = table.lookup(calculation_input)
+        if result is None:
+            # Request identik yang sedang berjalan memakai satu perhitungan
+            result = await calculation_flight.do(
+                calculation_key(calculation_input),
+                lambda: run_calculation(calculate_inheritance, calculation_input)
+            )
         
         return APIResponse(
             status="success",
@@ -65,6 +132,95 @@ async def calculate_faraid(calculation_input: CalculationInput) -> APIResponse[C
         )
 
 
+@router.post(
+    "/calculate/batch",
+    response_model=APIResponse[BatchCalculationResult],
+    status_code=status.HTTP_200_OK,
+    summary="Hitung Warisan (Batch)",
+    description="Hitung banyak kasus warisan dalam satu request"
+)
+async def calculate_faraid_batch(batch_input: BatchCalculationInput) -> APIResponse[BatchCalculationResult]:
+    """
+    Hitung banyak kasus warisan sekaligus
+    
+    **Input:**
+    - items: List CalculationInput (maksimal BATCH_MAX_ITEMS)
+    
+    **Output:**
+    - Hasil per item sesuai urutan input (item gagal berisi pesan error)
+    - Jumlah item yang di-deduplikasi dan durasi batch
+    """
+    if len(batch_input.items) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Maksimal {settings.BATCH_MAX_ITEMS} item per batch"
+        )
+    
+    try:
+        if get_executor().kind == "process":
+            result = await run_batch_on_executor(batch_input.items)
+        else:
+            result = await run_calculation(
+                calculate_batch, batch_input.items, settings.BATCH_WORKERS
+            )
+        
+        return APIResponse(
+            status="success",
+            message="Perhitungan batch selesai",
+            data=result
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Terjadi kesalahan dalam perhitungan batch: {str(e)}"
+        )
+
+
+@router.post(
+    "/calculate/batch/stream",
+    response_class=StreamingResponse,
+    summary="Hitung Warisan (Batch Streaming NDJSON)",
+    description="Body NDJSON berisi CalculationInput per baris, hasil di-stream per baris"
+)
+async def calculate_faraid_batch_stream(request: Request) -> StreamingResponse:
+    """
+    Hitung kasus warisan dalam jumlah sangat besar secara streaming
+    
+    **Input:** body `application/x-ndjson`, satu CalculationInput per baris
+    
+    **Output:** `application/x-ndjson`, satu BatchItemResult per baris sesuai
+    urutan input. Body ditampung dulu (di memori sampai
+    BATCH_STREAM_SPOOL_BYTES, selebihnya di file sementara), lalu diproses per
+    potongan (BATCH_STREAM_CHUNK) dan setiap potongan langsung dikirim.
+    Client yang memutus koneksi menghentikan perhitungan potongan berikutnya.
+    """
+    chunk_size = max(settings.BATCH_STREAM_CHUNK, 1)
+    # Body harus dibaca sebelum streaming: selama response dikirim,
+    # StreamingResponse memakai receive() untuk mendeteksi disconnect
+    spool = await spool_chunks(request.stream(), settings.BATCH_STREAM_SPOOL_BYTES)
+    
+    async def generate():
+        try:
+            lines: List[bytes] = []
+            index = 0
+            async for line in iter_ndjson_lines(iter_spooled_chunks(spool),
+                                                settings.BATCH_STREAM_MAX_LINE_BYTES):
+                lines.append(line)
+                if len(lines) >= chunk_size:
+                    yield await run_calculation(calculate_ndjson_chunk, lines, index, wait=True)
+                    index += len(lines)
+                    lines = []
+            if lines:
+                yield await run_calculation(calculate_ndjson_chunk, lines, index, wait=True)
+        finally:
+            spool.close()
+    
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
 @router.post(
     "/calculate/haml",
     response_model=APIResponse[Dict[str, CalculationResult]],
@@ -75,13 +231,16 @@ async def calculate_haml_case(calculation_input: CalculationInput) -> APIRespons
     """
     Hitung warisan dengan kasus Haml (janin dalam kandungan)
     
-    Mengembalikan 2 skenario: bayi laki-laki dan bayi perempuan
+    Mengembalikan semua skenario kelahiran (tidak lahir hidup, bayi
+    laki-laki/perempuan, kembar sampai HAML_MAX_FETUSES janin) ditambah
+    ringkasan "mauquf" (bagian yang dibayar sekarang dan yang ditahan)
     """
     try:
         from app.special_cases import calculate_haml
         
         notes = []
-        results = calculate_haml(
+        results = await run_calculation(
+            calculate_haml,
             calculation_input.heirs,
             calculation_input.tirkah,
             notes
@@ -93,6 +252,8 @@ async def calculate_haml_case(calculation_input: CalculationInput) -> APIRespons
             data=results
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -108,18 +269,21 @@ async def calculate_haml_case(calculation_input: CalculationInput) -> APIRespons
 )
 async def calculate_khuntsa_case(
     calculation_input: CalculationInput,
-    khuntsa_heir_id: int
+    khuntsa_heir_id: List[int] = Query(..., description="ID ahli waris khuntsa (boleh diulang)")
 ) -> APIResponse[Dict[str, CalculationResult]]:
     """
     Hitung warisan dengan kasus Khuntsa
     
-    Mengembalikan 2 skenario: dianggap laki-laki dan dianggap perempuan
+    Mengembalikan 2^k skenario (setiap khuntsa dianggap laki-laki dan
+    perempuan) ditambah "penyelesaian": khuntsa mendapat bagian terkecil,
+    ahli waris lain bagian terbesar, sisanya ditahan
     """
     try:
         from app.special_cases import calculate_khuntsa
         
         notes = []
-        results = calculate_khuntsa(
+        results = await run_calculation(
+            calculate_khuntsa,
             calculation_input.heirs,
             calculation_input.tirkah,
             khuntsa_heir_id,
@@ -132,12 +296,73 @@ async def calculate_khuntsa_case(
             data=results
         )
         
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Terjadi kesalahan: {str(e)}"
+        )
+
+@router.post(
+    "/calculate/gharqa",
+    response_model=APIResponse[Dict[str, CalculationResult]],
+    summary="Hitung Warisan Gharqa (Meninggal Bersamaan)",
+    description="Perhitungan untuk beberapa orang yang meninggal bersamaan dan tidak saling mewarisi"
+)
+async def calculate_gharqa_case(
+    deceased_list: List[Dict[str, Any]]
+) -> APIResponse[Dict[str, CalculationResult]]:
+    """
+    Hitung warisan Gharqa/Hadm (meninggal bersamaan)
+    
+    Harta setiap pewaris dihitung paralel di executor; catatan perhitungan
+    ada di hasil masing-masing pewaris.
+    
+    **Input Format:**
+    ```
+    [
+        {
+            "name": "Ahmad",
+            "tirkah": 100000000,
+            "heirs": [{"id": 4, "quantity": 1}, {"id": 1, "quantity": 1}]
+        },
+        {
+            "name": "Fatimah",
+            "tirkah": 50000000,
+            "heirs": [{"id": 17, "quantity": 1}]
+        }
+    ]
+    ```
+    """
+    try:
+        from app.special_cases import calculate_gharqa_parallel
+        
+        notes = []
+        results = await calculate_gharqa_parallel(deceased_list, notes)
+        
+        return APIResponse(
+            status="success",
+            message="Perhitungan Gharqa berhasil",
+            data=results
+        )
+        
+    except ExecutorBusyError as e:
+        raise executor_busy(e)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Terjadi kesalahan: {str(e)}"
         )
 
+
 @router.post(
     "/calculate/munasakhot",
     response_model=APIResponse[Dict[str, CalculationResult]],
@@ -165,7 +390,8 @@ async def calculate_munasakhot_case(
         },
         {
             "pewaris": "Budi (anak Ahmad)",
-            "tirkah": 80000000,
+            "harta_sendiri": 20000000,
+            "sumber": [{"level": 1, "heir_id": 1}],
             "heirs": [
                 {"id": 4, "quantity": 1},
                 {"id": 1, "quantity": 2}
@@ -175,13 +401,17 @@ async def calculate_munasakhot_case(
     ]
     ```
     
+    Tirkah tingkat berikutnya = harta sendiri + bagian dari tingkat sumber
+    (dihitung otomatis). Hasil berisi setiap tingkat dan "jamiah"
+    (pembagian akhir ke ahli waris yang masih hidup).
+    
     Mengembalikan hasil perhitungan untuk setiap tingkat
     """
     try:
         from app.special_cases import calculate_munasakhot
         
         notes = []
-        results = calculate_munasakhot(levels_data, notes)
+        results = await run_calculation(calculate_munasakhot, levels_data, notes)
         
         return APIResponse(
             status="success",
@@ -189,6 +419,13 @@ async def calculate_munasakhot_case(
             data=results
         )
         
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -219,18 +456,21 @@ async def calculate_munasakhot_simple_case(
         },
         "pewaris2": {
             "name": "Budi",
-            "bagian_dari_pewaris1": 40000000,
+            "heir_id": 1,
             "harta_sendiri": 20000000,
             "heirs": [...]
         }
     }
     ```
+    
+    Bagian Budi dari Ahmad diturunkan dari hasil tingkat pertama berdasarkan
+    "heir_id". Format lama dengan "bagian_dari_pewaris1" tetap diterima.
     """
     try:
         from app.special_cases import calculate_munasakhot_simple
         
         notes = []
-        results = calculate_munasakhot_simple(pewaris1, pewaris2, notes)
+        results = await run_calculation(calculate_munasakhot_simple, pewaris1, pewaris2, notes)
         
         return APIResponse(
             status="success",
@@ -238,6 +478,13 @@ async def calculate_munasakhot_simple_case(
             data=results
         )
         
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -49,6 +49,23 @@ class AshlCalculator:
         
         return ashl, notes
     
+    @staticmethod
+    def calculate_ashl_value(furudh_results: List[FurudhResult]) -> int:
+        """
+        Hitung Ashl al-Mas'alah tanpa membuat catatan
+        
+        Args:
+            furudh_results: List hasil furudh
+            
+        Returns:
+            Ashl (1 jika semua ashobah)
+        """
+        denominators = [
+            f.denominator for f in furudh_results
+            if f.denominator > 0 and not f.is_ashobah
+        ]
+        return lcm_multiple(denominators) if denominators else 1
+    
     @staticmethod
     def _identify_relation_type(denominators: List[int]) -> str:
         """
@@ -0,0 +1,183 @@
+"""
+Engine untuk menentukan dan membagi Ashobah (penerima sisa)
+Berdasarkan Kitab Zahrotul Faridhah
+
+Setiap ahli waris ashobah punya peringkat dari ASHOBAH_PRIORITY. Ashobah
+bil-ghair dan ma'al-ghair (perempuan) menempati peringkat laki-laki yang
+menjadikannya ashobah, dan ashobah bi sabab (pembebas budak) berada di
+bawah semua ashobah nasab. Kelompok dengan peringkat terkecil yang ada
+menerima seluruh sisa; pembagian di dalam kelompok memakai rasio 2:1 jika
+laki-laki dan perempuan bersama.
+
+Hasil resolusi hanya bergantung pada pola ashobah (ID dan jumlah orang),
+sehingga disimpan di cache dan dipakai ulang antar request.
+"""
+from __future__ import annotations
+from functools import lru_cache
+from typing import Dict, List, Tuple
+import logging
+
+from app.core.furudh_engine import FurudhResult
+from app.utils.constants import HeirID, ASHOBAH_PRIORITY
+
+logger = logging.getLogger(__name__)
+
+
+# Jenis ashobah
+BI_NAFSIH = "bi nafsih"
+BIL_GHAIR = "bil ghair"
+MAAL_GHAIR = "ma'al ghair"
+BI_SABAB = "bi sabab"
+
+# Perempuan ashobah -> laki-laki sederajat yang peringkatnya ditempati
+FEMALE_COUNTERPART = {
+    HeirID.BINT: HeirID.IBN,
+    HeirID.BINT_IBN: HeirID.IBN_IBN,
+    HeirID.UKHT_ABAWAYN: HeirID.AKH_ABAWAYN,
+    HeirID.UKHT_AB: HeirID.AKH_AB,
+}
+
+# Ashobah bi sabab (wala'), di bawah semua ashobah nasab
+SABAB_IDS = (HeirID.MUTIQ, HeirID.MUTIQAH)
+
+
+def _build_rank_index() -> Dict[int, int]:
+    """Peringkat ashobah per HeirID (semakin kecil semakin kuat)"""
+    rank = {int(heir_id): i for i, heir_id in enumerate(ASHOBAH_PRIORITY)}
+    for female, male in FEMALE_COUNTERPART.items():
+        rank[int(female)] = rank[int(male)]
+    for i, heir_id in enumerate(SABAB_IDS, len(ASHOBAH_PRIORITY)):
+        rank[int(heir_id)] = i
+    return rank
+
+
+ASHOBAH_RANK = _build_rank_index()
+MALE_NASAB_IDS = frozenset(int(heir_id) for heir_id in ASHOBAH_PRIORITY)
+FEMALE_ASHOBAH_IDS = frozenset(int(heir_id) for heir_id in FEMALE_COUNTERPART)
+
+# Peringkat untuk ID yang tidak dikenal (tetap menerima sisa jika sendirian)
+_UNRANKED = len(ASHOBAH_RANK) + 1
+
+
+class AshobahGroup:
+    """
+    Hasil resolusi ashobah untuk satu pola (tidak bergantung pada sisa)
+
+    Disimpan di cache, jadi jangan diubah setelah dibuat.
+
+    Attributes:
+        kind: Jenis ashobah pemenang (bi nafsih / bil ghair / ma'al ghair / bi sabab)
+        members: ((heir_id, quantity, bobot per orang), ...) sesuai urutan pola
+        excluded: ID ashobah yang kalah peringkat (mendapat 0)
+        ruus: Total bobot (jumlah "kepala") penerima sisa
+    """
+
+    def __init__(self, kind: str, members: Tuple[Tuple[int, int, int], ...],
+                 excluded: Tuple[int, ...]):
+        self.kind = kind
+        self.members = members
+        self.excluded = excluded
+        self.ruus = sum(quantity * weight for _, quantity, weight in members)
+        self.mixed = any(weight == 2 for _, _, weight in members)
+        self._weights = {heir_id: weight for heir_id, _, weight in members}
+
+    def weight(self, heir_id: int) -> int:
+        """Bobot per orang (0 jika tidak menerima sisa)"""
+        return self._weights.get(heir_id, 0)
+
+    def split(self, sisa_saham: int) -> Dict[int, int]:
+        """
+        Bagi sisa saham dengan rasio 2:1 (bilangan bulat)
+
+        Args:
+            sisa_saham: Sisa saham, harus habis dibagi ruus (inkisar ashobah
+                sudah diterapkan)
+
+        Returns:
+            Dict {heir_id: total saham kelompok}
+        """
+        per_ruus = sisa_saham // self.ruus
+        return {
+            heir_id: per_ruus * weight * quantity
+            for heir_id, quantity, weight in self.members
+        }
+
+
+@lru_cache(maxsize=1024)
+def resolve_ashobah(pattern: Tuple[Tuple[int, int], ...]) -> AshobahGroup:
+    """
+    Tentukan kelompok ashobah yang menerima sisa
+
+    Args:
+        pattern: ((heir_id, quantity), ...) semua ahli waris berstatus ashobah
+
+    Returns:
+        AshobahGroup
+    """
+    best = min(ASHOBAH_RANK.get(heir_id, _UNRANKED) for heir_id, _ in pattern)
+    winners = [
+        (heir_id, quantity) for heir_id, quantity in pattern
+        if ASHOBAH_RANK.get(heir_id, _UNRANKED) == best
+    ]
+    excluded = tuple(
+        heir_id for heir_id, _ in pattern
+        if ASHOBAH_RANK.get(heir_id, _UNRANKED) != best
+    )
+
+    has_male = any(heir_id in MALE_NASAB_IDS for heir_id, _ in winners)
+    has_female = any(heir_id in FEMALE_ASHOBAH_IDS for heir_id, _ in winners)
+
+    if has_male and has_female:
+        kind = BIL_GHAIR
+    elif has_female:
+        # Perempuan ashobah tanpa laki-laki sederajat hanya mungkin
+        # saudari bersama anak/cucu perempuan
+        kind = MAAL_GHAIR
+    elif best >= len(ASHOBAH_PRIORITY) and best != _UNRANKED:
+        kind = BI_SABAB
+    else:
+        kind = BI_NAFSIH
+
+    mixed = kind == BIL_GHAIR
+    members = tuple(
+        (heir_id, quantity, 2 if mixed and heir_id in MALE_NASAB_IDS else 1)
+        for heir_id, quantity in winners
+    )
+
+    if excluded:
+        logger.debug("Ashobah kalah peringkat: %s", excluded)
+
+    return AshobahGroup(kind, members, excluded)
+
+
+class AshobahEngine:
+    """Engine untuk resolusi dan pembagian ashobah"""
+
+    def __init__(self, furudh_results: List[FurudhResult]):
+        self.ashobah = [f for f in furudh_results if f.is_ashobah]
+        self.group = (
+            resolve_ashobah(tuple((f.heir_id, f.quantity) for f in self.ashobah))
+            if self.ashobah else None
+        )
+
+    @property
+    def ruus(self) -> int:
+        """Total bobot penerima sisa (0 jika tidak ada ashobah)"""
+        return self.group.ruus if self.group is not None else 0
+
+    def distribute(self, sisa_saham: int) -> List[Tuple[FurudhResult, int]]:
+        """
+        Distribusikan sisa saham ke ashobah
+
+        Args:
+            sisa_saham: Sisa saham yang habis dibagi ruus
+
+        Returns:
+            List (FurudhResult, saham) sesuai urutan ashobah; ashobah yang
+            kalah peringkat mendapat 0
+        """
+        if self.group is None:
+            return []
+        split = self.group.split(sisa_saham)
+        return [(f, split.get(f.heir_id, 0)) for f in self.ashobah]
+
@@ -0,0 +1,300 @@
+"""
+Perhitungan batch (banyak kasus warisan dalam satu request)
+
+Item dengan bentuk ahli waris yang sama (setelah kanonikalisasi, lihat
+result_cache) hanya dihitung sekali. Struktur saham untuk setiap bentuk unik
+dihitung di process pool, lalu dimasukkan ke saham_cache proses utama
+sehingga setiap item cukup dibangun ulang dengan tirkah-nya sendiri.
+
+Process pool batch hanya dipakai jika executor berjenis thread. Dengan
+EXECUTOR_KIND=process, batch dibagi per bentuk (split_batch) menjadi
+beberapa job executor lalu digabung kembali (merge_batch_results).
+"""
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+from tempfile import SpooledTemporaryFile
+from typing import AsyncIterator, Dict, Hashable, List, Optional, Tuple
+import logging
+import time
+
+from pydantic import ValidationError
+
+from app.schemas.calculation import (
+    BatchCalculationResult, BatchItemResult, CalculationInput
+)
+from app.core.calculator import FaroidCalculator, SahamStructure, calculate_inheritance
+from app.core.result_cache import make_cache_key, saham_cache
+from app.special_cases.registry import classify_special_case
+
+logger = logging.getLogger(__name__)
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = Lock()
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    """Process pool dibuat sekali per proses"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=workers)
+        return _pool
+
+
+def shutdown_pool() -> None:
+    """Matikan process pool batch (dipanggil saat shutdown aplikasi)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _compute_structure(calculation_input: CalculationInput) -> Optional[SahamStructure]:
+    """Hitung struktur saham satu bentuk ahli waris (dijalankan di worker)"""
+    case_id = classify_special_case(calculation_input.heirs)
+    return FaroidCalculator(calculation_input).saham_structure(case_id)
+
+
+def _warm_structures(shapes: Dict[Hashable, CalculationInput], workers: int) -> None:
+    """
+    Hitung struktur saham bentuk-bentuk unik di process pool dan simpan ke cache
+
+    Kegagalan di worker diabaikan; item tersebut akan dihitung ulang (dan
+    error-nya dilaporkan) di proses utama.
+    """
+    pending = {
+        key: calculation_input for key, calculation_input in shapes.items()
+        if saham_cache.get(key) is None
+    }
+    if workers <= 0 or len(pending) < 2 or saham_cache.maxsize < len(pending):
+        # Pemanggil membagi bentuk per potongan seukuran cache
+        return
+
+    pool = _get_pool(workers)
+    futures = {key: pool.submit(_compute_structure, item) for key, item in pending.items()}
+    for key, future in futures.items():
+        try:
+            structure = future.result()
+        except Exception as e:
+            logger.warning("Worker batch gagal untuk bentuk %s: %s", key[1], e)
+            continue
+        if structure is not None:
+            saham_cache.put(key, structure)
+
+
+def _shape_key(item: CalculationInput) -> Optional[Hashable]:
+    """Kunci bentuk ahli waris satu item (None jika ahli waris kosong)"""
+    if not item.heirs:
+        return None
+    case_id = classify_special_case(item.heirs)
+    return make_cache_key(item.heirs, item.notes_verbosity, case_id)
+
+
+def _calculate_item(index: int, item: CalculationInput) -> BatchItemResult:
+    try:
+        result = calculate_inheritance(item)
+    except Exception as e:
+        logger.exception("Item batch %d gagal", index)
+        return BatchItemResult(index=index, status="error", error=str(e))
+    return BatchItemResult(index=index, status="success", result=result)
+
+
+def calculate_batch(items: List[CalculationInput], workers: int = 0) -> BatchCalculationResult:
+    """
+    Hitung banyak kasus warisan sekaligus
+
+    Bentuk unik diproses per potongan seukuran saham_cache: struktur satu
+    potongan dihitung di process pool lalu item-itemnya langsung dibangun
+    sebelum potongan berikutnya mendesak keluar struktur tersebut.
+
+    Args:
+        items: Daftar input perhitungan
+        workers: Jumlah worker process (0 = semua dihitung di proses ini)
+
+    Returns:
+        BatchCalculationResult dengan hasil sesuai urutan input
+    """
+    started = time.perf_counter()
+
+    shapes: Dict[Hashable, CalculationInput] = {}
+    members: Dict[Hashable, List[int]] = {}
+    results: List[Optional[BatchItemResult]] = [None] * len(items)
+    for index, item in enumerate(items):
+        key = _shape_key(item)
+        if key is None:
+            results[index] = BatchItemResult(
+                index=index, status="error", error="Ahli waris tidak boleh kosong"
+            )
+            continue
+        shapes.setdefault(key, item)
+        members.setdefault(key, []).append(index)
+
+    keys = list(shapes)
+    chunk_size = max(saham_cache.maxsize, 1)
+    for start in range(0, len(keys), chunk_size):
+        chunk = keys[start:start + chunk_size]
+        _warm_structures({key: shapes[key] for key in chunk}, workers)
+        for key in chunk:
+            for index in members[key]:
+                results[index] = _calculate_item(index, items[index])
+
+    valid = sum(len(indexes) for indexes in members.values())
+    duration_ms = (time.perf_counter() - started) * 1000
+    logger.info("Batch %d item, %d bentuk unik, %.1f ms", len(items), len(shapes), duration_ms)
+
+    return BatchCalculationResult(
+        total_items=len(items),
+        unique_shapes=len(shapes),
+        deduplicated=valid - len(shapes),
+        failed=sum(1 for r in results if r.status == "error"),
+        duration_ms=duration_ms,
+        items=results,
+    )
+
+
+def split_batch(items: List[CalculationInput], parts: int) -> List[List[int]]:
+    """
+    Bagi index item batch menjadi beberapa bagian untuk worker executor
+
+    Item dengan bentuk yang sama selalu masuk bagian yang sama sehingga
+    deduplikasi tetap berlaku di setiap bagian.
+
+    Returns:
+        Daftar index (terurut) per bagian, tanpa bagian kosong
+    """
+    groups: Dict[Optional[Hashable], List[int]] = {}
+    for index, item in enumerate(items):
+        groups.setdefault(_shape_key(item), []).append(index)
+
+    buckets: List[List[int]] = [[] for _ in range(max(parts, 1))]
+    for indexes in sorted(groups.values(), key=len, reverse=True):
+        min(buckets, key=len).extend(indexes)
+    return [sorted(bucket) for bucket in buckets if bucket]
+
+
+def merge_batch_results(total_items: int,
+                        parts: List[Tuple[List[int], BatchCalculationResult]],
+                        duration_ms: float) -> BatchCalculationResult:
+    """
+    Gabungkan hasil bagian-bagian split_batch
+
+    Args:
+        total_items: Jumlah item batch asli
+        parts: Pasangan (index bagian, hasil calculate_batch bagian tersebut)
+        duration_ms: Durasi keseluruhan batch
+
+    Returns:
+        BatchCalculationResult dengan index dan urutan batch asli
+    """
+    items: List[Optional[BatchItemResult]] = [None] * total_items
+    for indexes, result in parts:
+        for item in result.items:
+            index = indexes[item.index]
+            items[index] = item.model_copy(update={"index": index})
+
+    return BatchCalculationResult(
+        total_items=total_items,
+        unique_shapes=sum(result.unique_shapes for _, result in parts),
+        deduplicated=sum(result.deduplicated for _, result in parts),
+        failed=sum(result.failed for _, result in parts),
+        duration_ms=duration_ms,
+        items=items,
+    )
+
+
+async def spool_chunks(chunks: AsyncIterator[bytes], max_memory_bytes: int) -> SpooledTemporaryFile:
+    """
+    Tampung stream body request sebelum response mulai dikirim
+
+    Body disimpan di memori sampai max_memory_bytes lalu dipindah ke file
+    sementara, sehingga memori tetap terbatas untuk job sebesar apa pun.
+
+    Returns:
+        SpooledTemporaryFile yang sudah di-seek ke awal (pemanggil menutupnya)
+    """
+    spool = SpooledTemporaryFile(max_size=max_memory_bytes)
+    try:
+        async for chunk in chunks:
+            spool.write(chunk)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+
+async def iter_spooled_chunks(spool: SpooledTemporaryFile, chunk_size: int = 65536) -> AsyncIterator[bytes]:
+    """Baca kembali body yang sudah ditampung spool_chunks per potongan"""
+    while True:
+        chunk = spool.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+async def iter_ndjson_lines(chunks: AsyncIterator[bytes],
+                            max_line_bytes: int) -> AsyncIterator[bytes]:
+    """
+    Pecah stream body request menjadi baris NDJSON
+
+    Buffer hanya menampung satu baris yang belum lengkap, jadi memori tidak
+    tumbuh mengikuti ukuran job. Baris yang melebihi max_line_bytes
+    dikembalikan sebagai b"" (dilaporkan sebagai error oleh pemanggil).
+    """
+    buffer = b""
+    oversized = False
+    async for chunk in chunks:
+        buffer += chunk
+        while True:
+            newline = buffer.find(b"\n")
+            if newline < 0:
+                break
+            line, buffer = buffer[:newline], buffer[newline + 1:]
+            if oversized:
+                oversized = False
+                yield b""
+            elif line.strip():
+                yield line
+        if len(buffer) > max_line_bytes:
+            buffer = b""
+            oversized = True
+    if oversized:
+        yield b""
+    elif buffer.strip():
+        yield buffer
+
+
+def calculate_ndjson_chunk(lines: List[bytes], start_index: int) -> str:
+    """
+    Hitung satu potongan baris NDJSON
+
+    Args:
+        lines: Baris NDJSON berisi CalculationInput
+        start_index: Index baris pertama dalam keseluruhan stream
+
+    Returns:
+        Baris NDJSON BatchItemResult untuk setiap input, sesuai urutan
+    """
+    output = []
+    for offset, line in enumerate(lines):
+        index = start_index + offset
+        if not line:
+            item = BatchItemResult(index=index, status="error", error="Baris terlalu panjang")
+        else:
+            try:
+                calculation_input = CalculationInput.model_validate_json(line)
+                if not calculation_input.heirs:
+                    raise ValueError("Ahli waris tidak boleh kosong")
+                result = calculate_inheritance(calculation_input)
+                item = BatchItemResult(index=index, status="success", result=result)
+            except ValidationError as e:
+                item = BatchItemResult(index=index, status="error",
+                                       error=f"Input tidak valid: {e.error_count()} error")
+            except Exception as e:
+                item = BatchItemResult(index=index, status="error", error=str(e))
+        output.append(item.model_dump_json())
+        output.append("\n")
+    return "".join(output)
@@ -6,44 +6,117 @@ Updated: 2025-10-07
 Fixed: Error 500, AshlCalculator call, Schema compatibility, Logging
 """
 from __future__ import annotations
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional, Tuple
 import logging
 from datetime import datetime
 
 from app.schemas.calculation import CalculationInput, CalculationResult, HeirShare
-from app.schemas.heir import HeirResponse
+from app.schemas.heir import HeirInput, HeirResponse
 from app.core.furudh_engine import FurudhEngine, FurudhResult
+from app.core.ashobah_engine import AshobahEngine
 from app.core.ashl_calculator import AshlCalculator
-from app.utils.constants import HeirID, HEIR_NAMES
+from app.core.radd import RaddCalculator
+from app.core.fast_path import trivial_result
+from app.core.result_cache import heir_records, make_cache_key, saham_cache
+from app.special_cases.registry import classify_special_case
+from app.special_cases.akdariyyah import akdariyyah_structure
+from app.special_cases.gharrawin import gharrawin_structure
+from app.special_cases.jadd_ikhwah import jadd_ikhwah_structure
+from app.special_cases.musytarakah import musytarakah_structure
+from app.utils.constants import HeirID, HEIR_NAMES, NoteVerbosity
+from app.utils.notes import NoteEvent, NoteLog
+from app.utils.logging_config import request_trace
+from app.utils.timing import stage_timer
+from app.utils.aul_validator import classify_aul
 from app.utils.math_helpers import fraction_to_string, distribute_shares
 from app.utils.inkisar import check_and_apply_inkisar, compute_inkisar_single_group
 
-# ✅ SETUP LOGGING
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('faraid_calculator.log'),
-        logging.StreamHandler()
-    ]
-)
+# Handler dipasang oleh app.utils.logging_config.setup_logging()
 logger = logging.getLogger(__name__)
 
+# heirs kanonik -> (furudh_results, {heir_id: alasan mahjub})
+FurudhProvider = Callable[[List[HeirInput]], Tuple[List[FurudhResult], Dict[int, str]]]
+
+class SahamStructure:
+    """
+    Struktur saham hasil perhitungan normal (tidak bergantung pada tirkah)
+    
+    Disimpan di cache dan dipakai bersama oleh banyak request (dan thread),
+    sehingga tidak bisa diubah setelah dibuat; gunakan replace() untuk
+    membuat salinan dengan field berbeda.
+    """
+    
+    __slots__ = ("ashl_awal", "ashl_akhir", "status", "shares", "notes",
+                 "mahjub", "special_case_name", "aul_type")
+    
+    def __init__(self, ashl_awal: int, ashl_akhir: int, status: str,
+                 shares: Tuple[Tuple[FurudhResult, int], ...], notes: Tuple[NoteEvent, ...],
+                 mahjub: Tuple[Tuple[int, int, str], ...] = (),
+                 special_case_name: Optional[str] = None,
+                 aul_type: Optional[str] = None):
+        init = object.__setattr__
+        init(self, "ashl_awal", ashl_awal)
+        init(self, "ashl_akhir", ashl_akhir)
+        init(self, "status", status)
+        init(self, "shares", tuple(shares))
+        init(self, "notes", tuple(notes))
+        init(self, "mahjub", tuple(mahjub))  # ((heir_id, quantity, alasan), ...)
+        init(self, "special_case_name", special_case_name)
+        init(self, "aul_type", aul_type)  # nama 'aul (AUL_NAMES), None jika tidak 'aul/tidak standar
+    
+    def __setattr__(self, name, value):
+        raise AttributeError("SahamStructure tidak bisa diubah, gunakan replace()")
+    
+    def __delattr__(self, name):
+        raise AttributeError("SahamStructure tidak bisa diubah, gunakan replace()")
+    
+    def __reduce__(self):
+        # Dikirim antar proses oleh batch (process pool)
+        return (SahamStructure, tuple(getattr(self, name) for name in self.__slots__))
+    
+    def replace(self, **changes) -> SahamStructure:
+        """Salinan struktur dengan sebagian field diganti"""
+        fields = {name: getattr(self, name) for name in self.__slots__}
+        fields.update(changes)
+        return SahamStructure(**fields)
+
 
 class FaroidCalculator:
-    """Main calculator untuk faraid"""
+    """
+    Main calculator untuk faraid
+    
+    Instance hanya menyimpan input dan tidak diubah selama perhitungan:
+    catatan dibuat per pemanggilan dan struktur saham di cache tidak bisa
+    diubah, sehingga satu instance aman dipanggil dari banyak thread.
+    
+    Args:
+        calculation_input: Input perhitungan
+        notes: Catatan awal yang diletakkan di depan catatan setiap hasil
+            (verbosity mengikuti NoteLog ini)
+    """
     
-    def __init__(self, calculation_input: CalculationInput):
+    def __init__(self, calculation_input: CalculationInput, notes: Optional[NoteLog] = None):
         self.input = calculation_input
-        self.heirs = calculation_input.heirs
+        self.heirs = tuple(calculation_input.heirs)
         self.tirkah = calculation_input.tirkah
-        self.notes = []
+        if notes is None:
+            self.verbosity = NoteVerbosity(calculation_input.notes_verbosity)
+            self.prefix_notes: Tuple[NoteEvent, ...] = ()
+        else:
+            self.verbosity = notes.verbosity
+            self.prefix_notes = notes.events()
         
         # ✅ Log input
-        logger.info(f"=== NEW CALCULATION ===")
-        logger.info(f"Tirkah: Rp {self.tirkah:,.0f}")
-        logger.info(f"Heirs: {len(self.heirs)}")
-        
+        logger.info("=== NEW CALCULATION ===")
+        logger.info("Tirkah: Rp %.0f", self.tirkah)
+        logger.info("Heirs: %s", len(self.heirs))
+    
+    def _new_notes(self) -> NoteLog:
+        """NoteLog untuk satu pemanggilan, diawali catatan awal"""
+        notes = NoteLog(self.verbosity)
+        notes.extend_events(self.prefix_notes)
+        return notes
+    
     def calculate(self) -> CalculationResult:
         """
         Lakukan perhitungan lengkap
@@ -51,501 +124,236 @@ class FaroidCalculator:
         Returns:
             CalculationResult
         """
-        self.notes.append("=== MULAI PERHITUNGAN WARISAN ===")
-        self.notes.append(f"Total Harta (Tirkah): Rp {self.tirkah:,.0f}")
-        self.notes.append(f"Jumlah Ahli Waris: {len(self.heirs)}")
-        self.notes.append("")
+        notes = self._new_notes()
         
-        # 1. Cek kasus khusus
-        special_case = self._check_special_cases()
+        # 0. Jalur cepat untuk kasus sederhana (hanya jika catatan tidak diminta)
+        if not notes.enabled:
+            result = trivial_result(self.heirs, self.tirkah)
+            if result is not None:
+                return result
         
-        if special_case:
-            return self._calculate_special_case(special_case)
+        notes.summary("=== MULAI PERHITUNGAN WARISAN ===")
+        notes.summary("Total Harta (Tirkah): Rp {:,.0f}", self.tirkah)
+        notes.summary("Jumlah Ahli Waris: {}", len(self.heirs))
+        notes.add("")
         
-        # 2. Perhitungan normal
-        return self._calculate_normal()
+        # 1. Cek kasus khusus, 2. perhitungan normal jika bukan kasus khusus
+        return self._calculate(classify_special_case(self.heirs), notes)
     
-    def _check_special_cases(self) -> Optional[str]:
+    def calculate_case(self, case_id: Optional[str],
+                       furudh_provider: Optional[FurudhProvider] = None) -> CalculationResult:
         """
-        Cek apakah termasuk kasus khusus
+        Hitung lewat jalur yang sudah ditentukan pemanggil (tanpa klasifikasi)
+        
+        Args:
+            case_id: ID kasus khusus (None = perhitungan normal)
+            furudh_provider: Sumber furudh untuk perhitungan normal (lihat
+                compute_saham_structure)
         
         Returns:
-            Nama kasus khusus atau None
+            CalculationResult
         """
-        from app.special_cases import (
-            is_akdariyyah, is_jadd_ikhwah, is_musytarakah,
-            is_gharrawin
-        )
+        return self._calculate(case_id, self._new_notes(), furudh_provider)
+    
+    def saham_structure(self, case_id: Optional[str] = None) -> Optional[SahamStructure]:
+        """Struktur saham (dari cache atau dihitung) tanpa membangun hasil"""
+        return self._get_saham_structure(case_id, self._new_notes())
+    
+    def _calculate(self, case_id: Optional[str], notes: NoteLog,
+                   furudh_provider: Optional[FurudhProvider] = None) -> CalculationResult:
+        """
+        Ambil/hitung struktur saham lalu bangun hasil dengan tirkah
         
-        if is_akdariyyah(self.heirs):
-            return "akdariyyah"
+        Kasus khusus dihitung lewat SPECIAL_CASE_ENGINES; engine-nya
+        menghasilkan SahamStructure seperti jalur normal, sehingga mendapat
+        cache struktur dan pengukuran tahap yang sama.
+        """
+        if case_id is not None and case_id not in SPECIAL_CASE_ENGINES:
+            logger.warning("Special case '%s' tidak punya engine", case_id)
+            notes.add("⚠️ Kasus khusus '{}' belum diimplementasikan", case_id)
+            return self._create_error_result(f"Special case '{case_id}' not implemented", notes)
         
-        if is_jadd_ikhwah(self.heirs):
-            return "jadd_ikhwah"
+        try:
+            structure = self._get_saham_structure(case_id, notes, furudh_provider)
+            
+            if structure is None:
+                return self._create_error_result("Tidak ada ahli waris dengan furudh", notes)
+            
+            with stage_timer("build"):
+                return self._build_result(structure, notes)
         
-        if is_musytarakah(self.heirs):
-            return "musytarakah"
+        except Exception as e:
+            logger.exception("ERROR in calculation: %s", e)
+            notes.add("❌ ERROR: {}", str(e))
+            return self._create_error_result(str(e), notes)
+    
+    def _get_saham_structure(self, case_id: Optional[str], notes: NoteLog,
+                             furudh_provider: Optional[FurudhProvider] = None) -> Optional[SahamStructure]:
+        """
+        Ambil struktur saham dari cache, atau hitung jika belum ada
         
-        if is_gharrawin(self.heirs):
-            return "gharrawin"
+        Struktur dihitung dari bentuk kanonik ahli waris (ID terurut, duplikat
+        digabung) sehingga hasilnya sama baik cache hit maupun miss.
         
-        return None
-    
-    def _calculate_normal(self) -> CalculationResult:
-        """Perhitungan normal (tanpa kasus khusus)"""
+        Args:
+            case_id: ID kasus khusus (None = perhitungan normal)
+            notes: NoteLog pemanggilan ini (catatan struktur ditambahkan)
+            furudh_provider: Sumber furudh yang sudah dievaluasi untuk jalur
+                normal (lihat compute_saham_structure)
+        
+        Returns:
+            SahamStructure atau None jika tidak ada ahli waris dengan furudh
+        """
+        key = make_cache_key(self.heirs, self.verbosity, case_id)
+        structure = saham_cache.get(key)
+        
+        if structure is not None:
+            notes.extend_events(structure.notes)
+            return structure
+        
+        heirs = heir_records(key[1])
+        structure_notes = NoteLog(self.verbosity)
         try:
-            from app.utils.constants import HEIR_NAMES
-            from app.utils.inkisar import check_and_apply_inkisar, compute_inkisar_single_group
-            
-            # ===== TRACKING INKISAR =====
-            ashl_awal_original = None
-            self._inkisar_history = []
-            
-            # ===== STEP 1: Tentukan Furudh =====
-            logger.info("STEP 1: Tentukan Furudh")
-            self.notes.append("📋 TAHAP 1: Menentukan Furudh Muqaddarah")
-            
-            from app.core.furudh_engine import FurudhEngine
-            furudh_engine = FurudhEngine(self.heirs)
-            furudh_results = furudh_engine.determine_furudh()
-            
-            logger.info(f"Furudh results: {len(furudh_results)} items")
-            
-            for furudh in furudh_results:
-                heir_name = HEIR_NAMES.get(furudh.heir_id, {}).get("id", "Unknown")
-                if furudh.is_ashobah:
-                    self.notes.append(f"  • {heir_name}: Ashobah")
-                else:
-                    self.notes.append(f"  • {heir_name}: {furudh.fardh}")
-            self.notes.append("")
-            
-            if not furudh_results:
-                logger.error("Tidak ada ahli waris dengan furudh")
-                self.notes.append("   ❌ Tidak ada ahli waris dengan furudh!")
-                return self._create_error_result("Tidak ada ahli waris dengan furudh")
-            
-            # ===== STEP 2: Hitung Ashl =====
-            logger.info("STEP 2: Hitung Ashl")
-            self.notes.append("📊 TAHAP 2: Menghitung Ashl al-Mas'alah")
-
-            # ✅ FIX: Gunakan static method dengan furudh_results
-            ashl_awal, ashl_notes = AshlCalculator.calculate_ashl(furudh_results)
-            ashl_awal_original = ashl_awal
-            
-            # Tambahkan notes dari AshlCalculator
-            for note in ashl_notes:
-                self.notes.append(f"   {note}")
-
-            ashl = ashl_awal
-            logger.info(f"Ashl awal: {ashl}")
-            
-            # ===== STEP 3: Hitung Saham Furudh =====
-            logger.info("STEP 3: Hitung Saham Furudh")
-
-            furudh_saham = []
-            total_furudh_saham = 0
-
-            for furudh in furudh_results:
-                if not furudh.is_ashobah:
-                    # ✅ FIX: Gunakan numerator/denominator, bukan fardh (string)
-                    saham = (ashl * furudh.numerator) // furudh.denominator
-                    furudh_saham.append((furudh, saham))
-                    total_furudh_saham += saham
-                    
-                    logger.info(f"  {HEIR_NAMES.get(furudh.heir_id, {}).get('id', 'Unknown')}: "
-                            f"{furudh.numerator}/{furudh.denominator} = {saham}/{ashl} saham")
-
-
-            
-            # ===== STEP 4: Cek Inkisar Furudh =====
-            logger.info("STEP 4: Cek Inkisar Furudh")
-            self.notes.append("")
-            
-            ashl_after_inkisar, furudh_saham, self.notes = check_and_apply_inkisar(
-                furudh_saham, ashl, self.notes
-            )
-            
-            if ashl_after_inkisar != ashl:
-                self._inkisar_history.append(("Furudh", ashl, ashl_after_inkisar))
-                ashl = ashl_after_inkisar
-                total_furudh_saham = sum(saham for _, saham in furudh_saham)
-            
-            logger.info(f"Ashl after inkisar: {ashl_after_inkisar}")
-            ashl_akhir = ashl_after_inkisar
-            
-            # ===== STEP 5: Cek Aul/Radd/Ashobah =====
-            logger.info("STEP 5: Cek Aul/Radd/Ashobah")
-            
-            has_ashobah = any(f.is_ashobah for f in furudh_results)
-            all_ashobah = all(f.is_ashobah for f in furudh_results)
-            
-            self.notes.append("")
-            
-            if all_ashobah:
-                self.notes.append("✅ Semua ahli waris adalah Ashobah")
-                sisa_saham = ashl_akhir
-                distribution_type = "Ashobah"
+            if case_id is None:
+                with stage_timer("saham"):
+                    structure = compute_saham_structure(heirs, structure_notes, furudh_provider)
             else:
-                sisa_saham = ashl_akhir - total_furudh_saham
-                logger.info(f"Sisa saham: {sisa_saham}")
-                
-                if sisa_saham == 0:
-                    self.notes.append("✅ Pembagian PAS (Tidak ada sisa)")
-                    distribution_type = "Adil"
-                elif sisa_saham < 0:
-                    ashl_akhir = total_furudh_saham
-                    furudh_saham = [(f, saham) for f, saham in furudh_saham]
-                    sisa_saham = 0
-                    
-                    logger.warning(f"AUL: {ashl_after_inkisar} → {ashl_akhir}")
-                    
-                    self.notes.append(f"⚠️ Terjadi AUL (عول)")
-                    self.notes.append(f"   Ashl berubah dari {ashl_after_inkisar} menjadi {ashl_akhir}")
-                    
-                    # ✅ Validasi 'Aul (jika file aul_validator.py ada)
-                    try:
-                        from app.utils.aul_validator import validate_aul
-                        is_valid, message = validate_aul(ashl_after_inkisar, ashl_akhir)
-                        self.notes.append(f"   {message}")
-                        if not is_valid:
-                            logger.warning(f"Non-standard aul case")
-                            self.notes.append(f"   ⚠️ PERINGATAN: Kasus 'aul ini tidak standar!")
-                    except ImportError:
-                        logger.warning("aul_validator.py not found, skipping validation")
-                    
-                    distribution_type = "Aul"
-                elif has_ashobah:
-                    self.notes.append("✅ Pembagian ADIL (Ada Ashobah)")
-                    self.notes.append(f"   Sisa {sisa_saham} saham untuk Ashobah")
-                    distribution_type = "Adil"
-                else:
-                    # ✅ RADD: Kembalikan sisa ke Dzawil Furudh
-                    self.notes.append(f"✅ Terjadi RADD (رد)")
-                    self.notes.append(f"   Sisa {sisa_saham} saham dari ashl {ashl_akhir}")
-                    
-                    logger.info(f"RADD DETECTED: {sisa_saham} saham sisa")
-                    
-                    # Cek apakah ada Zauj/Zaujah (ID 3 atau 4)
-                    ZAUJ_ZAUJAH_IDS = {3, 4}  # Suami (3), Istri (4)
-                    
-                    zauj_zaujah_list = [(f, s) for f, s in furudh_saham if f.heir_id in ZAUJ_ZAUJAH_IDS]
-                    dzawil_furudh_list = [(f, s) for f, s in furudh_saham if f.heir_id not in ZAUJ_ZAUJAH_IDS]
-                    
-                    has_zauj_zaujah = len(zauj_zaujah_list) > 0
-                    
-                    if not has_zauj_zaujah:
-                        # ===== KASUS 1: RADD TANPA Zauj/Zaujah =====
-                        self.notes.append(f"   📌 Kasus 1: Tidak ada Zauj/Zaujah")
-                        total_furudh_saham = sum(saham for _, saham in furudh_saham)
-                        ashl_akhir = total_furudh_saham
-                        
-                        self.notes.append(f"   Ashl Akhir = Total Saham = {ashl_akhir}")
-                        logger.info(f"   RADD Kasus 1: ashl_akhir = {ashl_akhir}")
-                    
-                    elif len(dzawil_furudh_list) == 1:
-                        # ===== KASUS 2: Ada Zauj/Zaujah + 1 Ahli Waris =====
-                        self.notes.append(f"   📌 Kasus 2: Ada Zauj/Zaujah + 1 Ahli Waris")
-                        
-                        # Ambil penyebut zauj/zaujah
-                        zauj_furudh, zauj_saham = zauj_zaujah_list[0]
-                        zauj_denominator = zauj_furudh.denominator
-                        
-                        self.notes.append(f"   Penyebut Zauj/Zaujah ({zauj_denominator}) → Ashl Mas'alah")
-                        
-                        # Ashl baru = penyebut zauj
-                        ashl_akhir = zauj_denominator
-                        
-                        # Hitung ulang saham dengan ashl baru
-                        new_furudh_saham = []
-                        for furudh, old_saham in furudh_saham:
-                            # Saham baru = (numerator / denominator) * ashl_baru
-                            new_saham = (furudh.numerator * ashl_akhir) / furudh.denominator
-                            new_furudh_saham.append((furudh, new_saham))
-                            
-                            heir_name = HEIR_NAMES.get(furudh.heir_id, {}).get("id", "Unknown")
-                            self.notes.append(f"   • {heir_name}: {furudh.numerator}/{furudh.denominator} × {ashl_akhir} = {new_saham}")
-                        
-                        furudh_saham = new_furudh_saham
-                        
-                        # Cek apakah masih ada sisa
-                        total_saham_baru = sum(s for _, s in furudh_saham)
-                        if total_saham_baru < ashl_akhir:
-                            # Sisa untuk dzawil furudh (bukan zauj)
-                            sisa_baru = ashl_akhir - total_saham_baru
-                            self.notes.append(f"   Sisa {sisa_baru} untuk ahli waris (radd)")
-                            
-                            # Berikan sisa ke dzawil furudh
-                            for i, (furudh, saham) in enumerate(furudh_saham):
-                                if furudh.heir_id not in ZAUJ_ZAUJAH_IDS:
-                                    new_saham = saham + sisa_baru
-                                    furudh_saham[i] = (furudh, new_saham)
-                                    
-                                    heir_name = HEIR_NAMES.get(furudh.heir_id, {}).get("id", "Unknown")
-                                    self.notes.append(f"   • {heir_name}: {saham} + {sisa_baru} (radd) = {new_saham}")
-                        
-                        logger.info(f"   RADD Kasus 2: ashl_akhir = {ashl_akhir}")
-                    
-                    else:
-                        # ===== KASUS 3: Ada Zauj/Zaujah + Lebih dari 1 Ahli Waris =====
-                        self.notes.append(f"   📌 Kasus 3: Ada Zauj/Zaujah + {len(dzawil_furudh_list)} Ahli Waris")
-                        
-                        # Ambil penyebut zauj/zaujah
-                        zauj_furudh, zauj_saham = zauj_zaujah_list[0]
-                        zauj_denominator = zauj_furudh.denominator
-                        zauj_numerator = zauj_furudh.numerator
-                        
-                        self.notes.append(f"   Penyebut Zauj/Zaujah: {zauj_denominator}")
-                        
-                        # Kumpulkan penyebut dzawil furudh untuk cari LCM
-                        dzawil_denominators = [f.denominator for f, _ in dzawil_furudh_list]
-                        
-                        from math import gcd
-                        from functools import reduce
-                        
-                        def lcm(a, b):
-                            return abs(a * b) // gcd(a, b)
-                        
-                        # Hitung LCM semua penyebut dzawil furudh
-                        ashl_dzawil = reduce(lcm, dzawil_denominators)
-                        
-                        self.notes.append(f"   LCM penyebut Dzawil Furudh: {ashl_dzawil}")
-                        
-                        # Hitung saham dzawil furudh dari ashl_dzawil
-                        dzawil_saham_map = {}
-                        total_radd_saham = 0
-                        
-                        for furudh, _ in dzawil_furudh_list:
-                            saham_radd = (furudh.numerator * ashl_dzawil) // furudh.denominator
-                            dzawil_saham_map[furudh.heir_id] = saham_radd
-                            total_radd_saham += saham_radd
-                            
-                            heir_name = HEIR_NAMES.get(furudh.heir_id, {}).get("id", "Unknown")
-                            self.notes.append(f"   • {heir_name}: {furudh.numerator}/{furudh.denominator} × {ashl_dzawil} = {saham_radd}")
-                        
-                        self.notes.append(f"   Total Saham Radd: {total_radd_saham}")
-                        
-                        # Ashl akhir = total_radd_saham × zauj_denominator
-                        ashl_akhir = total_radd_saham * zauj_denominator
-                        
-                        self.notes.append(f"   Ashl Akhir = {total_radd_saham} × {zauj_denominator} = {ashl_akhir}")
-                        
-                        # Hitung saham zauj dari ashl akhir
-                        zauj_saham_final = (zauj_numerator * ashl_akhir) // zauj_denominator
-                        
-                        self.notes.append(f"   Zauj/Zaujah: {zauj_numerator}/{zauj_denominator} × {ashl_akhir} = {zauj_saham_final}")
-                        
-                        # Sisa untuk radd
-                        sisa_untuk_radd = ashl_akhir - zauj_saham_final
-                        
-                        self.notes.append(f"   Sisa untuk Radd: {ashl_akhir} - {zauj_saham_final} = {sisa_untuk_radd}")
-                        
-                        # Distribusi sisa ke dzawil furudh proporsional
-                        new_furudh_saham = []
-                        
-                        for furudh, old_saham in furudh_saham:
-                            if furudh.heir_id in ZAUJ_ZAUJAH_IDS:
-                                # Zauj/Zaujah
-                                new_saham = zauj_saham_final
-                            else:
-                                # Dzawil Furudh: proporsional dari sisa
-                                saham_radd = dzawil_saham_map[furudh.heir_id]
-                                new_saham = (saham_radd / total_radd_saham) * sisa_untuk_radd
-                            
-                            new_furudh_saham.append((furudh, new_saham))
-                            
-                            heir_name = HEIR_NAMES.get(furudh.heir_id, {}).get("id", "Unknown")
-                            self.notes.append(f"   • {heir_name}: {new_saham} saham (akhir)")
-                        
-                        furudh_saham = new_furudh_saham
-                        
-                        logger.info(f"   RADD Kasus 3: ashl_akhir = {ashl_akhir}")
-                    
-                    sisa_saham = 0
-                    distribution_type = "Radd"
-
-
-
-            
-            # ===== STEP 6-8: Handling Ashobah =====
-            if has_ashobah and sisa_saham > 0:
-                logger.info("STEP 6-8: Handling Ashobah")
-                
-                ashobah_list = [f for f in furudh_results if f.is_ashobah]
-                needs_inkisar_ashobah = False
-                
-                for ashobah in ashobah_list:
-                    if ashobah.quantity > 1 and sisa_saham % ashobah.quantity != 0:
-                        needs_inkisar_ashobah = True
-                        break
-                
-                if needs_inkisar_ashobah and len(ashobah_list) == 1:
-                    ashobah = ashobah_list[0]
-                    heir_name = HEIR_NAMES.get(ashobah.heir_id, {}).get("id", "Unknown")
-                    
-                    self.notes.append("")
-                    self.notes.append("🔹 INKISAR BERTINGKAT - Tahap 2 (Ashobah)")
-                    
-                    ashl_after_inkisar_ashobah, self.notes = compute_inkisar_single_group(
-                        ruus=ashobah.quantity,
-                        saham=int(sisa_saham),
-                        ashl=ashl_akhir,
-                        notes=self.notes
-                    )
-                    
-                    if ashl_after_inkisar_ashobah != ashl_akhir:
-                        self._inkisar_history.append(("Ashobah", ashl_akhir, ashl_after_inkisar_ashobah))
-                        
-                        multiplier = ashl_after_inkisar_ashobah // ashl_akhir
-                        ashl_akhir = ashl_after_inkisar_ashobah
-                        
-                        furudh_saham = [(f, int(saham * multiplier)) for f, saham in furudh_saham]
-                        sisa_saham = int(sisa_saham * multiplier)
-                
-                self.notes.append("")
-                self.notes.append(f"💰 Sisa untuk Ashobah: {sisa_saham} saham")
-                
-                ashobah_results = self._distribute_ashobah(furudh_results, sisa_saham)
-                
-                for furudh_item, saham_ashobah in ashobah_results:
-                    heir_name = HEIR_NAMES.get(furudh_item.heir_id, {}).get("id", "Unknown")
-                    
-                    if furudh_item.quantity > 1:
-                        saham_per_orang = saham_ashobah / furudh_item.quantity
-                        self.notes.append(f"📌 Distribusi Ashobah merata ({furudh_item.quantity} orang)")
-                        self.notes.append(f"   • {heir_name}: {saham_ashobah:.2f} saham")
-                        if saham_ashobah % furudh_item.quantity == 0:
-                            self.notes.append(f"   • Per orang: {saham_ashobah} ÷ {furudh_item.quantity} = {saham_per_orang:.2f} saham/orang")
-                    else:
-                        self.notes.append(f"📌 Distribusi Ashobah")
-                        self.notes.append(f"   • {heir_name}: {saham_ashobah:.2f} saham")
-                
-                if len(self._inkisar_history) > 0:
-                    self.notes.append("")
-                    self.notes.append("📋 RINGKASAN INKISAR:")
-                    self.notes.append(f"   • Ashl Awal (sebelum inkisar): {ashl_awal_original}")
-                    
-                    for i, (tahap, ashl_before, ashl_after) in enumerate(self._inkisar_history, 1):
-                        self.notes.append(f"   • Setelah Inkisar Tahap {i} ({tahap}): {ashl_before} → {ashl_after}")
-                    
-                    self.notes.append(f"   • Ashl Akhir: {ashl_akhir}")
-                    total_multiplier = ashl_akhir // ashl_awal_original
-                    self.notes.append(f"   • Total Multiplier: {total_multiplier}×")
-                
-                furudh_saham.extend(ashobah_results)
-                self.notes.append("")
-            
-            # ===== STEP 9: Format hasil final =====
-            logger.info("STEP 9: Format hasil final")
-            
-            # ✅ Buat HeirShare objects sesuai schema
-            shares_result = []
-            for furudh, saham in furudh_saham:
-                heir_name = HEIR_NAMES.get(furudh.heir_id, {}).get("id", "Unknown")
-                heir_name_ar = HEIR_NAMES.get(furudh.heir_id, {}).get("ar", "Unknown")
-                
-                # Buat HeirResponse
-                heir_response = HeirResponse(
+                with stage_timer(f"special.{case_id}"):
+                    structure = SPECIAL_CASE_ENGINES[case_id](heirs, structure_notes)
+        finally:
+            notes.extend_events(structure_notes.events())
+        
+        if structure is not None:
+            saham_cache.put(key, structure)
+        
+        return structure
+    
+    def _build_result(self, structure: SahamStructure, notes: NoteLog) -> CalculationResult:
+        """
+        Bangun CalculationResult dari struktur saham (TAHAP 9)
+        
+        Hanya bagian ini yang bergantung pada tirkah. Urutan shares mengikuti
+        urutan input: dzawil furudh dulu, kemudian ashobah, lalu ahli waris
+        mahjub (saham 0, is_mahjub=True).
+        """
+        logger.info("STEP 9: Format hasil final")
+        
+        ashl_akhir = structure.ashl_akhir
+        distribution_type = structure.status
+        
+        position = {}
+        for index, heir in enumerate(self.heirs):
+            position.setdefault(heir.id, index)
+        furudh_saham = sorted(
+            structure.shares,
+            key=lambda item: (item[0].is_ashobah, position.get(item[0].heir_id, 0))
+        )
+        
+        # ✅ Buat HeirShare objects sesuai schema (satu-satunya tempat model
+        # hasil dibangun); total per ahli waris untuk catatan diambil dari
+        # nilai internal, bukan dibaca ulang dari HeirShare
+        shares_result = []
+        grouped_heirs = {}
+        for furudh, saham in furudh_saham:
+            names = HEIR_NAMES.get(furudh.heir_id, {})
+            heir_name = names.get("id", "Unknown")
+            
+            # Calculate amounts
+            total_amount = (self.tirkah * saham) / ashl_akhir
+            percentage = f"{(saham / ashl_akhir) * 100:.2f}%"
+            
+            shares_result.append(HeirShare(
+                heir=HeirResponse(
                     id=furudh.heir_id,
                     name_id=heir_name,
-                    name_ar=heir_name_ar
-                )
-                
-                # Calculate amounts
-                total_amount = (self.tirkah * saham) / ashl_akhir
-                percentage = f"{(saham / ashl_akhir) * 100:.2f}%"
-                
-                # ✅ Buat HeirShare
-                heir_share = HeirShare(
-                    heir=heir_response,
-                    quantity=furudh.quantity,
-                    fardh=str(furudh.fardh) if not furudh.is_ashobah else None,
-                    share_fraction=f"{int(saham)}/{ashl_akhir}",
-                    saham=float(saham),
-                    reason=furudh.reason if hasattr(furudh, 'reason') else "Pembagian warisan",
-                    share_amount=total_amount,
-                    percentage=percentage,
-                    is_mahjub=False,
-                    mahjub_reason=None
-                )
-                
-                shares_result.append(heir_share)
-                
-                # Log
-                if furudh.quantity > 1:
-                    individual_amount = total_amount / furudh.quantity
-                    logger.info(f"{heir_name}: Rp {total_amount:,.0f} (@ Rp {individual_amount:,.0f}/orang)")
-                else:
-                    logger.info(f"{heir_name}: Rp {total_amount:,.0f}")
-            
-            # Distribusi Tirkah (Notes)
-            self.notes.append("💵 TAHAP 4: Distribusi Tirkah")
-            
-            grouped_heirs = {}
-            for share in shares_result:
-                heir_id = share.heir.id
-                if heir_id not in grouped_heirs:
-                    grouped_heirs[heir_id] = {
-                        "name": share.heir.name_id,
-                        "total_amount": 0,
-                        "total_percentage": 0,
-                        "count": 0
-                    }
-                grouped_heirs[heir_id]["total_amount"] += share.share_amount
-                grouped_heirs[heir_id]["total_percentage"] += float(share.percentage.rstrip('%'))
-                grouped_heirs[heir_id]["count"] += share.quantity
-            
-            for heir_id, data in grouped_heirs.items():
-                heir_name = data["name"]
-                total_amount = data["total_amount"]
-                total_percentage = data["total_percentage"]
-                count = data["count"]
-                
-                if count > 1:
-                    individual_amt = total_amount / count
-                    self.notes.append(f"   • {heir_name}: Rp {total_amount:,.0f} ({total_percentage:.2f}%) → @ Rp {individual_amt:,.0f}/orang")
-                else:
-                    self.notes.append(f"   • {heir_name}: Rp {total_amount:,.0f} ({total_percentage:.2f}%)")
-            
-            logger.info("Calculation completed successfully")
-            
-            # ✅ RETURN SESUAI SCHEMA
-            total_furudh_saham_final = sum(saham for _, saham in furudh_saham)
+                    name_ar=names.get("ar", "Unknown")
+                ),
+                quantity=furudh.quantity,
+                fardh=str(furudh.fardh) if not furudh.is_ashobah else None,
+                share_fraction=f"{saham}/{ashl_akhir}",
+                saham=float(saham),
+                reason=furudh.reason,
+                share_amount=total_amount,
+                percentage=percentage,
+                is_mahjub=False,
+                mahjub_reason=None
+            ))
+            
+            if notes.enabled:
+                group = grouped_heirs.setdefault(furudh.heir_id, [heir_name, 0, 0, 0])
+                group[1] += total_amount
+                group[2] += float(percentage.rstrip('%'))
+                group[3] += furudh.quantity
+            
+            # Log
+            logger.debug("%s: Rp %.0f (%s orang)", heir_name, total_amount, furudh.quantity)
+        
+        for heir_id, quantity, reason in sorted(
+            structure.mahjub, key=lambda item: position.get(item[0], 0)
+        ):
+            names = HEIR_NAMES.get(heir_id, {})
+            shares_result.append(HeirShare(
+                heir=HeirResponse(
+                    id=heir_id,
+                    name_id=names.get("id", "Unknown"),
+                    name_ar=names.get("ar", "Unknown")
+                ),
+                quantity=quantity,
+                fardh=None,
+                share_fraction=f"0/{ashl_akhir}",
+                saham=0.0,
+                reason=reason,
+                share_amount=0.0,
+                percentage="0.00%",
+                is_mahjub=True,
+                mahjub_reason=reason
+            ))
+        
+        # Distribusi Tirkah (Notes)
+        notes.summary("💵 TAHAP 4: Distribusi Tirkah")
+        
+        for heir_name, total_amount, total_percentage, count in grouped_heirs.values():
+            if count > 1:
+                individual_amt = total_amount / count
+                notes.summary("   • {}: Rp {:,.0f} ({:.2f}%) → @ Rp {:,.0f}/orang", heir_name, total_amount, total_percentage, individual_amt)
+            else:
+                notes.summary("   • {}: Rp {:,.0f} ({:.2f}%)", heir_name, total_amount, total_percentage)
+        
+        logger.info("Calculation completed successfully")
+        
+        # ✅ RETURN SESUAI SCHEMA
+        total_furudh_saham_final = sum(saham for _, saham in furudh_saham)
+        
+        return CalculationResult(
+            # Required fields
+            tirkah=self.tirkah,
+            ashlul_masalah_awal=structure.ashl_awal,
+            ashlul_masalah_akhir=ashl_akhir,
+            total_saham=float(total_furudh_saham_final),
+            status=distribution_type,
+            
+            # Boolean flags
+            is_aul=(distribution_type == "Aul"),
+            is_radd=(distribution_type == "Radd"),
+            is_special_case=structure.special_case_name is not None,
+            
+            # Optional fields
+            aul_type=structure.aul_type,
+            special_case_name=structure.special_case_name,
+            calculation_metadata=None,
             
-            return CalculationResult(
-                # Required fields
-                tirkah=self.tirkah,
-                ashlul_masalah_awal=ashl_awal_original if ashl_awal_original else ashl,
-                ashlul_masalah_akhir=ashl_akhir,
-                total_saham=float(total_furudh_saham_final),
-                status=distribution_type,
-                
-                # Boolean flags
-                is_aul=(distribution_type == "Aul"),
-                is_radd=(distribution_type == "Radd"),
-                is_special_case=False,
-                
-                # Optional fields
-                aul_type=None,
-                special_case_name=None,
-                calculation_metadata=None,
-                
-                # Shares list
-                shares=shares_result,
-                
-                # Notes
-                notes=self.notes
-            )
+            # Shares list
+            shares=shares_result,
             
-        except Exception as e:
-            logger.exception(f"ERROR in calculation: {str(e)}")
-            self.notes.append(f"❌ ERROR: {str(e)}")
-            return self._create_error_result(str(e))
+            # Notes
+            notes=notes.render()
+        )
     
-    def _create_error_result(self, error_message: str) -> CalculationResult:
+    def _create_error_result(self, error_message: str, notes: NoteLog) -> CalculationResult:
         """
         Buat CalculationResult untuk error case yang SESUAI SCHEMA
         """
-        logger.error(f"Creating error result: {error_message}")
+        logger.error("Creating error result: %s", error_message)
         
         return CalculationResult(
             tirkah=self.tirkah,
@@ -560,81 +368,306 @@ class FaroidCalculator:
             special_case_name=None,
             calculation_metadata=None,
             shares=[],
-            notes=self.notes + [f"❌ ERROR: {error_message}"]
+            notes=notes.render() + [f"❌ ERROR: {error_message}"]
         )
+
+
+def compute_saham_structure(heirs: List[HeirInput], notes: NoteLog,
+                            furudh_provider: Optional[FurudhProvider] = None) -> Optional[SahamStructure]:
+    """
+    Hitung struktur saham (TAHAP 1-8), tidak bergantung pada tirkah
     
-    def _distribute_ashobah(self, furudh_results: List[FurudhResult], 
-                       sisa_saham: float) -> List[tuple]:
-        """Distribusikan sisa ke ashobah dengan rasio 2:1 untuk laki-laki:perempuan"""
-        ashobah_list = [f for f in furudh_results if f.is_ashobah]
-        
-        if not ashobah_list:
-            return []
-        
-        MALE_ASABAH_IDS = {1, 5, 2, 6, 7, 8, 10, 11, 12, 13, 14, 15}
-        FEMALE_ASABAH_IDS = {16, 17, 21, 22}
+    Args:
+        heirs: Ahli waris dalam bentuk kanonik
+        notes: NoteLog untuk catatan perhitungan
+        furudh_provider: Sumber furudh/hijab yang sudah dievaluasi
+            (None = FurudhEngine); dipakai untuk berbagi evaluasi antar
+            skenario, misalnya skenario Haml
         
-        has_male = any(ashobah.heir_id in MALE_ASABAH_IDS for ashobah in ashobah_list)
-        has_female = any(ashobah.heir_id in FEMALE_ASABAH_IDS for ashobah in ashobah_list)
+    Returns:
+        SahamStructure atau None jika tidak ada ahli waris dengan furudh
+    """
+    # ===== TRACKING INKISAR =====
+    ashl_awal_original = None
+    inkisar_history = []
+    aul_type = None
+    
+    # ===== STEP 1: Tentukan Furudh =====
+    logger.info("STEP 1: Tentukan Furudh")
+    notes.summary("📋 TAHAP 1: Menentukan Furudh Muqaddarah")
+    
+    if furudh_provider is not None:
+        furudh_results, mahjub_reasons = furudh_provider(heirs)
+    else:
+        furudh_engine = FurudhEngine(heirs)
+        furudh_results = furudh_engine.determine_furudh()
+        mahjub_reasons = furudh_engine.mahjub
+    mahjub = tuple(
+        (heir.id, heir.quantity, mahjub_reasons[heir.id])
+        for heir in heirs if heir.id in mahjub_reasons
+    )
+    
+    logger.info("Furudh results: %s items, %s mahjub", len(furudh_results), len(mahjub))
+    
+    if notes.enabled:
+        for furudh in furudh_results:
+            heir_name = HEIR_NAMES.get(furudh.heir_id, {}).get("id", "Unknown")
+            if furudh.is_ashobah:
+                notes.summary("  • {}: Ashobah", heir_name)
+            else:
+                notes.summary("  • {}: {}", heir_name, furudh.fardh)
+        for heir_id, _, reason in mahjub:
+            notes.summary("  • {}: Mahjub", HEIR_NAMES.get(heir_id, {}).get("id", "Unknown"))
+            notes.add("    {}", reason)
+    notes.add("")
+    
+    if not furudh_results:
+        logger.error("Tidak ada ahli waris dengan furudh")
+        notes.add("   ❌ Tidak ada ahli waris dengan furudh!")
+        return None
+    
+    # ===== STEP 2: Hitung Ashl =====
+    logger.info("STEP 2: Hitung Ashl")
+    notes.summary("📊 TAHAP 2: Menghitung Ashl al-Mas'alah")
+
+    # ✅ FIX: Gunakan static method dengan furudh_results
+    if notes.full:
+        ashl_awal, ashl_notes = AshlCalculator.calculate_ashl(furudh_results)
         
-        result = []
+        # Tambahkan notes dari AshlCalculator
+        for note in ashl_notes:
+            notes.add("   {}", note)
+    else:
+        ashl_awal = AshlCalculator.calculate_ashl_value(furudh_results)
+        notes.summary("   Ashl al-Mas'alah = {}", ashl_awal)
+    ashl_awal_original = ashl_awal
+
+    ashl = ashl_awal
+    logger.info("Ashl awal: %s", ashl)
+    
+    # ===== STEP 3: Hitung Saham Furudh =====
+    logger.info("STEP 3: Hitung Saham Furudh")
+
+    furudh_saham = []
+    total_furudh_saham = 0
+
+    for furudh in furudh_results:
+        if not furudh.is_ashobah:
+            # ✅ FIX: Gunakan numerator/denominator, bukan fardh (string)
+            saham = (ashl * furudh.numerator) // furudh.denominator
+            furudh_saham.append((furudh, saham))
+            total_furudh_saham += saham
+            
+            logger.debug("  %s: %s/%s = %s/%s saham", furudh.heir_id,
+                         furudh.numerator, furudh.denominator, saham, ashl)
+    total_furudh_saham_awal = total_furudh_saham
+
+    
+    # ===== STEP 4: Cek Inkisar Furudh =====
+    logger.info("STEP 4: Cek Inkisar Furudh")
+    notes.add("")
+    
+    ashl_after_inkisar, furudh_saham, notes = check_and_apply_inkisar(
+        furudh_saham, ashl, notes
+    )
+    
+    if ashl_after_inkisar != ashl:
+        inkisar_history.append(("Furudh", ashl, ashl_after_inkisar))
+        ashl = ashl_after_inkisar
+        total_furudh_saham = sum(saham for _, saham in furudh_saham)
+    
+    logger.info("Ashl after inkisar: %s", ashl_after_inkisar)
+    ashl_akhir = ashl_after_inkisar
+    
+    # ===== STEP 5: Cek Aul/Radd/Ashobah =====
+    logger.info("STEP 5: Cek Aul/Radd/Ashobah")
+    
+    has_ashobah = any(f.is_ashobah for f in furudh_results)
+    all_ashobah = all(f.is_ashobah for f in furudh_results)
+    
+    notes.add("")
+    
+    if all_ashobah:
+        notes.summary("✅ Semua ahli waris adalah Ashobah")
+        sisa_saham = ashl_akhir
+        distribution_type = "Ashobah"
+    else:
+        sisa_saham = ashl_akhir - total_furudh_saham
+        logger.info("Sisa saham: %s", sisa_saham)
         
-        if has_male and has_female:
-            self.notes.append("  📌 Distribusi Ashobah dengan rasio 2:1 (laki-laki:perempuan)")
+        if sisa_saham == 0:
+            notes.summary("✅ Pembagian PAS (Tidak ada sisa)")
+            distribution_type = "Adil"
+        elif sisa_saham < 0:
+            ashl_akhir = total_furudh_saham
+            sisa_saham = 0
+            
+            logger.warning("AUL: %s → %s", ashl_after_inkisar, ashl_akhir)
+            
+            notes.summary("⚠️ Terjadi AUL (عول)")
+            notes.summary("   Ashl berubah dari {} menjadi {}", ashl_after_inkisar, ashl_akhir)
+            
+            # Klasifikasi 'aul pada ashl awal (sebelum inkisar)
+            aul = classify_aul(ashl_awal_original, total_furudh_saham_awal)
+            aul_type = aul.name
+            notes.add("   {}", aul.message)
+            if not aul.valid:
+                logger.warning("Non-standard aul case")
+                notes.add("   ⚠️ PERINGATAN: Kasus 'aul ini tidak standar!")
+            
+            distribution_type = "Aul"
+        elif has_ashobah:
+            notes.summary("✅ Pembagian ADIL (Ada Ashobah)")
+            notes.summary("   Sisa {} saham untuk Ashobah", sisa_saham)
+            distribution_type = "Adil"
+        else:
+            # ✅ RADD: Kembalikan sisa ke Dzawil Furudh
+            notes.summary("✅ Terjadi RADD (رد)")
+            notes.summary("   Sisa {} saham dari ashl {}", sisa_saham, ashl_akhir)
             
-            total_ratio = 0
-            for ashobah in ashobah_list:
-                if ashobah.heir_id in MALE_ASABAH_IDS:
-                    total_ratio += (2 * ashobah.quantity)
-                else:
-                    total_ratio += (1 * ashobah.quantity)
+            logger.info("RADD DETECTED: %s saham sisa", sisa_saham)
             
-            self.notes.append(f"  Total rasio: {total_ratio}")
+            ashl_akhir, furudh_saham = RaddCalculator(furudh_saham).calculate(notes)
             
-            for ashobah in ashobah_list:
-                heir_name = HEIR_NAMES.get(ashobah.heir_id, {}).get("id", "Unknown")
+            # Ashl radd (kasus 2 dan 3) dibangun dari penyebut zauj/zaujah,
+            # sehingga saham kelompok bisa kembali tidak habis dibagi ruus
+            notes.add("")
+            notes.add("🔹 INKISAR BERTINGKAT - Tahap 2 (Radd)")
+            ashl_after_inkisar_radd, furudh_saham, notes = check_and_apply_inkisar(
+                furudh_saham, ashl_akhir, notes
+            )
+            if ashl_after_inkisar_radd != ashl_akhir:
+                inkisar_history.append(("Radd", ashl_akhir, ashl_after_inkisar_radd))
+                ashl_akhir = ashl_after_inkisar_radd
+            
+            sisa_saham = 0
+            distribution_type = "Radd"
+
+
+
+    
+    # ===== STEP 6-8: Handling Ashobah =====
+    if has_ashobah and sisa_saham > 0:
+        logger.info("STEP 6-8: Handling Ashobah")
+        
+        # Kelompok penerima sisa dan rasio per kepala (2:1 jika
+        # laki-laki dan perempuan bersama)
+        ashobah_engine = AshobahEngine(furudh_results)
+        ruus_ashobah = ashobah_engine.ruus
+        notes.add("   Jenis Ashobah: {}", ashobah_engine.group.kind)
+        
+        if sisa_saham % ruus_ashobah != 0:
+            notes.add("")
+            notes.add("🔹 INKISAR BERTINGKAT - Tahap 2 (Ashobah)")
+            
+            ashl_after_inkisar_ashobah, notes = compute_inkisar_single_group(
+                ruus=ruus_ashobah,
+                saham=sisa_saham,
+                ashl=ashl_akhir,
+                notes=notes
+            )
+            
+            if ashl_after_inkisar_ashobah != ashl_akhir:
+                inkisar_history.append(("Ashobah", ashl_akhir, ashl_after_inkisar_ashobah))
+                
+                multiplier = ashl_after_inkisar_ashobah // ashl_akhir
+                ashl_akhir = ashl_after_inkisar_ashobah
                 
-                if ashobah.heir_id in MALE_ASABAH_IDS:
-                    saham_per_person = (sisa_saham * 2) / total_ratio
-                    total_saham_heir = saham_per_person * ashobah.quantity
-                    
-                    result.append((ashobah, total_saham_heir))
-                    self.notes.append(f"  • {heir_name} (Laki-laki, rasio 2): {total_saham_heir:.2f} saham")
-                    
-                else:
-                    saham_per_person = (sisa_saham * 1) / total_ratio
-                    total_saham_heir = saham_per_person * ashobah.quantity
-                    
-                    result.append((ashobah, total_saham_heir))
-                    self.notes.append(f"  • {heir_name} (Perempuan, rasio 1): {total_saham_heir:.2f} saham")
+                for i, (f, saham) in enumerate(furudh_saham):
+                    furudh_saham[i] = (f, saham * multiplier)
+                sisa_saham = sisa_saham * multiplier
         
-        else:
-            total_people = sum(ashobah.quantity for ashobah in ashobah_list)
-            saham_per_person = sisa_saham / total_people
+        notes.add("")
+        notes.summary("💰 Sisa untuk Ashobah: {} saham", sisa_saham)
+        
+        ashobah_results = distribute_ashobah(ashobah_engine, sisa_saham, notes)
+        
+        for furudh_item, saham_ashobah in (ashobah_results if notes.full else ()):
+            heir_name = HEIR_NAMES.get(furudh_item.heir_id, {}).get("id", "Unknown")
+            
+            if furudh_item.quantity > 1:
+                saham_per_orang = saham_ashobah // furudh_item.quantity
+                notes.add("📌 Distribusi Ashobah merata ({} orang)", furudh_item.quantity)
+                notes.add("   • {}: {} saham", heir_name, saham_ashobah)
+                notes.add("   • Per orang: {} ÷ {} = {} saham/orang", saham_ashobah, furudh_item.quantity, saham_per_orang)
+            else:
+                notes.add("📌 Distribusi Ashobah")
+                notes.add("   • {}: {} saham", heir_name, saham_ashobah)
+        
+        if len(inkisar_history) > 0:
+            notes.add("")
+            notes.add("📋 RINGKASAN INKISAR:")
+            notes.add("   • Ashl Awal (sebelum inkisar): {}", ashl_awal_original)
             
-            self.notes.append(f"  📌 Distribusi Ashobah merata ({total_people} orang)")
+            for i, (tahap, ashl_before, ashl_after) in enumerate(inkisar_history, 1):
+                notes.add("   • Setelah Inkisar Tahap {} ({}): {} → {}", i, tahap, ashl_before, ashl_after)
             
-            for ashobah in ashobah_list:
-                total_saham_heir = saham_per_person * ashobah.quantity
-                result.append((ashobah, total_saham_heir))
-                
-                heir_name = HEIR_NAMES.get(ashobah.heir_id, {}).get("id", "Unknown")
-                self.notes.append(f"  • {heir_name} (Ashobah): {total_saham_heir:.2f} saham")
+            notes.add("   • Ashl Akhir: {}", ashl_akhir)
+            total_multiplier = ashl_akhir // ashl_awal_original
+            notes.add("   • Total Multiplier: {}×", total_multiplier)
         
-        return result
+        furudh_saham.extend(ashobah_results)
+        notes.add("")
+    
+    return SahamStructure(
+        ashl_awal=ashl_awal_original,
+        ashl_akhir=ashl_akhir,
+        status=distribution_type,
+        shares=tuple(furudh_saham),
+        notes=notes.events(),
+        mahjub=mahjub,
+        aul_type=aul_type
+    )
+
+
+def distribute_ashobah(ashobah_engine: AshobahEngine, sisa_saham: int,
+                       notes: NoteLog) -> List[tuple]:
+    """
+    Distribusikan sisa ke ashobah dengan rasio 2:1 untuk laki-laki:perempuan
+    
+    sisa_saham harus habis dibagi jumlah kepala ashobah (inkisar ashobah
+    sudah diterapkan), sehingga semua saham hasilnya bilangan bulat.
+    """
+    group = ashobah_engine.group
+    if group is None:
+        return []
+    
+    if group.mixed:
+        notes.add("  📌 Distribusi Ashobah dengan rasio 2:1 (laki-laki:perempuan)")
+        notes.add("  Total rasio: {}", group.ruus)
+    else:
+        notes.add("  📌 Distribusi Ashobah merata ({} orang)", group.ruus)
+    
+    result = ashobah_engine.distribute(sisa_saham)
     
-    def _calculate_special_case(self, case_name: str) -> CalculationResult:
-        """Placeholder untuk kasus khusus"""
-        logger.warning(f"Special case '{case_name}' not yet implemented")
-        self.notes.append(f"⚠️ Kasus khusus '{case_name}' belum diimplementasikan")
-        return self._create_error_result(f"Special case '{case_name}' not implemented")
+    for ashobah, total_saham_heir in (result if notes.full else ()):
+        heir_name = HEIR_NAMES.get(ashobah.heir_id, {}).get("id", "Unknown")
+        weight = group.weight(ashobah.heir_id)
+        if weight == 0:
+            notes.add("  • {} (Ashobah, kalah peringkat): 0 saham", heir_name)
+        elif not group.mixed:
+            notes.add("  • {} (Ashobah): {} saham", heir_name, total_saham_heir)
+        elif weight == 2:
+            notes.add("  • {} (Laki-laki, rasio 2): {} saham", heir_name, total_saham_heir)
+        else:
+            notes.add("  • {} (Perempuan, rasio 1): {} saham", heir_name, total_saham_heir)
+    
+    return result
+
+
+# Engine kasus khusus: case_id (lihat app.special_cases.registry) ->
+# fungsi (heirs kanonik, NoteLog) -> SahamStructure
+SPECIAL_CASE_ENGINES = {
+    "akdariyyah": akdariyyah_structure,
+    "jadd_ikhwah": jadd_ikhwah_structure,
+    "musytarakah": musytarakah_structure,
+    "gharrawin": gharrawin_structure,
+}
 
 
 def calculate_inheritance(calculation_input: CalculationInput) -> CalculationResult:
     """Function helper untuk menghitung warisan"""
-    logger.info(f"\n{'='*60}")
-    logger.info(f"CALCULATION REQUEST at {datetime.now()}")
-    logger.info(f"{'='*60}")
-    
-    calculator = FaroidCalculator(calculation_input)
-    return calculator.calculate()
+    with request_trace() as traced:
+        logger.info("CALCULATION REQUEST at %s%s", datetime.now(), " (debug trace)" if traced else "")
+        calculator = FaroidCalculator(calculation_input)
+        return calculator.calculate()
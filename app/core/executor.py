@@ -0,0 +1,196 @@
+"""
+Executor untuk perhitungan CPU-bound dari endpoint async
+
+Endpoint FastAPI berjalan di event loop; perhitungan warisan dijalankan di
+thread pool atau process pool supaya satu request berat tidak memblokir
+koneksi lain. Jumlah job yang sedang berjalan + antre dibatasi; jika penuh,
+job baru ditolak (ExecutorBusyError) dan endpoint membalas 503 dengan
+header Retry-After.
+"""
+from __future__ import annotations
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from threading import Lock
+from typing import Any, Callable, Deque, Dict, Optional
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+EXECUTOR_KINDS = ("thread", "process")
+
+
+class ExecutorBusyError(Exception):
+    """Antrian executor penuh"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Server sedang sibuk, coba lagi nanti")
+        self.retry_after = retry_after
+
+
+class CalculationExecutor:
+    """
+    Thread/process pool dengan batas job in-flight
+
+    Args:
+        kind: "thread" atau "process"
+        workers: Jumlah worker
+        max_in_flight: Maksimal job berjalan + antre
+        retry_after: Nilai header Retry-After (detik) saat penuh
+    """
+
+    def __init__(self, kind: str = "thread", workers: int = 4,
+                 max_in_flight: int = 64, retry_after: int = 1):
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(f"Jenis executor tidak dikenal: {kind}")
+        self.kind = kind
+        self.workers = max(workers, 1)
+        self.max_in_flight = max(max_in_flight, 1)
+        self.retry_after = retry_after
+
+        self._pool: Optional[Executor] = None
+        self._lock = Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        # Job wait=True yang menunggu slot; future dibangunkan dengan
+        # call_soon_threadsafe sehingga tidak terikat pada satu event loop
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            if self.kind == "process":
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="faraid-calc"
+                )
+        return self._pool
+
+    def _acquire(self) -> bool:
+        with self._lock:
+            if self.in_flight >= self.max_in_flight:
+                return False
+            self.in_flight += 1
+            return True
+
+    def _release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+            self._wake_next()
+
+    def _wake_next(self) -> None:
+        """Bangunkan satu penunggu slot (dipanggil dengan _lock dipegang)"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            try:
+                waiter.get_loop().call_soon_threadsafe(_wake, waiter)
+            except RuntimeError:
+                # Event loop penunggu sudah ditutup
+                continue
+            return
+
+    async def _wait_for_slot(self) -> None:
+        """Tunggu sampai ada slot kosong lalu ambil slot tersebut"""
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                if self.in_flight < self.max_in_flight:
+                    self.in_flight += 1
+                    return
+                waiter = loop.create_future()
+                self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                with self._lock:
+                    if waiter in self._waiters:
+                        self._waiters.remove(waiter)
+                    elif self.in_flight < self.max_in_flight:
+                        # Sudah dibangunkan tetapi batal: teruskan ke penunggu berikutnya
+                        self._wake_next()
+                raise
+
+    async def run(self, fn: Callable[..., Any], *args, wait: bool = False, **kwargs) -> Any:
+        """
+        Jalankan fungsi sinkron di pool
+
+        Args:
+            fn: Fungsi (untuk process pool harus bisa di-pickle)
+            wait: True = tunggu slot kosong, False = tolak jika penuh
+
+        Raises:
+            ExecutorBusyError: Jika penuh dan wait=False
+        """
+        if wait:
+            await self._wait_for_slot()
+        elif not self._acquire():
+            with self._lock:
+                self.rejected += 1
+            logger.warning("Executor penuh (%d job), request ditolak", self.max_in_flight)
+            raise ExecutorBusyError(self.retry_after)
+
+        try:
+            loop = asyncio.get_running_loop()
+            with self._lock:
+                pool = self._get_pool()
+            return await loop.run_in_executor(pool, partial(fn, *args, **kwargs))
+        finally:
+            self._release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Statistik executor (queue_depth = job yang menunggu worker)"""
+        in_flight = self.in_flight
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "max_in_flight": self.max_in_flight,
+            "in_flight": in_flight,
+            "queue_depth": max(in_flight - self.workers, 0),
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+def _wake(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+_executor: Optional[CalculationExecutor] = None
+_executor_lock = Lock()
+
+
+def get_executor() -> CalculationExecutor:
+    """Executor perhitungan (dibuat sekali per proses dari Settings)"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            from app.config import settings
+            _executor = CalculationExecutor(
+                kind=settings.EXECUTOR_KIND,
+                workers=settings.EXECUTOR_WORKERS,
+                max_in_flight=settings.EXECUTOR_MAX_IN_FLIGHT,
+                retry_after=settings.EXECUTOR_RETRY_AFTER,
+            )
+        return _executor
+
+
+def shutdown_executor() -> None:
+    """Matikan executor (dipanggil saat shutdown aplikasi)"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown()
+            _executor = None
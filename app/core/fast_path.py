@@ -0,0 +1,175 @@
+"""
+Jalur cepat untuk kasus sederhana (trivial estate)
+
+Bentuk yang dikenali: satu jenis ashobah binafsih laki-laki saja (misalnya
+hanya anak laki-laki atau hanya saudara), atau zauj/zaujah ditambah satu
+jenis ashobah tersebut. Hasilnya bisa dihitung langsung:
+
+    ashl    = penyebut fardh zauj/zaujah (1 jika tidak ada)
+    inkisar = zauj/zaujah lebih dari satu, lalu ashobah per kepala
+    status  = "Ashobah" (tanpa zauj/zaujah) atau "Adil"
+
+Fardh dan alasan diambil dari FurudhEngine sekali per pola (template) dan
+pola yang ternyata tidak sederhana (ada mahjub, kasus khusus, atau furudh
+lain) ditandai supaya jalur lengkap dipakai. Jalur cepat hanya dipakai jika
+catatan tidak diminta (verbosity "none"), karena catatan adalah hasil dari
+tahap-tahap yang dilewati.
+"""
+from __future__ import annotations
+from functools import lru_cache
+from math import gcd
+from typing import List, Optional, Tuple
+import logging
+
+from app.schemas.calculation import CalculationResult, HeirShare
+from app.schemas.heir import HeirInput, HeirResponse
+from app.utils.constants import HeirID, HEIR_NAMES, MALE_ASHOBAH
+
+logger = logging.getLogger(__name__)
+
+
+SPOUSE_IDS = frozenset({HeirID.ZAWJ, HeirID.ZAWJAH})
+
+# Template: ((fardh, pembilang, penyebut, alasan) zauj/zaujah atau None, alasan ashobah)
+TrivialTemplate = Tuple[Optional[Tuple[str, int, int, str]], str]
+
+
+@lru_cache(maxsize=256)
+def _trivial_template(ashobah_id: int, spouse_id: Optional[int],
+                      spouse_quantity: int) -> Optional[TrivialTemplate]:
+    """
+    Fardh dan alasan untuk satu pola sederhana dari FurudhEngine
+
+    Returns:
+        TrivialTemplate, atau None jika pola ternyata tidak sederhana
+    """
+    from app.core.furudh_engine import FurudhEngine
+    from app.special_cases.registry import classify_special_case
+
+    heirs = [HeirInput(id=ashobah_id, quantity=1)]
+    if spouse_id is not None:
+        heirs.append(HeirInput(id=spouse_id, quantity=spouse_quantity))
+    if classify_special_case(heirs) is not None:
+        return None
+
+    engine = FurudhEngine(heirs)
+    results = engine.determine_furudh()
+    if engine.mahjub or len(results) != len(heirs):
+        return None
+
+    spouse = None
+    ashobah_reason = None
+    for furudh in results:
+        if furudh.heir_id == ashobah_id and furudh.is_ashobah:
+            ashobah_reason = furudh.reason
+        elif furudh.heir_id == spouse_id and not furudh.is_ashobah and furudh.denominator:
+            spouse = (furudh.fardh, furudh.numerator, furudh.denominator, furudh.reason)
+        else:
+            return None
+    if ashobah_reason is None or (spouse_id is not None and spouse is None):
+        return None
+
+    logger.debug("Template jalur cepat: ashobah %s, zauj/zaujah %s", ashobah_id, spouse_id)
+    return spouse, ashobah_reason
+
+
+def _share(heir_id: int, quantity: int, fardh: Optional[str], saham: int,
+           ashl: int, reason: str, tirkah: float) -> HeirShare:
+    names = HEIR_NAMES.get(heir_id, {})
+    return HeirShare(
+        heir=HeirResponse(
+            id=heir_id,
+            name_id=names.get("id", "Unknown"),
+            name_ar=names.get("ar", "Unknown")
+        ),
+        quantity=quantity,
+        fardh=fardh,
+        share_fraction=f"{saham}/{ashl}",
+        saham=float(saham),
+        reason=reason,
+        share_amount=(tirkah * saham) / ashl,
+        percentage=f"{(saham / ashl) * 100:.2f}%",
+        is_mahjub=False,
+        mahjub_reason=None
+    )
+
+
+def trivial_result(heirs: List[HeirInput], tirkah: float) -> Optional[CalculationResult]:
+    """
+    Hitung kasus sederhana secara langsung
+
+    Args:
+        heirs: Ahli waris (input)
+        tirkah: Harta warisan
+
+    Returns:
+        CalculationResult yang sama persis dengan jalur lengkap (tanpa
+        catatan), atau None jika bukan kasus sederhana
+    """
+    if not heirs or len(heirs) > 2:
+        return None
+
+    ashobah = spouse = None
+    for heir in heirs:
+        if heir.id in MALE_ASHOBAH and ashobah is None:
+            ashobah = heir
+        elif heir.id in SPOUSE_IDS and spouse is None:
+            spouse = heir
+        else:
+            return None
+    if ashobah is None:
+        return None
+
+    template = _trivial_template(
+        ashobah.id,
+        spouse.id if spouse is not None else None,
+        spouse.quantity if spouse is not None else 0,
+    )
+    if template is None:
+        return None
+    spouse_fardh, ashobah_reason = template
+
+    shares = []
+    heads = ashobah.quantity
+    if spouse_fardh is None:
+        # Semua ashobah: ashl 1, inkisar per kepala
+        ashl_awal = 1
+        ashl = heads
+        sisa = heads
+        status = "Ashobah"
+    else:
+        fardh, numerator, denominator, reason = spouse_fardh
+        ashl_awal = denominator
+        spouse_saham = numerator
+
+        # Inkisar furudh: saham zauj/zaujah dibagi jumlah orangnya
+        multiplier = spouse.quantity // gcd(spouse.quantity, spouse_saham)
+        ashl = denominator * multiplier
+        spouse_saham *= multiplier
+
+        # Inkisar ashobah: sisa dibagi jumlah kepala ashobah
+        sisa = ashl - spouse_saham
+        multiplier = heads // gcd(heads, sisa)
+        ashl *= multiplier
+        spouse_saham *= multiplier
+        sisa *= multiplier
+        status = "Adil"
+
+        shares.append(_share(spouse.id, spouse.quantity, fardh, spouse_saham, ashl, reason, tirkah))
+    shares.append(_share(ashobah.id, heads, None, sisa, ashl, ashobah_reason, tirkah))
+
+    return CalculationResult(
+        tirkah=tirkah,
+        ashlul_masalah_awal=ashl_awal,
+        ashlul_masalah_akhir=ashl,
+        total_saham=float(ashl),
+        status=status,
+        is_aul=False,
+        is_radd=False,
+        is_special_case=False,
+        aul_type=None,
+        special_case_name=None,
+        calculation_metadata=None,
+        shares=shares,
+        notes=[]
+    )
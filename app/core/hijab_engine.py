@@ -0,0 +1,249 @@
+"""
+Engine untuk menentukan Hijab Hirman (ahli waris yang terhalang/mahjub)
+Berdasarkan Kitab Zahrotul Faridhah
+
+Setiap ahli waris punya daftar penghalang yang sudah dikompilasi menjadi
+bitmask, sehingga seluruh himpunan mahjub untuk satu kombinasi ahli waris
+dihitung dalam satu putaran (beberapa operasi AND per ahli waris) beserta
+alasannya. Syarat jumlah (misalnya dua anak perempuan atau lebih)
+direpresentasikan sebagai bit tambahan di atas bit HeirID.
+
+Penghalang dicek terhadap ahli waris yang ada, bukan yang tidak mahjub:
+urutan penghalang bertingkat, jadi setiap penghalang yang sendirinya mahjub
+selalu punya penghalang lain yang juga menghalangi ahli waris yang sama.
+"""
+from __future__ import annotations
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from app.schemas.heir import HeirInput
+from app.utils.constants import HeirID, HEIR_NAMES
+from app.utils.bitmask import heir_bit, ids_to_mask
+
+logger = logging.getLogger(__name__)
+
+
+# Bit tambahan untuk syarat jumlah (di atas bit HeirID 1-25)
+BINT_JAMAK_BIT = 1 << 26           # Anak perempuan 2 orang atau lebih
+UKHT_ABAWAYN_JAMAK_BIT = 1 << 27   # Saudari kandung 2 orang atau lebih
+
+FEMALE_DESCENDANT_MASK = ids_to_mask((HeirID.BINT, HeirID.BINT_IBN))
+
+_BASE_BLOCKERS = (HeirID.IBN, HeirID.IBN_IBN, HeirID.ABB)
+_SIBLING_BLOCKERS = _BASE_BLOCKERS + (HeirID.JADD, HeirID.AKH_ABAWAYN, HeirID.AKH_AB)
+_UTERINE_BLOCKERS = (
+    HeirID.IBN, HeirID.BINT, HeirID.IBN_IBN, HeirID.BINT_IBN, HeirID.ABB, HeirID.JADD
+)
+_MALE_NASAB = (
+    HeirID.IBN, HeirID.IBN_IBN, HeirID.ABB, HeirID.JADD,
+    HeirID.AKH_ABAWAYN, HeirID.AKH_AB, HeirID.IBN_AKH_ABAWAYN, HeirID.IBN_AKH_AB,
+    HeirID.AMM_ABAWAYN, HeirID.AMM_AB, HeirID.IBN_AMM_ABAWAYN, HeirID.IBN_AMM_AB,
+)
+
+# Penghalang langsung: ahli waris terhalang jika salah satu penghalang ada.
+# Urutan = prioritas penghalang yang disebut dalam alasan.
+HIJAB_BLOCKERS: Dict[int, Tuple[int, ...]] = {
+    HeirID.IBN_IBN: (HeirID.IBN,),
+    HeirID.JADD: (HeirID.ABB,),
+    HeirID.JADDAH_UMM: (HeirID.UMM,),
+    HeirID.JADDAH_ABB: (HeirID.UMM, HeirID.ABB),
+    HeirID.BINT_IBN: (HeirID.IBN,),
+    HeirID.UKHT_ABAWAYN: _BASE_BLOCKERS,
+    HeirID.UKHT_AB: _BASE_BLOCKERS + (HeirID.AKH_ABAWAYN,),
+    HeirID.AKH_UMM: _UTERINE_BLOCKERS,
+    HeirID.UKHT_UMM: _UTERINE_BLOCKERS,
+    HeirID.AKH_ABAWAYN: _BASE_BLOCKERS,
+    HeirID.AKH_AB: _BASE_BLOCKERS + (HeirID.AKH_ABAWAYN,),
+    HeirID.IBN_AKH_ABAWAYN: _SIBLING_BLOCKERS,
+    HeirID.IBN_AKH_AB: _SIBLING_BLOCKERS + (HeirID.IBN_AKH_ABAWAYN,),
+    HeirID.AMM_ABAWAYN: _SIBLING_BLOCKERS + (HeirID.IBN_AKH_ABAWAYN, HeirID.IBN_AKH_AB),
+    HeirID.AMM_AB: _SIBLING_BLOCKERS + (
+        HeirID.IBN_AKH_ABAWAYN, HeirID.IBN_AKH_AB, HeirID.AMM_ABAWAYN
+    ),
+    HeirID.IBN_AMM_ABAWAYN: _SIBLING_BLOCKERS + (
+        HeirID.IBN_AKH_ABAWAYN, HeirID.IBN_AKH_AB, HeirID.AMM_ABAWAYN, HeirID.AMM_AB
+    ),
+    HeirID.IBN_AMM_AB: _SIBLING_BLOCKERS + (
+        HeirID.IBN_AKH_ABAWAYN, HeirID.IBN_AKH_AB, HeirID.AMM_ABAWAYN, HeirID.AMM_AB,
+        HeirID.IBN_AMM_ABAWAYN
+    ),
+    HeirID.MUTIQ: _MALE_NASAB,
+    HeirID.MUTIQAH: _MALE_NASAB + (HeirID.MUTIQ,),
+}
+
+# Saudari yang menjadi ashobah ma'al-ghair menempati posisi saudara laki-laki
+# sekelasnya, sehingga menghalangi ashobah di bawahnya
+_UKHT_ABAWAYN_MAAL_GHAIR = (
+    heir_bit(HeirID.UKHT_ABAWAYN), FEMALE_DESCENDANT_MASK, 0,
+    "Saudari Kandung yang menjadi ashobah ma'al-ghair (bersama anak/cucu perempuan)"
+)
+_UKHT_AB_MAAL_GHAIR = (
+    heir_bit(HeirID.UKHT_AB), FEMALE_DESCENDANT_MASK, 0,
+    "Saudari Seayah yang menjadi ashobah ma'al-ghair (bersama anak/cucu perempuan)"
+)
+_MAAL_GHAIR_BOTH = (_UKHT_ABAWAYN_MAAL_GHAIR, _UKHT_AB_MAAL_GHAIR)
+
+# Penghalang bersyarat: (bit wajib ada, bit salah satu ada, bit tidak boleh ada,
+# penghalang). Mask "salah satu ada" = 0 berarti tidak disyaratkan.
+HIJAB_CONDITIONAL: Dict[int, Tuple[Tuple[int, int, int, str], ...]] = {
+    HeirID.BINT_IBN: (
+        (BINT_JAMAK_BIT, 0, heir_bit(HeirID.IBN_IBN),
+         "dua Anak Perempuan atau lebih (tidak ada Cucu Laki-laki sebagai mu'ashshib)"),
+    ),
+    HeirID.UKHT_AB: (
+        (UKHT_ABAWAYN_JAMAK_BIT, 0, heir_bit(HeirID.AKH_AB),
+         "dua Saudari Kandung atau lebih (tidak ada Saudara Laki-laki Seayah sebagai mu'ashshib)"),
+        _UKHT_ABAWAYN_MAAL_GHAIR,
+    ),
+    HeirID.AKH_AB: (_UKHT_ABAWAYN_MAAL_GHAIR,),
+    HeirID.IBN_AKH_ABAWAYN: _MAAL_GHAIR_BOTH,
+    HeirID.IBN_AKH_AB: _MAAL_GHAIR_BOTH,
+    HeirID.AMM_ABAWAYN: _MAAL_GHAIR_BOTH,
+    HeirID.AMM_AB: _MAAL_GHAIR_BOTH,
+    HeirID.IBN_AMM_ABAWAYN: _MAAL_GHAIR_BOTH,
+    HeirID.IBN_AMM_AB: _MAAL_GHAIR_BOTH,
+    HeirID.MUTIQ: _MAAL_GHAIR_BOTH,
+    HeirID.MUTIQAH: _MAAL_GHAIR_BOTH,
+}
+
+
+class HijabRule:
+    """
+    Penghalang satu ahli waris yang sudah dikompilasi menjadi bitmask
+
+    Args:
+        heir_id: ID ahli waris yang bisa terhalang
+        blockers: Penghalang langsung (urut prioritas)
+        conditional: Penghalang bersyarat (lihat HIJAB_CONDITIONAL)
+    """
+
+    def __init__(self, heir_id: int, blockers: Tuple[int, ...],
+                 conditional: Tuple[Tuple[int, int, int, str], ...] = ()):
+        self.heir_id = int(heir_id)
+        self.bit = heir_bit(heir_id)
+        self.blocker_mask = ids_to_mask(blockers)
+        self.blockers = tuple((heir_bit(b), HEIR_NAMES[b]["id"]) for b in blockers)
+        self.conditional = conditional
+
+    def blocked_by(self, mask: int) -> Optional[str]:
+        """
+        Cari penghalang untuk himpunan ahli waris
+
+        Args:
+            mask: Bitmask ahli waris yang ada (termasuk bit syarat jumlah)
+
+        Returns:
+            Nama penghalang, atau None jika tidak terhalang
+        """
+        if mask & self.blocker_mask:
+            for bit, name in self.blockers:
+                if mask & bit:
+                    return name
+
+        for required, any_of, forbidden, name in self.conditional:
+            if (mask & required == required
+                    and (not any_of or mask & any_of)
+                    and not mask & forbidden):
+                return name
+
+        return None
+
+
+def compile_hijab_rules() -> Tuple[HijabRule, ...]:
+    """Kompilasi HIJAB_BLOCKERS dan HIJAB_CONDITIONAL"""
+    heir_ids = sorted(set(HIJAB_BLOCKERS) | set(HIJAB_CONDITIONAL))
+    return tuple(
+        HijabRule(heir_id, HIJAB_BLOCKERS.get(heir_id, ()), HIJAB_CONDITIONAL.get(heir_id, ()))
+        for heir_id in heir_ids
+    )
+
+
+COMPILED_HIJAB_RULES = compile_hijab_rules()
+
+# Ahli waris yang bisa terhalang (penyaring cepat)
+HIJABABLE_MASK = ids_to_mask(rule.heir_id for rule in COMPILED_HIJAB_RULES)
+
+
+def hijab_mask(heir_dict: Dict[int, int]) -> int:
+    """
+    Bitmask ahli waris ditambah bit syarat jumlah
+
+    Args:
+        heir_dict: {heir_id: quantity}
+
+    Returns:
+        Bitmask untuk HijabEngine
+    """
+    mask = 0
+    for heir_id, quantity in heir_dict.items():
+        if quantity > 0:
+            mask |= 1 << int(heir_id)
+    if heir_dict.get(HeirID.BINT, 0) >= 2:
+        mask |= BINT_JAMAK_BIT
+    if heir_dict.get(HeirID.UKHT_ABAWAYN, 0) >= 2:
+        mask |= UKHT_ABAWAYN_JAMAK_BIT
+    return mask
+
+
+@lru_cache(maxsize=4096)
+def compute_hijab(mask: int) -> Tuple[int, Tuple[Tuple[int, str], ...]]:
+    """
+    Hitung seluruh himpunan mahjub dalam satu putaran
+
+    Args:
+        mask: Bitmask dari hijab_mask()
+
+    Returns:
+        (bitmask mahjub, ((heir_id, alasan), ...))
+    """
+    mahjub_mask = 0
+    reasons: List[Tuple[int, str]] = []
+
+    if mask & HIJABABLE_MASK:
+        for rule in COMPILED_HIJAB_RULES:
+            if not mask & rule.bit:
+                continue
+            blocker = rule.blocked_by(mask)
+            if blocker is not None:
+                mahjub_mask |= rule.bit
+                name = HEIR_NAMES[rule.heir_id]["id"]
+                reasons.append((rule.heir_id, f"{name} terhalang (mahjub) oleh {blocker}."))
+
+    return mahjub_mask, tuple(reasons)
+
+
+class HijabEngine:
+    """Engine untuk menentukan ahli waris yang mahjub"""
+
+    def __init__(self, heirs: List[HeirInput]):
+        self.heirs = heirs
+        self.heir_dict: Dict[int, int] = {}
+        for heir in heirs:
+            self.heir_dict[heir.id] = self.heir_dict.get(heir.id, 0) + heir.quantity
+        self.mahjub_mask, reasons = compute_hijab(hijab_mask(self.heir_dict))
+        self.reasons: Dict[int, str] = dict(reasons)
+
+    def is_mahjub(self, heir_id: int) -> bool:
+        """Cek apakah ahli waris terhalang"""
+        return bool(self.mahjub_mask & heir_bit(heir_id))
+
+    def get_reason(self, heir_id: int) -> Optional[str]:
+        """Alasan hijab untuk ahli waris (None jika tidak mahjub)"""
+        return self.reasons.get(heir_id)
+
+    def determine_mahjub(self) -> Dict[int, str]:
+        """
+        Tentukan ahli waris yang mahjub
+
+        Returns:
+            Dict {heir_id: alasan}, sesuai urutan prioritas HeirID
+        """
+        if self.reasons:
+            logger.debug("Mahjub: %s", self.reasons)
+        return dict(self.reasons)
+
+
+def determine_mahjub(heirs: List[HeirInput]) -> Dict[int, str]:
+    """Fungsi helper untuk menentukan ahli waris yang mahjub"""
+    return HijabEngine(heirs).determine_mahjub()
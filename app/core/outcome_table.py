@@ -0,0 +1,365 @@
+"""
+Tabel hasil perhitungan yang sudah di-precompute (outcome table)
+
+Builder offline menjalankan FaroidCalculator untuk setiap kombinasi ahli
+waris dalam ruang yang ditentukan (jumlah jenis ahli waris dan jumlah orang
+per jenis), lalu menulis hasilnya ke file biner ringkas. Server membuka file
+tersebut dengan mmap dan menjawab perhitungan dengan satu lookup hash,
+kemudian menskalakan bagian dengan tirkah. Input di luar tabel tetap
+dihitung dengan engine lengkap.
+
+Format file (little endian):
+    header   : magic "FRTB", format version (H), panjang pool string (I),
+               jumlah slot (I), jumlah record (I)
+    pool     : JSON {"ruleset": str, "strings": [str, ...]}
+    slots    : jumlah_slot x (hash Q, offset record + 1 I), 0 = kosong
+    records  : vektor quantity 26 byte, ashl awal (I), ashl akhir (I),
+               index status (H), index jenis 'aul (H), jumlah share (B),
+               lalu per share:
+               heir_id (B), quantity (H), saham (d), index fardh (H),
+               index reason (H), flags (B: bit 0 ashobah, bit 1 mahjub)
+
+Membangun tabel:
+    python -m app.core.outcome_table build faraid_outcomes.bin --max-types 3
+"""
+from __future__ import annotations
+from typing import Dict, Iterator, List, Optional, Tuple
+from itertools import combinations, product
+import argparse
+import json
+import logging
+import mmap
+import struct
+
+from app.schemas.calculation import CalculationInput, CalculationResult, HeirShare
+from app.schemas.heir import HeirInput, HeirResponse
+from app.utils.constants import HeirID, HEIR_NAMES, NoteVerbosity, RULESET_VERSION
+
+logger = logging.getLogger(__name__)
+
+
+MAGIC = b"FRTB"
+FORMAT_VERSION = 3
+
+_HEADER = struct.Struct("<4sHIII")
+_SLOT = struct.Struct("<QI")
+_RECORD_HEAD = struct.Struct("<26sIIHHB")
+_SHARE = struct.Struct("<BHdHHB")
+
+NO_STRING = 0xFFFF
+FLAG_ASHOBAH = 1
+FLAG_MAHJUB = 2
+MAX_QUANTITY = 0xFF
+
+# Ahli waris yang secara nyata hanya mungkin satu orang
+SINGLE_HEIR_IDS = frozenset({
+    HeirID.ABB, HeirID.ZAWJ, HeirID.UMM, HeirID.JADD,
+    HeirID.JADDAH_UMM, HeirID.JADDAH_ABB,
+})
+
+
+def _fnv1a(data: bytes) -> int:
+    """Hash FNV-1a 64-bit (deterministik antar proses, tidak seperti hash())"""
+    h = 0xCBF29CE484222325
+    for byte in data:
+        h ^= byte
+        h = (h * 0x100000001B3) & 0xFFFFFFFFFFFFFFFF
+    return h
+
+
+def shape_key(heirs: List[HeirInput]) -> Optional[bytes]:
+    """
+    Bentuk kunci kanonik (vektor quantity per HeirID) dari daftar ahli waris
+
+    Returns:
+        26 byte vektor quantity, atau None jika input tidak bisa dijawab tabel
+        (ID duplikat atau quantity terlalu besar)
+    """
+    vector = bytearray(26)
+    for heir in heirs:
+        if vector[heir.id] or heir.quantity > MAX_QUANTITY:
+            return None
+        vector[heir.id] = heir.quantity
+    return bytes(vector)
+
+
+def iter_shapes(max_types: int, max_quantity: int) -> Iterator[List[HeirInput]]:
+    """
+    Iterasi semua bentuk ahli waris dalam ruang yang dibangun
+
+    Args:
+        max_types: Maksimal jenis ahli waris dalam satu kasus
+        max_quantity: Maksimal jumlah orang per jenis ahli waris
+    """
+    all_ids = [int(h) for h in HeirID]
+    for size in range(1, max_types + 1):
+        for ids in combinations(all_ids, size):
+            if HeirID.ZAWJ in ids and HeirID.ZAWJAH in ids:
+                continue
+            ranges = [
+                (1,) if hid in SINGLE_HEIR_IDS else range(1, max_quantity + 1)
+                for hid in ids
+            ]
+            for quantities in product(*ranges):
+                yield [HeirInput(id=hid, quantity=q) for hid, q in zip(ids, quantities)]
+
+
+class _StringPool:
+    """Pool string untuk fardh, reason, dan status"""
+
+    def __init__(self):
+        self.strings: List[str] = []
+        self.index: Dict[str, int] = {}
+
+    def add(self, value: Optional[str]) -> int:
+        if value is None:
+            return NO_STRING
+        idx = self.index.get(value)
+        if idx is None:
+            idx = len(self.strings)
+            if idx >= NO_STRING:
+                raise ValueError("String pool outcome table penuh")
+            self.strings.append(value)
+            self.index[value] = idx
+        return idx
+
+
+def build_outcome_table(path: str, max_types: int = 3, max_quantity: int = 3) -> int:
+    """
+    Bangun file outcome table
+
+    Args:
+        path: Lokasi file output
+        max_types: Maksimal jenis ahli waris dalam satu kasus
+        max_quantity: Maksimal jumlah orang per jenis ahli waris
+
+    Returns:
+        Jumlah record yang ditulis
+    """
+    from app.core.calculator import FaroidCalculator
+
+    pool = _StringPool()
+    records: List[Tuple[int, bytes]] = []
+
+    for heirs in iter_shapes(max_types, max_quantity):
+        result = FaroidCalculator(CalculationInput(heirs=heirs, tirkah=1)).calculate()
+        if result.status == "ERROR" or result.is_special_case:
+            continue
+
+        key = shape_key(heirs)
+        chunks = [_RECORD_HEAD.pack(
+            key,
+            result.ashlul_masalah_awal,
+            result.ashlul_masalah_akhir,
+            pool.add(result.status),
+            pool.add(result.aul_type),
+            len(result.shares),
+        )]
+        for share in result.shares:
+            chunks.append(_SHARE.pack(
+                share.heir.id,
+                share.quantity,
+                share.saham,
+                pool.add(share.fardh),
+                pool.add(share.reason),
+                FLAG_MAHJUB if share.is_mahjub else (FLAG_ASHOBAH if share.fardh is None else 0),
+            ))
+        records.append((_fnv1a(key), b"".join(chunks)))
+
+    n_slots = 1
+    while n_slots < len(records) * 2:
+        n_slots <<= 1
+
+    slots = [(0, 0)] * n_slots
+    body = bytearray()
+    for key_hash, record in records:
+        idx = key_hash & (n_slots - 1)
+        while slots[idx][1]:
+            idx = (idx + 1) & (n_slots - 1)
+        slots[idx] = (key_hash, len(body) + 1)
+        body += record
+
+    pool_bytes = json.dumps(
+        {"ruleset": RULESET_VERSION, "strings": pool.strings}, ensure_ascii=False
+    ).encode("utf-8")
+
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, len(pool_bytes), n_slots, len(records)))
+        f.write(pool_bytes)
+        for slot in slots:
+            f.write(_SLOT.pack(*slot))
+        f.write(body)
+
+    logger.info("Outcome table %s: %d record, %d slot", path, len(records), n_slots)
+    return len(records)
+
+
+class OutcomeTable:
+    """Reader outcome table berbasis mmap"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, pool_len, n_slots, n_records = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"File {path} bukan outcome table yang valid")
+
+        pool_start = _HEADER.size
+        pool = json.loads(self._mm[pool_start:pool_start + pool_len].decode("utf-8"))
+        if pool["ruleset"] != RULESET_VERSION:
+            raise ValueError(
+                f"Outcome table dibangun untuk ruleset {pool['ruleset']}, "
+                f"engine saat ini {RULESET_VERSION}"
+            )
+
+        self.strings: List[str] = pool["strings"]
+        self.n_slots = n_slots
+        self.n_records = n_records
+        self._slots_start = pool_start + pool_len
+        self._records_start = self._slots_start + n_slots * _SLOT.size
+
+    def close(self) -> None:
+        self._mm.close()
+
+    def _find(self, key: bytes) -> Optional[int]:
+        """Cari offset record untuk kunci, None jika tidak ada"""
+        key_hash = _fnv1a(key)
+        mask = self.n_slots - 1
+        idx = key_hash & mask
+        while True:
+            slot_hash, offset = _SLOT.unpack_from(self._mm, self._slots_start + idx * _SLOT.size)
+            if not offset:
+                return None
+            if slot_hash == key_hash:
+                pos = self._records_start + offset - 1
+                if self._mm[pos:pos + 26] == key:
+                    return pos
+            idx = (idx + 1) & mask
+
+    def lookup(self, calculation_input: CalculationInput) -> Optional[CalculationResult]:
+        """
+        Jawab perhitungan dari tabel
+
+        Tabel tidak menyimpan catatan langkah perhitungan, jadi hanya dipakai
+        jika catatan tidak diminta (verbosity "none"), sama seperti jalur
+        cepat engine.
+
+        Returns:
+            CalculationResult yang sudah diskalakan dengan tirkah, atau None
+            jika catatan diminta atau bentuk ahli waris tidak ada di tabel
+        """
+        if calculation_input.notes_verbosity != NoteVerbosity.NONE:
+            return None
+
+        heirs = calculation_input.heirs
+        key = shape_key(heirs)
+        if key is None:
+            return None
+
+        pos = self._find(key)
+        if pos is None:
+            return None
+
+        _, ashl_awal, ashl_akhir, status_idx, aul_idx, n_shares = _RECORD_HEAD.unpack_from(self._mm, pos)
+        pos += _RECORD_HEAD.size
+
+        by_heir = {}
+        for _ in range(n_shares):
+            by_heir[self._mm[pos]] = _SHARE.unpack_from(self._mm, pos)
+            pos += _SHARE.size
+
+        # Urutan output sama dengan engine: dzawil furudh, ashobah, lalu
+        # mahjub, masing-masing sesuai urutan input
+        present = [by_heir[h.id] for h in heirs if h.id in by_heir]
+        ordered = [share for share in present if not share[5]]
+        ordered += [share for share in present if share[5] == FLAG_ASHOBAH]
+        ordered += [share for share in present if share[5] == FLAG_MAHJUB]
+
+        tirkah = calculation_input.tirkah
+        strings = self.strings
+        shares = []
+        for heir_id, quantity, saham, fardh_idx, reason_idx, flags in ordered:
+            is_mahjub = flags == FLAG_MAHJUB
+            names = HEIR_NAMES.get(heir_id, {})
+            shares.append(HeirShare(
+                heir=HeirResponse(
+                    id=heir_id,
+                    name_id=names.get("id", "Unknown"),
+                    name_ar=names.get("ar", "Unknown")
+                ),
+                quantity=quantity,
+                fardh=None if fardh_idx == NO_STRING else strings[fardh_idx],
+                share_fraction=f"{int(saham)}/{ashl_akhir}",
+                saham=saham,
+                reason=strings[reason_idx],
+                share_amount=(tirkah * saham) / ashl_akhir,
+                percentage=f"{(saham / ashl_akhir) * 100:.2f}%",
+                is_mahjub=is_mahjub,
+                mahjub_reason=strings[reason_idx] if is_mahjub else None
+            ))
+
+        status = strings[status_idx]
+        return CalculationResult(
+            tirkah=tirkah,
+            ashlul_masalah_awal=ashl_awal,
+            ashlul_masalah_akhir=ashl_akhir,
+            total_saham=float(sum(s[2] for s in ordered)),
+            status=status,
+            is_aul=(status == "Aul"),
+            is_radd=(status == "Radd"),
+            is_special_case=False,
+            aul_type=None if aul_idx == NO_STRING else strings[aul_idx],
+            shares=shares,
+            notes=[]
+        )
+
+
+_loaded_table: Optional[OutcomeTable] = None
+_loaded_path: Optional[str] = None
+
+
+def get_outcome_table(path: Optional[str]) -> Optional[OutcomeTable]:
+    """
+    Buka outcome table sekali per proses
+
+    Args:
+        path: Lokasi file (None = fitur tidak aktif)
+
+    Returns:
+        OutcomeTable atau None jika tidak dikonfigurasi / gagal dibuka
+    """
+    global _loaded_table, _loaded_path
+
+    if not path:
+        return None
+    if _loaded_path == path:
+        return _loaded_table
+
+    _loaded_path = path
+    try:
+        _loaded_table = OutcomeTable(path)
+    except (OSError, ValueError) as e:
+        logger.warning("Outcome table tidak dipakai: %s", e)
+        _loaded_table = None
+    return _loaded_table
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Builder outcome table Kalkulator Faroid")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Bangun file outcome table")
+    build.add_argument("path", help="Lokasi file output")
+    build.add_argument("--max-types", type=int, default=3,
+                       help="Maksimal jenis ahli waris per kasus (default: 3)")
+    build.add_argument("--max-quantity", type=int, default=3,
+                       help="Maksimal jumlah orang per jenis (default: 3)")
+
+    args = parser.parse_args(argv)
+    count = build_outcome_table(args.path, args.max_types, args.max_quantity)
+    print(f"✅ {count} record ditulis ke {args.path}")
+
+
+if __name__ == "__main__":
+    main()
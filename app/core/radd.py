@@ -1,262 +1,188 @@
 """
 Module untuk menghitung RADD (الرَّدُّ)
 Berdasarkan Kitab Zahrotul Faridhah
+
+Radd terjadi jika masih ada sisa saham dan tidak ada ashobah. Sisa
+dikembalikan kepada dzawil furudh selain zauj/zaujah:
+
+- Kasus 1: tanpa zauj/zaujah → ashl akhir = jumlah saham
+- Kasus 2: zauj/zaujah + 1 ahli waris → ashl = penyebut zauj/zaujah,
+  sisanya untuk ahli waris tersebut
+- Kasus 3: zauj/zaujah + lebih dari 1 ahli waris → ashl akhir = jumlah saham
+  radd × penyebut zauj/zaujah, sisa dibagi proporsional
+
+Jika yang ada hanya zauj/zaujah, sisa dikembalikan kepadanya (pendapat
+muta'akhkhirin ketika tidak ada dzawil arham dan baitul mal).
+
+Hasil (ashl akhir, saham akhir, catatan) hanya bergantung pada pola
+(heir_id, fardh, saham) dzawil furudh, sehingga dihitung dengan aritmatika
+integer sekali per pola lalu di-cache.
 """
-from typing import List, Tuple, Dict
-from app.utils.constants import HeirID
-from app.utils.math_helpers import lcm, gcd
+from __future__ import annotations
+from functools import lru_cache
+from math import gcd
+from typing import List, Tuple
+import logging
+
+from app.core.furudh_engine import FurudhResult
+from app.utils.constants import HeirID, HEIR_NAMES
+from app.utils.notes import NoteEvent, NoteLog
+
+logger = logging.getLogger(__name__)
+
+
+SPOUSE_IDS = frozenset({HeirID.ZAWJ, HeirID.ZAWJAH})
+
+# Pola radd: (heir_id, pembilang, penyebut, saham) per dzawil furudh
+RaddPattern = Tuple[Tuple[int, int, int, int], ...]
+
+
+def _heir_name(heir_id: int) -> str:
+    return HEIR_NAMES.get(heir_id, {}).get("id", "Unknown")
+
+
+class RaddPlan:
+    """
+    Hasil radd untuk satu pola dzawil furudh
+
+    Attributes:
+        case: Nomor kasus radd (0 = hanya zauj/zaujah, 1-3 lihat modul)
+        ashl_akhir: Ashl setelah radd
+        saham: Saham akhir, urut sama dengan pola
+        steps: Catatan detail (NoteEvent) untuk NoteLog.add
+    """
+
+    __slots__ = ("case", "ashl_akhir", "saham", "steps")
+
+    def __init__(self, case: int, ashl_akhir: int, saham: Tuple[int, ...],
+                 steps: Tuple[NoteEvent, ...]):
+        self.case = case
+        self.ashl_akhir = ashl_akhir
+        self.saham = saham
+        self.steps = steps
+
+
+@lru_cache(maxsize=4096)
+def resolve_radd(pattern: RaddPattern) -> RaddPlan:
+    """
+    Hitung ashl akhir dan saham radd untuk satu pola
+
+    Args:
+        pattern: Tuple (heir_id, pembilang, penyebut, saham) per dzawil furudh
+            (tanpa ashobah), saham dalam ashl setelah inkisar
+
+    Returns:
+        RaddPlan
+    """
+    spouse = [i for i, entry in enumerate(pattern) if entry[0] in SPOUSE_IDS]
+    recipients = [i for i, entry in enumerate(pattern) if entry[0] not in SPOUSE_IDS]
+    steps: List[NoteEvent] = []
+
+    if not spouse or not recipients:
+        # ===== KASUS 1: RADD TANPA Zauj/Zaujah (atau hanya Zauj/Zaujah) =====
+        if spouse:
+            case = 0
+            steps.append(("   📌 Hanya Zauj/Zaujah: sisa dikembalikan kepadanya", ()))
+        else:
+            case = 1
+            steps.append(("   📌 Kasus 1: Tidak ada Zauj/Zaujah", ()))
+        ashl_akhir = sum(entry[3] for entry in pattern)
+        steps.append(("   Ashl Akhir = Total Saham = {}", (ashl_akhir,)))
+        return RaddPlan(case, ashl_akhir, tuple(entry[3] for entry in pattern), tuple(steps))
+
+    spouse_id, spouse_num, spouse_den, _ = pattern[spouse[0]]
+    saham = [0] * len(pattern)
+
+    if len(recipients) == 1:
+        # ===== KASUS 2: Ada Zauj/Zaujah + 1 Ahli Waris =====
+        steps.append(("   📌 Kasus 2: Ada Zauj/Zaujah + 1 Ahli Waris", ()))
+        steps.append(("   Penyebut Zauj/Zaujah ({}) → Ashl Mas'alah", (spouse_den,)))
+
+        # Zauj/Zaujah mendapat fardh-nya, sisanya (fardh + radd) untuk
+        # satu-satunya ahli waris lain
+        ashl_akhir = spouse_den
+        spouse_saham = spouse_num
+        sisa = ashl_akhir - spouse_saham
+        for i, (heir_id, num, den, _) in enumerate(pattern):
+            if i in spouse:
+                saham[i] = spouse_saham
+                steps.append(("   • {}: {}/{} × {} = {}",
+                              (_heir_name(heir_id), num, den, ashl_akhir, spouse_saham)))
+            else:
+                saham[i] = sisa
+                steps.append(("   • {}: {} - {} = {} (fardh + radd)",
+                              (_heir_name(heir_id), ashl_akhir, spouse_saham, sisa)))
+        return RaddPlan(2, ashl_akhir, tuple(saham), tuple(steps))
+
+    # ===== KASUS 3: Ada Zauj/Zaujah + Lebih dari 1 Ahli Waris =====
+    steps.append(("   📌 Kasus 3: Ada Zauj/Zaujah + {} Ahli Waris", (len(recipients),)))
+    steps.append(("   Penyebut Zauj/Zaujah: {}", (spouse_den,)))
+
+    ashl_dzawil = 1
+    for i in recipients:
+        den = pattern[i][2]
+        ashl_dzawil = ashl_dzawil * den // gcd(ashl_dzawil, den)
+    steps.append(("   LCM penyebut Dzawil Furudh: {}", (ashl_dzawil,)))
+
+    saham_radd = {}
+    for i in recipients:
+        heir_id, num, den, _ = pattern[i]
+        saham_radd[i] = num * ashl_dzawil // den
+        steps.append(("   • {}: {}/{} × {} = {}",
+                      (_heir_name(heir_id), num, den, ashl_dzawil, saham_radd[i])))
+    total_radd = sum(saham_radd.values())
+    steps.append(("   Total Saham Radd: {}", (total_radd,)))
+
+    ashl_akhir = total_radd * spouse_den
+    steps.append(("   Ashl Akhir = {} × {} = {}", (total_radd, spouse_den, ashl_akhir)))
+    spouse_saham = spouse_num * total_radd
+    steps.append(("   Zauj/Zaujah: {}/{} × {} = {}", (spouse_num, spouse_den, ashl_akhir, spouse_saham)))
+
+    # sisa = total_radd × (penyebut - pembilang zauj), jadi setiap bagian
+    # proporsional selalu bulat
+    sisa = ashl_akhir - spouse_saham
+    steps.append(("   Sisa untuk Radd: {} - {} = {}", (ashl_akhir, spouse_saham, sisa)))
+    factor = spouse_den - spouse_num
+    for i, entry in enumerate(pattern):
+        saham[i] = spouse_saham if i in spouse else saham_radd[i] * factor
+        steps.append(("   • {}: {} saham (akhir)", (_heir_name(entry[0]), saham[i])))
+    return RaddPlan(3, ashl_akhir, tuple(saham), tuple(steps))
 
 
 class RaddCalculator:
-    """Calculator untuk kasus Radd"""
-    
-    def __init__(self, furudh_results, tirkah: float):
-        self.furudh_results = furudh_results
-        self.tirkah = tirkah
-        
-        # ID Zauj dan Zaujah
-        self.SPOUSE_IDS = {HeirID.ZAWJ, HeirID.ZAWJAH}
-    
-    def check_radd_condition(self) -> Tuple[bool, int]:
-        """
-        Cek apakah terjadi radd dan hitung ashl awal
-        
-        Returns:
-            (is_radd, ashl_awal)
-        """
-        # Hitung total saham dzawil furudh
-        total_saham = sum(
-            f.numerator for f in self.furudh_results 
-            if not f.is_ashobah
+    """
+    Calculator untuk kasus Radd
+
+    Args:
+        furudh_saham: List (FurudhResult, saham) dzawil furudh setelah inkisar
+    """
+
+    def __init__(self, furudh_saham: List[Tuple[FurudhResult, int]]):
+        self.furudh_saham = furudh_saham
+
+    def pattern(self) -> RaddPattern:
+        """Kunci cache radd untuk ahli waris ini"""
+        return tuple(
+            (f.heir_id, f.numerator, f.denominator, int(saham))
+            for f, saham in self.furudh_saham
         )
-        
-        # Hitung ashl (KPK dari penyebut)
-        denominators = [
-            f.denominator for f in self.furudh_results 
-            if not f.is_ashobah and f.denominator > 0
-        ]
-        ashl = denominators[0]
-        for d in denominators[1:]:
-            ashl = lcm(ashl, d)
-        
-        # Radd terjadi jika total < ashl dan tidak ada ashobah
-        has_ashobah = any(f.is_ashobah for f in self.furudh_results)
-        
-        if total_saham < ashl and not has_ashobah:
-            return True, ashl
-        
-        return False, ashl
-    
-    def calculate_radd(self) -> Tuple[int, int, List[Tuple], List[str]]:
-        """
-        Hitung Radd berdasarkan 3 kasus
-        
-        Returns:
-            (ashl_awal, ashl_akhir, radd_shares, notes)
+
+    def calculate(self, notes: NoteLog) -> Tuple[int, List[Tuple[FurudhResult, int]]]:
         """
-        notes = []
-        
-        # Cek apakah ada zauj/zaujah
-        has_spouse = any(
-            f.heir_id in self.SPOUSE_IDS 
-            for f in self.furudh_results
-        )
-        
-        # Pisahkan ahli waris yang dapat radd (bukan zauj/zaujah)
-        radd_heirs = [
-            f for f in self.furudh_results 
-            if f.heir_id not in self.SPOUSE_IDS and not f.is_ashobah
-        ]
-        
-        if not has_spouse:
-            # KASUS 1: Tanpa Zauj/Zaujah
-            return self._calculate_radd_without_spouse(radd_heirs, notes)
-        
-        elif len(radd_heirs) == 1:
-            # KASUS 2: Ada Zauj/Zaujah + Ahli Waris Cuma 1
-            return self._calculate_radd_one_heir(radd_heirs, notes)
-        
-        else:
-            # KASUS 3: Ada Zauj/Zaujah + Ahli Waris > 1
-            return self._calculate_radd_multiple_heirs(radd_heirs, notes)
-    
-    def _calculate_radd_without_spouse(self, radd_heirs, notes):
-        """Kasus 1: Tanpa Zauj/Zaujah"""
-        notes.append("🔹 KASUS RADD 1: Tanpa Zauj/Zaujah")
-        notes.append("   Jumlah saham dijadikan Ashl Mas'alah")
-        
-        # Hitung ashl awal (KPK penyebut)
-        denominators = [h.denominator for h in radd_heirs]
-        ashl_awal = denominators[0]
-        for d in denominators[1:]:
-            ashl_awal = lcm(ashl_awal, d)
-        
-        # Hitung saham masing-masing
-        total_saham = 0
-        shares = []
-        for heir in radd_heirs:
-            saham = (ashl_awal // heir.denominator) * heir.numerator
-            total_saham += saham
-            shares.append((heir, saham))
-        
-        # Ashl akhir = total saham
-        ashl_akhir = total_saham
-        
-        notes.append(f"   Ashl Awal: {ashl_awal}")
-        notes.append(f"   Total Saham: {total_saham}")
-        notes.append(f"   Ashl Akhir: {ashl_akhir}")
-        
-        return ashl_awal, ashl_akhir, shares, notes
-    
-    def _calculate_radd_one_heir(self, radd_heirs, notes):
-        """Kasus 2: Ada Zauj/Zaujah + 1 Ahli Waris"""
-        notes.append("🔹 KASUS RADD 2: Ada Zauj/Zaujah + 1 Ahli Waris")
-        notes.append("   Penyebut zauj dijadikan Ashl, buat perbandingan")
-        
-        # Get zauj/zaujah
-        spouse = next(
-            f for f in self.furudh_results 
-            if f.heir_id in self.SPOUSE_IDS
-        )
-        
-        # Ashl awal = penyebut zauj
-        ashl_awal = spouse.denominator
-        
-        # Saham zauj
-        zauj_saham = (ashl_awal // spouse.denominator) * spouse.numerator
-        
-        # Sisa untuk radd
-        sisa = ashl_awal - zauj_saham
-        
-        # Ahli waris radd dapat sisa
-        heir = radd_heirs[0]
-        heir_saham_awal = (ashl_awal // heir.denominator) * heir.numerator
-        heir_saham_radd = heir_saham_awal + sisa
-        
-        shares = [
-            (spouse, zauj_saham),
-            (heir, heir_saham_radd)
-        ]
-        
-        ashl_akhir = ashl_awal
-        
-        notes.append(f"   Ashl (dari penyebut zauj): {ashl_awal}")
-        notes.append(f"   Zauj: {zauj_saham} saham")
-        notes.append(f"   Sisa untuk radd: {sisa}")
-        notes.append(f"   Ahli waris radd: {heir_saham_awal} + {sisa} = {heir_saham_radd}")
-        
-        return ashl_awal, ashl_akhir, shares, notes
-    
-    def _calculate_radd_multiple_heirs(self, radd_heirs, notes):
-        """Kasus 3: Ada Zauj/Zaujah + >1 Ahli Waris (INKISAR)"""
-        notes.append("🔹 KASUS RADD 3: Ada Zauj/Zaujah + Ahli Waris > 1")
-        
-        from app.utils.constants import HEIR_NAMES
-        from app.utils.math_helpers import lcm
-        
-        # Get zauj/zaujah
-        spouse = next(
-            f for f in self.furudh_results 
-            if f.heir_id in self.SPOUSE_IDS
-        )
-        
-        # LANGKAH A: Penyebut zauj dijadikan Ashl zauj
-        ashl_zauj = spouse.denominator
-        zauj_numerator = spouse.numerator
-        notes.append(f"   a) Ashl dari penyebut zauj/zaujah: {ashl_zauj}")
-        notes.append(f"   Zauj/Zaujah: {zauj_numerator}/{ashl_zauj}")
-        
-        # LANGKAH B: Hitung Ashl baru untuk ahli waris radd
-        denominators_radd = [h.denominator for h in radd_heirs]
-        ashl_radd = denominators_radd[0]
-        for d in denominators_radd[1:]:
-            ashl_radd = lcm(ashl_radd, d)
-        
-        notes.append(f"   b) Ashl baru untuk ahli waris radd: {ashl_radd}")
-        
-        # Hitung saham ahli waris radd (proporsi dari ashl_radd)
-        total_saham_radd = 0
-        radd_saham_list = []
-        for heir in radd_heirs:
-            saham = (ashl_radd // heir.denominator) * heir.numerator
-            total_saham_radd += saham
-            radd_saham_list.append((heir, saham))
-            
-            heir_name = HEIR_NAMES.get(heir.heir_id, {}).get("id", "Unknown")
-            notes.append(f"     • {heir_name}: {saham}/{ashl_radd}")
-        
-        notes.append(f"   Total saham ahli waris radd: {total_saham_radd}/{ashl_radd}")
-        
-        # ===== HITUNG AM AWAL (LCM SEMUA PENYEBUT) =====
-        # Ini untuk cek "terbagi utuh" dengan benar
-        all_denominators = [spouse.denominator] + denominators_radd
-        ashl_awal_full = all_denominators[0]
-        for d in all_denominators[1:]:
-            ashl_awal_full = lcm(ashl_awal_full, d)
-        
-        notes.append(f"   AM Awal (semua furudh): {ashl_awal_full}")
-        
-        # Zauj saham di AM Awal
-        zauj_saham_di_ashl_awal = (ashl_awal_full // ashl_zauj) * zauj_numerator
-        
-        # Total saham radd di AM Awal
-        total_radd_di_ashl_awal = 0
-        for heir in radd_heirs:
-            saham = (ashl_awal_full // heir.denominator) * heir.numerator
-            total_radd_di_ashl_awal += saham
-        
-        # Sisa setelah zauj
-        sisa = ashl_awal_full - zauj_saham_di_ashl_awal
-        notes.append(f"   Zauj di AM Awal: {zauj_saham_di_ashl_awal}, Sisa: {sisa}")
-        
-        # LANGKAH C: Cek apakah SISA habis dibagi TOTAL_RADD
-        if sisa % total_saham_radd == 0:
-            # ===== TERBAGI UTUH =====
-            ashl_akhir = ashl_awal_full
-            faktor_radd = sisa // total_saham_radd
-            
-            notes.append(f"   c) Sudah bisa terbagi utuh")
-            notes.append(f"   Sisa {sisa} ÷ {total_saham_radd} = {faktor_radd} (bulat)")
-            notes.append(f"   Ashl Akhir: {ashl_akhir}")
-            
-            shares = [(spouse, zauj_saham_di_ashl_awal)]
-            
-            for heir, saham_radd in radd_saham_list:
-                final_saham = saham_radd * faktor_radd
-                shares.append((heir, final_saham))
-                
-                heir_name = HEIR_NAMES.get(heir.heir_id, {}).get("id", "Unknown")
-                notes.append(f"     • {heir_name}: {saham_radd} × {faktor_radd} = {final_saham}/{ashl_akhir}")
-            
-            return ashl_zauj, ashl_akhir, shares, notes
-        
-        else:
-            # ===== INKISAR (TIDAK TERBAGI UTUH) =====
-            notes.append(f"   d) Belum bisa terbagi utuh → INKISAR (Muqasamah)")
-            
-            # AM Akhir = total_saham_radd × ashl_zauj
-            ashl_akhir = total_saham_radd * ashl_zauj
-            notes.append(f"   {total_saham_radd} × {ashl_zauj} = {ashl_akhir}")
-            
-            # Zauj/Zaujah saham = zauj_numerator × total_saham_radd
-            zauj_saham = zauj_numerator * total_saham_radd
-            notes.append(f"   Zauj: {zauj_numerator} × {total_saham_radd} = {zauj_saham}/{ashl_akhir}")
-            
-            # Sisa untuk radd
-            sisa_inkisar = ashl_akhir - zauj_saham
-            notes.append(f"   Sisa untuk radd: {sisa_inkisar}")
-            
-            shares = [(spouse, zauj_saham)]
-            
-            # Distribusi sisa proporsional ke ahli waris radd
-            for heir, saham_radd in radd_saham_list:
-                # Formula: (saham_radd / total_saham_radd) × sisa
-                final_saham = (saham_radd * sisa_inkisar) // total_saham_radd
-                shares.append((heir, final_saham))
-                
-                heir_name = HEIR_NAMES.get(heir.heir_id, {}).get("id", "Unknown")
-                notes.append(f"   {heir_name}: ({saham_radd}/{total_saham_radd}) × {sisa_inkisar} = {final_saham}/{ashl_akhir}")
-            
-            return ashl_zauj, ashl_akhir, shares, notes
+        Hitung radd
 
+        Args:
+            notes: NoteLog untuk catatan detail
 
+        Returns:
+            Tuple (ashl akhir, list (FurudhResult, saham akhir)); saham
+            diperbarui di tempat pada list furudh_saham yang diberikan
+        """
+        plan = resolve_radd(self.pattern())
+        if notes.full:
+            notes.extend_events(plan.steps)
+        logger.info("   RADD Kasus %s: ashl_akhir = %s", plan.case, plan.ashl_akhir)
+        furudh_saham = self.furudh_saham
+        for i, saham in enumerate(plan.saham):
+            furudh_saham[i] = (furudh_saham[i][0], saham)
+        return plan.ashl_akhir, furudh_saham
@@ -0,0 +1,128 @@
+"""
+Cache hasil perhitungan saham yang tidak bergantung pada tirkah
+
+Struktur saham (ashl, 'aul/radd, inkisar, saham per ahli waris) hanya
+ditentukan oleh himpunan ahli waris. Cache ini menyimpan struktur tersebut
+dengan kunci kanonik (ID terurut, ID duplikat digabung) ditambah versi
+ruleset, sehingga request dengan keluarga yang sama tetapi tirkah berbeda
+hanya menghitung ulang nominal rupiah.
+"""
+from __future__ import annotations
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from app.schemas.heir import HeirInput
+from app.utils.constants import RULESET_VERSION
+
+
+def canonical_heirs(heirs: List[HeirInput]) -> Tuple[Tuple[int, int], ...]:
+    """
+    Bentuk kanonik daftar ahli waris
+
+    ID duplikat digabung (quantity dijumlahkan) dan hasilnya diurutkan per ID.
+
+    Returns:
+        Tuple ((heir_id, quantity), ...)
+    """
+    merged: Dict[int, int] = {}
+    for heir in heirs:
+        merged[heir.id] = merged.get(heir.id, 0) + heir.quantity
+    return tuple(sorted(merged.items()))
+
+
+class HeirRecord:
+    """
+    Ahli waris kanonik untuk perhitungan internal
+
+    Pengganti ringan HeirInput (tanpa validasi pydantic) untuk ahli waris
+    yang dibangun ulang dari kunci kanonik; engine hanya membaca id dan
+    quantity.
+    """
+
+    __slots__ = ("id", "quantity")
+
+    def __init__(self, id: int, quantity: int):
+        self.id = id
+        self.quantity = quantity
+
+
+def heir_records(canonical: Tuple[Tuple[int, int], ...]) -> List[HeirRecord]:
+    """HeirRecord dari bentuk kanonik (lihat canonical_heirs)"""
+    return [HeirRecord(heir_id, quantity) for heir_id, quantity in canonical]
+
+
+def make_cache_key(heirs: List[HeirInput], *extra: Hashable) -> Tuple:
+    """Kunci cache: versi ruleset + bentuk kanonik ahli waris (+ opsi tambahan)"""
+    return (RULESET_VERSION, canonical_heirs(heirs)) + extra
+
+
+class LRUCache:
+    """LRU cache thread-safe dengan batas ukuran dan counter statistik"""
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Ambil nilai dari cache (None jika tidak ada)"""
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Simpan nilai, buang entri paling lama jika melebihi batas"""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def resize(self, maxsize: int) -> None:
+        """Ubah batas ukuran cache"""
+        with self._lock:
+            self.maxsize = maxsize
+            while len(self._data) > max(maxsize, 0):
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Kosongkan cache dan reset counter"""
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """Statistik cache"""
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "ruleset": RULESET_VERSION,
+        }
+
+
+def _default_size() -> int:
+    from app.config import settings
+    return settings.RESULT_CACHE_SIZE
+
+
+# Cache struktur saham untuk FaroidCalculator
+saham_cache = LRUCache(_default_size())
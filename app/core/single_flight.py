@@ -0,0 +1,92 @@
+"""
+Penggabungan (coalescing) request identik yang sedang berjalan
+
+Jika beberapa request dengan input yang persis sama (ahli waris beserta
+urutannya, tirkah, dan opsi) datang bersamaan, hanya request pertama yang
+menjalankan perhitungan; request lain menunggu hasil yang sama. Hasil
+dibagikan ke semua peminta, jadi jangan diubah setelah dikembalikan.
+"""
+from __future__ import annotations
+from threading import Lock
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+import asyncio
+import logging
+
+from app.schemas.calculation import CalculationInput
+from app.utils.constants import RULESET_VERSION
+
+logger = logging.getLogger(__name__)
+
+
+def calculation_key(calculation_input: CalculationInput) -> Tuple:
+    """Kunci coalescing: semua field input yang mempengaruhi hasil"""
+    return (
+        RULESET_VERSION,
+        tuple((heir.id, heir.quantity) for heir in calculation_input.heirs),
+        calculation_input.tirkah,
+        calculation_input.notes_verbosity,
+    )
+
+
+class SingleFlight:
+    """Single-flight untuk coroutine dalam satu event loop"""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._lock = Lock()
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Jalankan fn() sekali untuk semua pemanggil dengan key yang sama
+
+        Args:
+            key: Kunci input (hashable)
+            fn: Factory coroutine yang melakukan perhitungan
+
+        Returns:
+            Hasil fn() (objek yang sama untuk semua pemanggil)
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self.calls += 1
+            future = self._inflight.get(key)
+            if future is not None and future.get_loop() is loop:
+                self.coalesced += 1
+                leader = False
+            else:
+                future = loop.create_future()
+                self._inflight[key] = future
+                leader = True
+
+        if not leader:
+            # shield: pembatalan satu follower tidak membatalkan perhitungan
+            return await asyncio.shield(future)
+
+        try:
+            result = await fn()
+        except BaseException as e:
+            future.set_exception(e)
+            # Hindari warning "exception was never retrieved" jika tanpa follower
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                if self._inflight.get(key) is future:
+                    del self._inflight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """Statistik coalescing"""
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight),
+        }
+
+
+# Single-flight untuk endpoint /calculation/calculate
+calculation_flight = SingleFlight()
@@ -8,6 +8,16 @@ from fastapi.responses import JSONResponse
 
 from app.config import settings
 from app.api.v1.router import api_router
+from app.core.result_cache import saham_cache
+from app.core.batch import shutdown_pool
+from app.core.executor import get_executor, shutdown_executor
+from app.core.single_flight import calculation_flight
+from app.utils.timing import stage_stats
+from app.utils.logging_config import setup_logging, shutdown_logging
+
+
+# Pipeline logging non-blocking (QueueHandler/QueueListener)
+setup_logging(settings)
 
 
 # Create FastAPI app
@@ -51,7 +61,11 @@ async def health_check():
         "app": settings.APP_NAME,
         "version": settings.APP_VERSION,
         "database": "connected",  # TODO: Add actual DB check
-        "environment": settings.ENVIRONMENT
+        "environment": settings.ENVIRONMENT,
+        "result_cache": saham_cache.stats(),
+        "executor": get_executor().stats(),
+        "coalescing": calculation_flight.stats(),
+        "stages": stage_stats.stats()
     }
 
 
@@ -71,6 +85,9 @@ async def startup_event():
 async def shutdown_event():
     """Shutdown event handler"""
     print(f"👋 {settings.APP_NAME} shutting down...")
+    shutdown_executor()
+    shutdown_pool()
+    shutdown_logging()
     
 # Global exception handler
 @app.exception_handler(Exception)
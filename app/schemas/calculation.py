@@ -7,12 +7,17 @@ Schemas untuk Perhitungan Warisan
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 from .heir import HeirInput, HeirResponse
+from app.utils.constants import NoteVerbosity
 
 
 class CalculationInput(BaseModel):
     """Schema untuk input perhitungan warisan"""
     heirs: List[HeirInput] = Field(..., description="Daftar ahli waris")
     tirkah: float = Field(..., description="Jumlah harta warisan (tirkah)", gt=0)
+    notes_verbosity: NoteVerbosity = Field(
+        NoteVerbosity.FULL,
+        description="Detail catatan perhitungan: none, summary, atau full"
+    )
     
     class Config:
         json_schema_extra = {
@@ -119,3 +124,26 @@ class CalculationResult(BaseModel):
                 ]
             }
         }
+
+
+class BatchCalculationInput(BaseModel):
+    """Schema untuk input perhitungan batch"""
+    items: List[CalculationInput] = Field(..., description="Daftar kasus warisan", min_length=1)
+
+
+class BatchItemResult(BaseModel):
+    """Hasil satu item dalam perhitungan batch"""
+    index: int = Field(..., description="Posisi item pada input")
+    status: str = Field(..., description="Status: success atau error")
+    result: Optional[CalculationResult] = Field(None, description="Hasil perhitungan")
+    error: Optional[str] = Field(None, description="Pesan error jika gagal")
+
+
+class BatchCalculationResult(BaseModel):
+    """Schema untuk hasil perhitungan batch"""
+    total_items: int = Field(..., description="Jumlah item pada input")
+    unique_shapes: int = Field(..., description="Jumlah bentuk ahli waris unik yang dihitung")
+    deduplicated: int = Field(..., description="Jumlah item yang memakai hasil bentuk yang sama")
+    failed: int = Field(0, description="Jumlah item yang gagal")
+    duration_ms: float = Field(..., description="Durasi perhitungan batch (milidetik)")
+    items: List[BatchItemResult] = Field(..., description="Hasil per item sesuai urutan input")
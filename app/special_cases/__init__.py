@@ -3,20 +3,43 @@ Special Cases untuk Perhitungan Warisan
 Meliputi: Akdariyyah, Jadd Ikhwah, Musytarakah, Gharrawin, Haml, Khuntsa, Gharqa, Munasakhot
 """
 
+from .registry import (
+    CaseSignature,
+    SpecialCaseRegistry,
+    special_case_registry,
+    classify_special_case,
+)
 from .akdariyyah import is_akdariyyah, calculate_akdariyyah
+from .akdariyyah import SIGNATURE as AKDARIYYAH_SIGNATURE
 from .jadd_ikhwah import is_jadd_ikhwah, calculate_jadd_ikhwah
+from .jadd_ikhwah import SIGNATURE as JADD_IKHWAH_SIGNATURE
 from .musytarakah import is_musytarakah, calculate_musytarakah
+from .musytarakah import SIGNATURE as MUSYTARAKAH_SIGNATURE
 from .gharrawin import is_gharrawin, calculate_gharrawin
+from .gharrawin import SIGNATURE as GHARRAWIN_SIGNATURE
 from .haml import calculate_haml
 from .khuntsa import calculate_khuntsa
-from .gharqa import calculate_gharqa
+from .gharqa import calculate_gharqa, calculate_gharqa_parallel
 from .munasakhot import (
     calculate_munasakhot, 
     calculate_munasakhot_simple,
     MunasakhotCase
 )
 
+# Urutan pendaftaran = prioritas klasifikasi
+for _signature in (
+    AKDARIYYAH_SIGNATURE,
+    JADD_IKHWAH_SIGNATURE,
+    MUSYTARAKAH_SIGNATURE,
+    GHARRAWIN_SIGNATURE,
+):
+    special_case_registry.register(_signature)
+
 __all__ = [
+    'CaseSignature',
+    'SpecialCaseRegistry',
+    'special_case_registry',
+    'classify_special_case',
     'is_akdariyyah',
     'calculate_akdariyyah',
     'is_jadd_ikhwah',
@@ -28,6 +51,7 @@ __all__ = [
     'calculate_haml',
     'calculate_khuntsa',
     'calculate_gharqa',
+    'calculate_gharqa_parallel',
     'calculate_munasakhot',
     'calculate_munasakhot_simple',
     'MunasakhotCase',
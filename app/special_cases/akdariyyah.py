@@ -5,132 +5,117 @@ Mas'alah Akdariyyah (المسألة الأكدرية)
 Kasus: Zawj + Umm + Jadd + Ukht Kandung (tanpa anak/ayah)
 """
 
+from math import gcd
 from typing import List
-from app.schemas.calculation import CalculationResult, HeirShare
-from app.schemas.heir import HeirInput, HeirResponse
-from app.utils.constants import HeirID, HEIR_NAMES
+from app.schemas.calculation import CalculationInput, CalculationResult
+from app.schemas.heir import HeirInput
+from app.utils.constants import HeirID
+from app.special_cases.registry import CaseSignature
+from app.utils.aul_validator import classify_aul
+from app.utils.notes import NoteLog
+
+
+SPECIAL_CASE_NAME = "Akdariyyah"
+
+
+# Syarat:
+# - Ada Zawj (suami), Umm (ibu), Jadd (kakek), dan tepat 1 Ukht Kandung
+# - Tidak ada anak/cucu, Abb (ayah), maupun saudara/i lain
+#   (dengan saudara/i lain kasusnya menjadi Jadd ma'al-Ikhwah biasa)
+SIGNATURE = CaseSignature(
+    "akdariyyah",
+    required=(HeirID.ZAWJ, HeirID.UMM, HeirID.JADD, HeirID.UKHT_ABAWAYN),
+    forbidden=(
+        HeirID.ABB, HeirID.IBN, HeirID.BINT, HeirID.IBN_IBN, HeirID.BINT_IBN,
+        HeirID.AKH_ABAWAYN, HeirID.AKH_AB, HeirID.UKHT_AB,
+    ),
+    counts={HeirID.UKHT_ABAWAYN: (1, 1)},
+)
 
 
 def is_akdariyyah(heirs: List[HeirInput]) -> bool:
-    """
-    Cek apakah kasus Akdariyyah
-    
-    Syarat:
-    - Ada Zawj (suami)
-    - Ada Umm (ibu)
-    - Ada Jadd (kakek)
-    - Ada minimal 1 Ukht Kandung
-    - Tidak ada anak/cucu
-    - Tidak ada Abb (ayah)
-    """
-    heir_dict = {h.id: h.quantity for h in heirs}
-    
-    has_zawj = heir_dict.get(HeirID.ZAWJ, 0) > 0
-    has_umm = heir_dict.get(HeirID.UMM, 0) > 0
-    has_jadd = heir_dict.get(HeirID.JADD, 0) > 0
-    has_ukht = heir_dict.get(HeirID.UKHT_ABAWAYN, 0) > 0
-    
-    has_abb = heir_dict.get(HeirID.ABB, 0) > 0
-    has_kids = any(heir_dict.get(kid_id, 0) > 0 
-                   for kid_id in [HeirID.IBN, HeirID.BINT, HeirID.IBN_IBN, HeirID.BINT_IBN])
-    
-    return has_zawj and has_umm and has_jadd and has_ukht and not has_abb and not has_kids
+    """Cek apakah kasus Akdariyyah (lihat SIGNATURE)"""
+    return SIGNATURE.matches(heirs)
 
 
-def calculate_akdariyyah(heirs: List[HeirInput], tirkah: float, 
-                        notes: List[str]) -> CalculationResult:
+def akdariyyah_structure(heirs: List[HeirInput], notes: NoteLog):
     """
-    Hitung Akdariyyah
+    Engine Akdariyyah untuk FaroidCalculator (lihat SPECIAL_CASE_ENGINES)
     
     Aturan:
-    - Zawj: 1/2
-    - Umm: 1/6 (dimodifikasi dari 1/3)
-    - Jadd + Ukht: Muqasamah pada sisa dengan ratio 2:1
+    - Ashl 6: Zawj 1/2 = 3, Umm 1/3 = 2, Jadd 1/6 = 1, Ukht 1/2 = 3
+    - Jumlah 9 > 6, sehingga 'aul menjadi 9
+    - Bagian Jadd + Ukht (1 + 3 = 4) digabung lalu dibagi muqasamah 2:1
+    - 4 tidak habis dibagi 3 kepala, ashl dikali 3 menjadi 27
+      (Zawj 9, Umm 6, Jadd 8, Ukht 4)
+    
+    Returns:
+        SahamStructure
     """
+    from app.core.calculator import SahamStructure
+    from app.core.furudh_engine import FurudhResult
+    
     heir_dict = {h.id: h.quantity for h in heirs}
     num_ukht = heir_dict.get(HeirID.UKHT_ABAWAYN, 0)
     
-    # Ratio muqasamah: Jadd=2, Ukht=1
-    ratio_jadd = 2
-    ratio_ukht = num_ukht
-    ratio_total = ratio_jadd + ratio_ukht
-    
-    # Ashl al-Mas'alah Akdariyyah = 6 × ratio_total
-    ashl = 6 * ratio_total
+    ashl_awal = 6
+    zawj_saham, umm_saham, jadd_fardh, ukht_fardh = 3, 2, 1, 3
+    ashl_aul = zawj_saham + umm_saham + jadd_fardh + ukht_fardh
     
-    # Hitung saham
-    zawj_saham = (ashl * 1) // 2  # 1/2
-    umm_saham = (ashl * 1) // 6   # 1/6
-    sisa = ashl - zawj_saham - umm_saham
+    # Muqasamah: Jadd = 2 kepala, setiap Ukht = 1 kepala
+    ratio_jadd = 2
+    ruus = ratio_jadd + num_ukht
+    pooled = jadd_fardh + ukht_fardh
+    multiplier = ruus // gcd(pooled, ruus)
+    ashl_akhir = ashl_aul * multiplier
     
-    jadd_saham = (sisa * ratio_jadd) // ratio_total
-    ukht_saham_total = (sisa * ratio_ukht) // ratio_total
-    ukht_saham_each = ukht_saham_total // num_ukht
+    per_ruus = pooled * multiplier // ruus
+    jadd_saham = per_ruus * ratio_jadd
+    ukht_saham = per_ruus * num_ukht
+    zawj_saham *= multiplier
+    umm_saham *= multiplier
     
-    # Notes
-    notes.append("📖 Mas'alah Akdariyyah")
-    notes.append(f"   Ashl = 6 × {ratio_total} = {ashl}")
-    notes.append(f"   Zawj: {zawj_saham}/{ashl} = 1/2")
-    notes.append(f"   Umm: {umm_saham}/{ashl} = 1/6 (dimodifikasi)")
-    notes.append(f"   Sisa: {sisa}/{ashl}")
-    notes.append(f"   Muqasamah Jadd:Ukht = {ratio_jadd}:{ratio_ukht}")
-    notes.append(f"   Jadd: {jadd_saham}/{ashl}")
-    notes.append(f"   Ukht ({num_ukht} orang): {ukht_saham_total}/{ashl}")
-    notes.append("")
+    notes.summary("📖 Mas'alah Akdariyyah")
+    notes.add("   Ashl = {}: Zawj 1/2, Umm 1/3, Jadd 1/6, Ukht 1/2", ashl_awal)
+    notes.add("   'Aul: {} → {}", ashl_awal, ashl_aul)
+    notes.add("   Bagian Jadd + Ukht digabung: {} + {} = {} saham", jadd_fardh, ukht_fardh, pooled)
+    notes.add("   Muqasamah Jadd:Ukht = {}:{} ({} kepala)", ratio_jadd, num_ukht, ruus)
+    notes.summary("   Ashl Akhir = {} × {} = {}", ashl_aul, multiplier, ashl_akhir)
+    notes.add("   Zawj: {}/{}", zawj_saham, ashl_akhir)
+    notes.add("   Umm: {}/{}", umm_saham, ashl_akhir)
+    notes.add("   Jadd: {}/{}", jadd_saham, ashl_akhir)
+    notes.add("   Ukht ({} orang): {}/{}", num_ukht, ukht_saham, ashl_akhir)
+    notes.add("")
     
-    # Create shares
-    shares = [
-        HeirShare(
-            heir=HeirResponse(id=HeirID.ZAWJ, **HEIR_NAMES[HeirID.ZAWJ]),
-            quantity=1,
-            fardh="1/2",
-            share_fraction=f"{zawj_saham}/{ashl}",
-            saham=float(zawj_saham),
-            reason="Suami mendapat 1/2 (dalam Akdariyyah tetap 1/2)",
-            share_amount=(zawj_saham / ashl) * tirkah,
-            percentage=f"{(zawj_saham / ashl) * 100:.2f}%"
-        ),
-        HeirShare(
-            heir=HeirResponse(id=HeirID.UMM, **HEIR_NAMES[HeirID.UMM]),
-            quantity=1,
-            fardh="1/6",
-            share_fraction=f"{umm_saham}/{ashl}",
-            saham=float(umm_saham),
-            reason="Ibu mendapat 1/6 (dimodifikasi dari 1/3 dalam Akdariyyah)",
-            share_amount=(umm_saham / ashl) * tirkah,
-            percentage=f"{(umm_saham / ashl) * 100:.2f}%"
-        ),
-        HeirShare(
-            heir=HeirResponse(id=HeirID.JADD, **HEIR_NAMES[HeirID.JADD]),
-            quantity=1,
-            fardh="Muqasamah",
-            share_fraction=f"{jadd_saham}/{ashl}",
-            saham=float(jadd_saham),
-            reason=f"Kakek mendapat {ratio_jadd} bagian dari Muqasamah (ratio {ratio_jadd}:{ratio_ukht})",
-            share_amount=(jadd_saham / ashl) * tirkah,
-            percentage=f"{(jadd_saham / ashl) * 100:.2f}%"
-        ),
-        HeirShare(
-            heir=HeirResponse(id=HeirID.UKHT_ABAWAYN, **HEIR_NAMES[HeirID.UKHT_ABAWAYN]),
-            quantity=num_ukht,
-            fardh="Muqasamah",
-            share_fraction=f"{ukht_saham_each}/{ashl}",
-            saham=float(ukht_saham_each),
-            reason=f"Saudari Kandung mendapat 1 bagian dari Muqasamah (ratio {ratio_ukht}:{ratio_jadd}) dalam Akdariyyah",
-            share_amount=(ukht_saham_each / ashl) * tirkah,
-            percentage=f"{(ukht_saham_each / ashl) * 100:.2f}%",
-            is_mahjub=False
-        )
-    ]
+    shares = (
+        (FurudhResult(HeirID.ZAWJ, 1, "1/2", 1, 2,
+                      "Suami mendapat 1/2 (dalam Akdariyyah tetap 1/2)"), zawj_saham),
+        (FurudhResult(HeirID.UMM, 1, "1/3", 1, 3,
+                      "Ibu mendapat 1/3 (dalam Akdariyyah tetap 1/3)"), umm_saham),
+        (FurudhResult(HeirID.JADD, 1, "Muqasamah", jadd_saham, ashl_akhir,
+                      f"Kakek mendapat {ratio_jadd} bagian dari Muqasamah (ratio {ratio_jadd}:{num_ukht})"),
+         jadd_saham),
+        (FurudhResult(HeirID.UKHT_ABAWAYN, num_ukht, "Muqasamah", ukht_saham, ashl_akhir,
+                      f"Saudari Kandung mendapat 1 bagian dari Muqasamah (ratio {num_ukht}:{ratio_jadd}) dalam Akdariyyah"),
+         ukht_saham),
+    )
     
-    return CalculationResult(
-        tirkah=tirkah,
-        ashlul_masalah_awal=ashl,
-        ashlul_masalah_akhir=ashl,
-        total_saham=float(ashl),
-        status="Adil (Kasus Khusus: Akdariyyah)",
-        is_special_case=True,
-        special_case_name="Akdariyyah",
+    return SahamStructure(
+        ashl_awal=ashl_awal,
+        ashl_akhir=ashl_akhir,
+        status="Aul",
         shares=shares,
-        notes=notes
+        notes=notes.events(),
+        special_case_name=SPECIAL_CASE_NAME,
+        aul_type=classify_aul(ashl_awal, ashl_aul).name,
     )
+
+
+def calculate_akdariyyah(heirs: List[HeirInput], tirkah: float,
+                        notes: List[str]) -> CalculationResult:
+    """Hitung Akdariyyah (lihat akdariyyah_structure)"""
+    from app.core.calculator import FaroidCalculator
+    
+    calc_input = CalculationInput(heirs=heirs, tirkah=tirkah)
+    calculator = FaroidCalculator(calc_input, notes=NoteLog.from_lines(notes))
+    return calculator.calculate_case(SIGNATURE.case_id)
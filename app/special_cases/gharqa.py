@@ -3,59 +3,119 @@ from __future__ import annotations
 """
 Perhitungan untuk Gharqa/Hadm (Meninggal Bersamaan)
 Ketika beberapa orang meninggal bersamaan (misal: kecelakaan, bencana)
+
+Harta setiap orang yang meninggal dihitung terpisah (mereka tidak saling
+mewarisi), sehingga perhitungannya independen dan bisa dijalankan paralel
+di executor. Catatan disimpan per pewaris di hasil masing-masing.
 """
 
-from typing import List, Dict
-from app.schemas.calculation import CalculationResult
-from app.schemas.heir import HeirInput
+import asyncio
+import logging
+from typing import List, Dict, Tuple
+
+from app.schemas.calculation import CalculationInput, CalculationResult
+from app.utils.notes import NoteLog
+
+logger = logging.getLogger(__name__)
+
+
+GHARQA_NOTES = (
+    "🌊 Kasus GHARQA/HADM (Meninggal Bersamaan)",
+    "",
+    "📋 Ketentuan:",
+    "   • Tidak diketahui siapa yang meninggal lebih dulu",
+    "   • Mereka tidak saling mewarisi",
+    "   • Masing-masing diwariskan kepada ahli warisnya yang hidup",
+    "",
+)
+
+
+def _estate_name(index: int, deceased: Dict) -> str:
+    return deceased.get("name", f"Pewaris {index}")
+
+
+def calculate_gharqa_estate(index: int, deceased: Dict) -> Tuple[str, CalculationResult]:
+    """
+    Hitung harta satu orang yang meninggal (independen dari yang lain)
+
+    Fungsi level modul supaya bisa dijalankan di thread pool maupun process pool.
+
+    Args:
+        index: Nomor urut pewaris (mulai 1), untuk nama default
+        deceased: {"name": ..., "tirkah": ..., "heirs": [...]}
+
+    Returns:
+        Tuple (nama pewaris, CalculationResult dengan catatan pewaris ini)
+    """
+    from app.core.calculator import FaroidCalculator
+
+    name = _estate_name(index, deceased)
+    tirkah = deceased.get("tirkah", 0)
+
+    calc_input = CalculationInput(heirs=deceased.get("heirs", []), tirkah=tirkah)
+    notes = NoteLog.from_lines([
+        f"Perhitungan untuk: {name}",
+        f"Harta: Rp {tirkah:,.0f}",
+        "",
+    ], calc_input.notes_verbosity)
+    return name, FaroidCalculator(calc_input, notes=notes).calculate()
 
 
 def calculate_gharqa(deceased_list: List[Dict], notes: List[str]) -> Dict[str, CalculationResult]:
     """
     Hitung warisan untuk kasus Gharqa (meninggal bersamaan)
-    
+
     Aturan:
     - Jika tidak diketahui siapa yang meninggal duluan
     - Masing-masing dianggap tidak saling mewarisi
     - Setiap orang diwariskan kepada ahli warisnya masing-masing
-    
+
     Args:
         deceased_list: List of deceased persons dengan harta dan ahli warisnya
-        notes: Notes perhitungan
-        
+        notes: Notes perhitungan (hanya ketentuan umum; catatan setiap
+            pewaris ada di CalculationResult.notes masing-masing)
+
     Returns:
         Dict berisi hasil perhitungan untuk setiap orang yang meninggal
     """
-    notes.append("🌊 Kasus GHARQA/HADM (Meninggal Bersamaan)")
-    notes.append("")
-    notes.append("📋 Ketentuan:")
-    notes.append("   • Tidak diketahui siapa yang meninggal lebih dulu")
-    notes.append("   • Mereka tidak saling mewarisi")
-    notes.append("   • Masing-masing diwariskan kepada ahli warisnya yang hidup")
-    notes.append("")
-    
-    results = {}
-    
-    for i, deceased in enumerate(deceased_list, 1):
-        name = deceased.get("name", f"Pewaris {i}")
-        tirkah = deceased.get("tirkah", 0)
-        heirs = deceased.get("heirs", [])
-        
-        notes.append(f"{'='*50}")
-        notes.append(f"Perhitungan untuk: {name}")
-        notes.append(f"Harta: Rp {tirkah:,.0f}")
-        notes.append("")
-        
-        # Hitung normal untuk masing-masing
-        from app.core.calculator import FaroidCalculator
-        from app.schemas.calculation import CalculationInput
-        
-        calc_input = CalculationInput(heirs=heirs, tirkah=tirkah)
-        calculator = FaroidCalculator(calc_input)
-        result = calculator.calculate()
-        
-        results[name] = result
-        notes.extend(result.notes)
-        notes.append("")
-    
-    return results
+    notes.extend(GHARQA_NOTES)
+
+    return dict(
+        calculate_gharqa_estate(i, deceased)
+        for i, deceased in enumerate(deceased_list, 1)
+    )
+
+
+async def calculate_gharqa_parallel(deceased_list: List[Dict],
+                                    notes: List[str]) -> Dict[str, CalculationResult]:
+    """
+    Versi async calculate_gharqa: pewaris dikirim ke executor perhitungan
+    bersamaan, paling banyak sejumlah worker executor sekaligus
+
+    Dipanggil langsung dari event loop (jangan di dalam executor, karena
+    job per pewaris memakai pool yang sama). Setiap job tunduk pada batas
+    in-flight executor: jika penuh, ExecutorBusyError diteruskan ke
+    pemanggil (endpoint membalas 503) alih-alih menunggu tanpa batas.
+
+    Returns:
+        Dict berisi hasil perhitungan untuk setiap orang yang meninggal,
+        dengan urutan sama seperti deceased_list
+
+    Raises:
+        ExecutorBusyError: Jika antrian executor penuh
+    """
+    from app.core.executor import get_executor
+
+    notes.extend(GHARQA_NOTES)
+
+    executor = get_executor()
+    step = min(executor.workers, executor.max_in_flight)
+    numbered = list(enumerate(deceased_list, 1))
+    estates = []
+    for start in range(0, len(numbered), step):
+        estates.extend(await asyncio.gather(*(
+            executor.run(calculate_gharqa_estate, i, deceased)
+            for i, deceased in numbered[start:start + step]
+        )))
+    logger.debug("Gharqa: %d pewaris dihitung paralel", len(estates))
+    return dict(estates)
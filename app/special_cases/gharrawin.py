@@ -5,49 +5,102 @@ Al-Gharrawin (الغرّاوين)
 Kasus: Dua nenek yang sederajat
 """
 
-from typing import List
-from app.schemas.calculation import CalculationResult
+from fractions import Fraction
+from typing import Dict, List, Tuple
+from app.schemas.calculation import CalculationInput, CalculationResult
 from app.schemas.heir import HeirInput
-from app.utils.constants import HeirID
+from app.utils.constants import HeirID, HEIR_NAMES
+from app.special_cases.registry import CaseSignature
+from app.utils.notes import NoteLog
+
+
+SPECIAL_CASE_NAME = "Al-Gharrawin"
+
+# Syarat: ada Nenek dari Ibu dan Nenek dari Ayah, keduanya tidak terhalang
+# (tidak ada Ibu, dan tidak ada Ayah yang menghalangi Nenek dari Ayah)
+SIGNATURE = CaseSignature(
+    "gharrawin",
+    required=(HeirID.JADDAH_UMM, HeirID.JADDAH_ABB),
+    forbidden=(HeirID.UMM, HeirID.ABB),
+)
 
 
 def is_gharrawin(heirs: List[HeirInput]) -> bool:
+    """Cek apakah kasus Gharrawin (lihat SIGNATURE)"""
+    return SIGNATURE.matches(heirs)
+
+
+JADDAH_IDS = (HeirID.JADDAH_UMM, HeirID.JADDAH_ABB)
+
+
+def share_jaddah_furudh(furudh_results: List) -> List:
     """
-    Cek apakah kasus Gharrawin (dua nenek)
+    Gabungkan fardh nenek-nenek yang sederajat menjadi satu 1/6
+    
+    Setiap nenek yang tidak mahjub mendapat 1/6 dari FurudhEngine; jika ada
+    lebih dari satu, 1/6 tersebut dibagi rata per kepala.
     
-    Syarat:
-    - Ada nenek dari ibu dan nenek dari ayah
-    - Keduanya sama derajatnya
+    Args:
+        furudh_results: List FurudhResult dari FurudhEngine
+        
+    Returns:
+        List FurudhResult baru (list semula jika hanya ada satu nenek)
     """
-    heir_dict = {h.id: h.quantity for h in heirs}
+    from app.core.furudh_engine import FurudhResult
     
-    has_jaddah_umm = heir_dict.get(HeirID.JADDAH_UMM, 0) > 0
-    has_jaddah_abb = heir_dict.get(HeirID.JADDAH_ABB, 0) > 0
+    jaddah = [f for f in furudh_results if f.heir_id in JADDAH_IDS and not f.is_ashobah]
+    if len(jaddah) < 2:
+        return furudh_results
     
-    return has_jaddah_umm and has_jaddah_abb
+    heads = sum(f.quantity for f in jaddah)
+    results = []
+    for furudh in furudh_results:
+        if furudh in jaddah:
+            share = Fraction(furudh.quantity, 6 * heads)
+            furudh = FurudhResult(
+                furudh.heir_id, furudh.quantity, "1/6", share.numerator, share.denominator,
+                f"{HEIR_NAMES[furudh.heir_id]['id']} berbagi 1/6 secara rata dengan nenek "
+                f"lain yang sederajat ({heads} nenek). Dasar hukum: Hadits Nabi SAW tentang bagian nenek."
+            )
+        results.append(furudh)
+    return results
 
 
-def calculate_gharrawin(heirs: List[HeirInput], tirkah: float,
-                       notes: List[str]) -> CalculationResult:
+def _gharrawin_furudh(heirs: List[HeirInput]) -> Tuple[List, Dict[int, str]]:
+    """FurudhProvider: furudh dari FurudhEngine dengan 1/6 nenek dibagi bersama"""
+    from app.core.furudh_engine import FurudhEngine
+    
+    furudh_engine = FurudhEngine(heirs)
+    return share_jaddah_furudh(furudh_engine.determine_furudh()), furudh_engine.mahjub
+
+
+def gharrawin_structure(heirs: List[HeirInput], notes: NoteLog):
     """
-    Hitung Gharrawin
+    Engine Gharrawin untuk FaroidCalculator (lihat SPECIAL_CASE_ENGINES)
+    
+    Dua nenek yang sederajat berbagi 1/6 per kepala; ahli waris lain
+    dihitung seperti jalur normal.
     
-    Dua nenek yang sederajat berbagi 1/6 (dibagi dua)
+    Returns:
+        SahamStructure atau None
     """
-    notes.append("👵 Kasus Al-Gharrawin (Dua Nenek)")
-    notes.append("   Nenek dari Ibu dan Nenek dari Ayah berbagi 1/6")
-    notes.append("   Masing-masing mendapat 1/12")
-    notes.append("")
+    notes.summary("👵 Kasus Al-Gharrawin (Dua Nenek)")
+    notes.add("   Nenek dari Ibu dan Nenek dari Ayah berbagi 1/6 secara rata")
+    notes.add("")
     
+    from app.core.calculator import compute_saham_structure
+    
+    structure = compute_saham_structure(heirs, notes, furudh_provider=_gharrawin_furudh)
+    if structure is not None:
+        structure = structure.replace(special_case_name=SPECIAL_CASE_NAME)
+    return structure
+
+
+def calculate_gharrawin(heirs: List[HeirInput], tirkah: float,
+                       notes: List[str]) -> CalculationResult:
+    """Hitung Gharrawin (lihat gharrawin_structure)"""
     from app.core.calculator import FaroidCalculator
-    from app.schemas.calculation import CalculationInput
     
     calc_input = CalculationInput(heirs=heirs, tirkah=tirkah)
-    calculator = FaroidCalculator(calc_input)
-    calculator.notes = notes
-    result = calculator._calculate_normal()
-    
-    result.is_special_case = True
-    result.special_case_name = "Al-Gharrawin"
-    
-    return result
+    calculator = FaroidCalculator(calc_input, notes=NoteLog.from_lines(notes))
+    return calculator.calculate_case(SIGNATURE.case_id)
@@ -3,71 +3,275 @@ from __future__ import annotations
 """
 Perhitungan untuk Haml (Janin dalam Kandungan)
 Kasus ketika pewaris meninggal dan ada istri yang hamil
+
+Semua skenario kelahiran (tidak lahir hidup, satu bayi, kembar dengan semua
+kombinasi laki-laki/perempuan sampai jumlah janin maksimum) dihitung dalam
+satu pemanggilan. Furudh dan hijab ahli waris hanya bergantung pada ada
+tidaknya anak laki-laki dan jumlah anak perempuan (1 atau 2+), sehingga
+dievaluasi sekali per kelompok skenario lalu dipakai ulang.
+
+Mauquf (bagian yang ditahan sampai bayi lahir): setiap ahli waris menerima
+bagian terkecil dari semua skenario, selisih dengan bagian terbesarnya
+ditahan bersama bagian janin.
 """
 
-from typing import List, Dict
-from app.schemas.calculation import CalculationResult, HeirShare
-from app.schemas.heir import HeirInput
-from app.core.calculator import FaroidCalculator
-from app.utils.constants import HeirID
+from fractions import Fraction
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+import logging
+
+from app.config import settings
+from app.schemas.calculation import CalculationInput, CalculationResult, HeirShare
+from app.schemas.heir import HeirInput, HeirResponse
+from app.special_cases.registry import classify_special_case
+from app.utils.notes import NoteLog
+from app.utils.constants import HeirID, HEIR_NAMES
+from app.utils.math_helpers import lcm_multiple
+
+if TYPE_CHECKING:
+    from app.core.furudh_engine import FurudhResult
+
+logger = logging.getLogger(__name__)
+
 
+FETUS_IDS = (HeirID.IBN, HeirID.BINT)
 
-def calculate_haml(heirs: List[HeirInput], tirkah: float, 
-                   notes: List[str]) -> Dict[str, CalculationResult]:
+
+def haml_scenarios(max_fetuses: int) -> List[Tuple[str, int, int]]:
+    """
+    Daftar skenario kelahiran
+
+    Args:
+        max_fetuses: Jumlah janin maksimum yang dipertimbangkan
+
+    Returns:
+        List (nama skenario, jumlah bayi laki-laki, jumlah bayi perempuan)
     """
-    Hitung dua skenario untuk Haml:
-    1. Skenario bayi laki-laki
-    2. Skenario bayi perempuan
-    
+    scenarios = [("tidak_hidup", 0, 0), ("laki_laki", 1, 0), ("perempuan", 0, 1)]
+    for total in range(2, max_fetuses + 1):
+        for boys in range(total, -1, -1):
+            girls = total - boys
+            parts = []
+            if boys:
+                parts.append(f"{boys}_laki_laki")
+            if girls:
+                parts.append(f"{girls}_perempuan")
+            scenarios.append((f"kembar_{'_'.join(parts)}", boys, girls))
+    return scenarios
+
+
+def _furudh_group(counts: Dict[int, int]) -> Tuple[bool, int]:
+    """Kunci kelompok skenario yang furudh/hijab-nya sama (selain jumlah anak)"""
+    return counts.get(HeirID.IBN, 0) > 0, min(counts.get(HeirID.BINT, 0), 2)
+
+
+class HamlEngine:
+    """
+    Engine skenario Haml
+
+    Args:
+        heirs: Ahli waris yang sudah ada (tanpa janin)
+        tirkah: Harta warisan
+        notes: Catatan awal (dipakai sebagai awalan catatan setiap skenario)
+        max_fetuses: Jumlah janin maksimum (default settings.HAML_MAX_FETUSES)
+    """
+
+    def __init__(self, heirs: List[HeirInput], tirkah: float, notes: List[str],
+                 max_fetuses: Optional[int] = None):
+        self.heirs = heirs
+        self.tirkah = tirkah
+        self.notes = notes
+        self.max_fetuses = max(1, max_fetuses if max_fetuses is not None else settings.HAML_MAX_FETUSES)
+        self.counts: Dict[int, int] = {}
+        for heir in heirs:
+            self.counts[heir.id] = self.counts.get(heir.id, 0) + heir.quantity
+        # Kunci kelompok -> (furudh_results, mahjub) dari heirs kanonik perwakilan
+        self._furudh_cache: Dict[Tuple[bool, int], Tuple[List[FurudhResult], Dict[int, str]]] = {}
+
+    def _scenario_heirs(self, boys: int, girls: int) -> List[HeirInput]:
+        """Ahli waris skenario: ahli waris yang ada ditambah bayi"""
+        heirs = list(self.heirs)
+        if boys:
+            heirs.append(HeirInput(id=HeirID.IBN, quantity=boys))
+        if girls:
+            heirs.append(HeirInput(id=HeirID.BINT, quantity=girls))
+        return heirs
+
+    def _shared_furudh(self, heirs: List[HeirInput]) -> Tuple[List[FurudhResult], Dict[int, str]]:
+        """
+        FurudhProvider untuk FaroidCalculator: evaluasi furudh/hijab sekali per
+        kelompok skenario, lalu sesuaikan jumlah anak laki-laki/perempuan
+        """
+        from app.core.furudh_engine import FurudhEngine, FurudhResult
+
+        counts = {h.id: h.quantity for h in heirs}
+        key = _furudh_group(counts)
+        cached = self._furudh_cache.get(key)
+        if cached is None:
+            engine = FurudhEngine(heirs)
+            cached = (engine.determine_furudh(), engine.mahjub)
+            self._furudh_cache[key] = cached
+            logger.debug("Haml: evaluasi furudh kelompok %s", key)
+
+        results, mahjub = cached
+        return [
+            FurudhResult(f.heir_id, counts[f.heir_id], f.fardh, f.numerator, f.denominator, f.reason)
+            if f.heir_id in FETUS_IDS and f.quantity != counts[f.heir_id] else f
+            for f in results
+        ], mahjub
+
+    def _calculate_scenario(self, title: str, boys: int, girls: int) -> CalculationResult:
+        """Hitung satu skenario lewat FaroidCalculator (dengan cache struktur saham)"""
+        from app.core.calculator import FaroidCalculator
+
+        heirs = self._scenario_heirs(boys, girls)
+        notes = NoteLog.from_lines(self.notes)
+        notes.summary("{}", title)
+        notes.add("")
+        calculator = FaroidCalculator(CalculationInput(heirs=heirs, tirkah=self.tirkah), notes=notes)
+
+        case_id = classify_special_case(heirs)
+        if case_id is not None:
+            return calculator.calculate_case(case_id)
+
+        return calculator.calculate_case(None, self._shared_furudh)
+
+    def calculate(self) -> Dict[str, CalculationResult]:
+        """
+        Hitung semua skenario dan ringkasan mauquf
+
+        Returns:
+            Dict {nama skenario: CalculationResult}, ditambah "mauquf"
+        """
+        results: Dict[str, CalculationResult] = {}
+        for name, boys, girls in haml_scenarios(self.max_fetuses):
+            if boys or girls:
+                title = f"📘 SKENARIO: {boys} bayi laki-laki, {girls} bayi perempuan"
+            else:
+                title = "📘 SKENARIO: Janin tidak lahir hidup"
+            results[name] = self._calculate_scenario(title, boys, girls)
+
+        results["mauquf"] = self._mauquf(results)
+        return results
+
+    def _portions(self, result: CalculationResult, boys: int, girls: int) -> Dict[int, Fraction]:
+        """
+        Bagian (pecahan harta) ahli waris yang ada dan janin dalam satu skenario
+
+        Returns:
+            Dict {heir_id: bagian}, dengan kunci 0 untuk janin
+        """
+        portions: Dict[int, Fraction] = {heir_id: Fraction(0) for heir_id in self.counts}
+        portions[0] = Fraction(0)
+        if result.status == "ERROR":
+            return portions
+
+        fetus = {HeirID.IBN: boys, HeirID.BINT: girls}
+        ashl = result.ashlul_masalah_akhir
+        for share in result.shares:
+            if share.is_mahjub or not share.quantity:
+                continue
+            heir_id = share.heir.id
+            per_person = Fraction(int(share.saham), ashl * share.quantity)
+            portions[heir_id] = per_person * self.counts.get(heir_id, 0)
+            portions[0] += per_person * fetus.get(heir_id, 0)
+        return portions
+
+    def _mauquf(self, results: Dict[str, CalculationResult]) -> CalculationResult:
+        """Ringkasan mauquf: bagian minimum yang dibayar sekarang dan bagian yang ditahan"""
+        scenario_portions = [
+            self._portions(results[name], boys, girls)
+            for name, boys, girls in haml_scenarios(self.max_fetuses)
+        ]
+        minimum = {
+            heir_id: min(portions[heir_id] for portions in scenario_portions)
+            for heir_id in scenario_portions[0]
+        }
+        maximum = {
+            heir_id: max(portions[heir_id] for portions in scenario_portions)
+            for heir_id in scenario_portions[0]
+        }
+
+        paid = sum((minimum[heir_id] for heir_id in self.counts), Fraction(0))
+        held = 1 - paid
+        ashl = lcm_multiple([value.denominator for value in minimum.values()] + [held.denominator])
+
+        tirkah = self.tirkah
+        shares = []
+        per_heir = {}
+        for heir_id, quantity in self.counts.items():
+            low, high = minimum[heir_id], maximum[heir_id]
+            names = HEIR_NAMES.get(heir_id, {})
+            reason = (
+                f"Dibayar sekarang {low} (bagian terkecil dari semua skenario); "
+                f"ditahan {high - low} sampai bayi lahir (bagian terbesar {high})"
+            )
+            shares.append(HeirShare(
+                heir=HeirResponse(
+                    id=heir_id,
+                    name_id=names.get("id", "Unknown"),
+                    name_ar=names.get("ar", "Unknown")
+                ),
+                quantity=quantity,
+                fardh=None,
+                share_fraction=f"{int(low * ashl)}/{ashl}",
+                saham=float(low * ashl),
+                reason=reason,
+                share_amount=float(low * tirkah),
+                percentage=f"{float(low) * 100:.2f}%",
+                is_mahjub=high == 0,
+                mahjub_reason="Mahjub di semua skenario" if high == 0 else None
+            ))
+            per_heir[str(heir_id)] = {
+                "minimum": float(low * tirkah),
+                "maksimum": float(high * tirkah),
+                "ditahan": float((high - low) * tirkah),
+            }
+
+        notes = list(self.notes)
+        notes.append("⚖️ KETENTUAN HAML:")
+        notes.append("   • Warisan ditahan sampai bayi lahir")
+        notes.append(f"   • Setiap ahli waris mendapat bagian MINIMUM dari {len(scenario_portions)} skenario")
+        notes.append(f"   • Ditahan (mauquf): {held} = Rp {float(held * tirkah):,.0f}")
+        notes.append(f"   • Bagian janin terbesar: {maximum[0]}")
+        notes.append("   • Setelah lahir, dilakukan pembagian ulang sesuai jumlah dan jenis kelamin bayi")
+
+        return CalculationResult(
+            tirkah=tirkah,
+            ashlul_masalah_awal=ashl,
+            ashlul_masalah_akhir=ashl,
+            total_saham=float(paid * ashl),
+            status="Mauquf",
+            is_special_case=True,
+            special_case_name="Haml",
+            shares=shares,
+            notes=notes,
+            calculation_metadata={
+                "mauquf": float(held * tirkah),
+                "mauquf_fraction": f"{int(held * ashl)}/{ashl}",
+                "janin_maksimum": float(maximum[0] * tirkah),
+                "ahli_waris": per_heir,
+                "skenario": len(scenario_portions),
+            }
+        )
+
+
+def calculate_haml(heirs: List[HeirInput], tirkah: float,
+                   notes: List[str], max_fetuses: Optional[int] = None) -> Dict[str, CalculationResult]:
+    """
+    Hitung semua skenario Haml dalam satu pemanggilan
+
+    Skenario: janin tidak lahir hidup, satu bayi laki-laki/perempuan, dan
+    kembar dengan semua kombinasi sampai max_fetuses janin.
+
     Warisan ditahan (mauquf) sampai bayi lahir
-    
+
     Returns:
-        Dict dengan key "laki_laki" dan "perempuan"
+        Dict {nama skenario: CalculationResult} (misalnya "laki_laki",
+        "perempuan", "kembar_1_laki_laki_1_perempuan") ditambah "mauquf"
     """
     notes.append("🤰 Kasus HAML (Janin dalam Kandungan)")
     notes.append("")
     notes.append("⚠️ Warisan DITAHAN (Mauquf) sampai bayi lahir")
-    notes.append("   Perhitungan dibuat untuk 2 skenario:")
     notes.append("")
-    
-    # Skenario 1: Bayi Laki-laki
-    notes_laki = notes.copy()
-    notes_laki.append("📘 SKENARIO 1: Bayi Laki-laki")
-    notes_laki.append("")
-    
-    heirs_with_boy = heirs.copy()
-    heirs_with_boy.append(HeirInput(id=HeirID.IBN, quantity=1))
-    
-    from app.schemas.calculation import CalculationInput
-    calc_input_boy = CalculationInput(heirs=heirs_with_boy, tirkah=tirkah)
-    calculator_boy = FaroidCalculator(calc_input_boy)
-    calculator_boy.notes = notes_laki
-    result_boy = calculator_boy._calculate_normal()
-    
-    # Skenario 2: Bayi Perempuan
-    notes_perempuan = notes.copy()
-    notes_perempuan.append("📙 SKENARIO 2: Bayi Perempuan")
-    notes_perempuan.append("")
-    
-    heirs_with_girl = heirs.copy()
-    heirs_with_girl.append(HeirInput(id=HeirID.BINT, quantity=1))
-    
-    calc_input_girl = CalculationInput(heirs=heirs_with_girl, tirkah=tirkah)
-    calculator_girl = FaroidCalculator(calc_input_girl)
-    calculator_girl.notes = notes_perempuan
-    result_girl = calculator_girl._calculate_normal()
-    
-    # Tambahkan catatan penting
-    result_boy.notes.append("")
-    result_boy.notes.append("⚖️ KETENTUAN HAML:")
-    result_boy.notes.append("   • Warisan ditahan sampai bayi lahir")
-    result_boy.notes.append("   • Setiap ahli waris mendapat bagian MINIMUM dari 2 skenario")
-    result_boy.notes.append("   • Sisanya ditahan untuk bayi")
-    result_boy.notes.append("   • Setelah lahir, dilakukan pembagian ulang sesuai jenis kelamin bayi")
-    
-    result_girl.notes = result_boy.notes.copy()
-    
-    return {
-        "laki_laki": result_boy,
-        "perempuan": result_girl
-    }
+
+    return HamlEngine(heirs, tirkah, notes, max_fetuses).calculate()
@@ -5,64 +5,317 @@ Jadd ma'al-Ikhwah (جد مع الإخوة)
 Kasus: Kakek bersama saudara/i (tanpa ayah)
 """
 
-from typing import List
-from app.schemas.calculation import CalculationResult, HeirShare
-from app.schemas.heir import HeirInput, HeirResponse
+from fractions import Fraction
+from itertools import product
+from typing import Dict, List, Tuple
+from app.schemas.calculation import CalculationInput, CalculationResult
+from app.schemas.heir import HeirInput
 from app.utils.constants import HeirID, HEIR_NAMES
-from app.core.calculator import FaroidCalculator
-from app.schemas.calculation import CalculationInput
+from app.utils.math_helpers import lcm_multiple
+from app.special_cases.registry import CaseSignature
+from app.utils.aul_validator import classify_aul
+from app.utils.notes import NoteLog
+
+
+SPECIAL_CASE_NAME = "Jadd ma'al-Ikhwah"
+
+# Syarat:
+# - Ada Jadd (kakek)
+# - Ada saudara/i (kandung atau seayah)
+# - Tidak ada Abb (ayah)
+SIGNATURE = CaseSignature(
+    "jadd_ikhwah",
+    required=(HeirID.JADD,),
+    required_any=((HeirID.AKH_ABAWAYN, HeirID.AKH_AB, HeirID.UKHT_ABAWAYN, HeirID.UKHT_AB),),
+    forbidden=(HeirID.ABB,),
+)
 
 
 def is_jadd_ikhwah(heirs: List[HeirInput]) -> bool:
+    """Cek apakah kasus Jadd ma'al-Ikhwah (lihat SIGNATURE)"""
+    return SIGNATURE.matches(heirs)
+
+
+# Opsi bagian kakek
+MUQASAMAH = "Muqasamah"
+SEPERTIGA = "1/3"
+SEPERENAM = "1/6"
+
+# Saudara/i kandung dan seayah yang bermuqasamah dengan kakek
+SIBLING_IDS = (HeirID.AKH_ABAWAYN, HeirID.UKHT_ABAWAYN, HeirID.AKH_AB, HeirID.UKHT_AB)
+MALE_SIBLING_IDS = (HeirID.AKH_ABAWAYN, HeirID.AKH_AB)
+MALE_DESCENDANT_IDS = (HeirID.IBN, HeirID.IBN_IBN)
+
+# Di atas 4 kepala saudara, muqasamah selalu kalah dari 1/3 sisa, sehingga
+# jumlah kepala yang lebih besar tidak mengubah pilihan
+MAX_SIBLING_HEADS = 5
+
+# Nilai fardh yang mungkin untuk dzawil furudh selain kakek dan saudara/i
+_FURUDH_CHOICES = (
+    (Fraction(0), Fraction(1, 2), Fraction(1, 4), Fraction(1, 8)),    # Suami/Istri
+    (Fraction(0), Fraction(1, 3), Fraction(1, 6)),                    # Ibu
+    (Fraction(0), Fraction(1, 6)),                                    # Nenek
+    (Fraction(0), Fraction(1, 2), Fraction(2, 3)),                    # Anak perempuan
+    (Fraction(0), Fraction(1, 6), Fraction(1, 2), Fraction(2, 3)),    # Cucu perempuan
+)
+
+
+def jadd_options(furudh_total: Fraction, sibling_heads: int) -> Dict[str, Fraction]:
     """
-    Cek apakah kasus Jadd ma'al-Ikhwah
+    Bagian kakek (pecahan dari seluruh harta) untuk setiap opsi
+    
+    Args:
+        furudh_total: Total fardh dzawil furudh selain kakek dan saudara/i
+        sibling_heads: Jumlah kepala saudara/i (laki-laki 2, perempuan 1)
     
-    Syarat:
-    - Ada Jadd (kakek)
-    - Ada saudara/i (kandung atau seayah)
-    - Tidak ada Abb (ayah)
+    Returns:
+        Dict {opsi: bagian kakek}; 1/6 hanya berlaku jika ada dzawil furudh
+    """
+    sisa = max(Fraction(1) - furudh_total, Fraction(0))
+    options = {
+        MUQASAMAH: sisa * 2 / (2 + sibling_heads),
+        SEPERTIGA: sisa / 3,
+    }
+    if furudh_total > 0:
+        options[SEPERENAM] = Fraction(1, 6)
+    return options
+
+
+def best_jadd_option(furudh_total: Fraction, sibling_heads: int) -> Tuple[str, Fraction]:
     """
-    heir_dict = {h.id: h.quantity for h in heirs}
+    Opsi terbaik kakek beserta bagiannya (jika sama besar, urutan: muqasamah, 1/3, 1/6)
+    """
+    options = jadd_options(furudh_total, sibling_heads)
+    option = max(options, key=lambda option: options[option])
+    return option, options[option]
+
+
+def _build_option_table() -> Dict[Tuple[Fraction, int], Tuple[str, Fraction]]:
+    """
+    Tabel keputusan {(total fardh, kepala saudara): (opsi, bagian kakek)}
+    untuk semua kombinasi dzawil furudh
     
-    has_jadd = heir_dict.get(HeirID.JADD, 0) > 0
-    has_abb = heir_dict.get(HeirID.ABB, 0) > 0
+    Muqasamah hanya menang sampai 4 kepala saudara, sehingga bagian pada
+    baris MAX_SIBLING_HEADS (1/3 atau 1/6) berlaku untuk kepala yang lebih
+    banyak.
+    """
+    totals = {sum(combination) for combination in product(*_FURUDH_CHOICES)}
+    return {
+        (total, heads): best_jadd_option(total, heads)
+        for total in totals
+        for heads in range(1, MAX_SIBLING_HEADS + 1)
+    }
+
+
+JADD_OPTION_TABLE = _build_option_table()
+
+
+def lookup_jadd_option(furudh_total: Fraction, sibling_heads: int) -> Tuple[str, Fraction]:
+    """
+    Opsi terbaik kakek dan bagiannya dari JADD_OPTION_TABLE
     
-    sibling_ids = [
-        HeirID.AKH_ABAWAYN, HeirID.AKH_AB,
-        HeirID.UKHT_ABAWAYN, HeirID.UKHT_AB
-    ]
-    has_siblings = any(heir_dict.get(sid, 0) > 0 for sid in sibling_ids)
+    Dihitung langsung jika kombinasi tidak ada di tabel.
+    """
+    choice = JADD_OPTION_TABLE.get((furudh_total, min(sibling_heads, MAX_SIBLING_HEADS)))
+    if choice is None:
+        choice = best_jadd_option(furudh_total, sibling_heads)
+    return choice
+
+
+def _split_siblings(sisa: Fraction, counts: Dict[int, int]) -> Tuple[Dict[int, Fraction], str]:
+    """
+    Bagi sisa untuk saudara/i setelah bagian kakek (mu'addah)
+    
+    Saudara/i seayah ikut dihitung untuk mengurangi bagian kakek, tetapi
+    bagiannya diambil oleh saudara/i kandung: saudara laki-laki kandung
+    mengambil semuanya, sedangkan saudari kandung tanpa saudara laki-laki
+    hanya mengambil sampai 1/2 (satu orang) atau 2/3 (dua orang atau lebih)
+    dan kelebihannya untuk saudara/i seayah.
+    
+    Returns:
+        ({heir_id: bagian kelompok}, keterangan mu'addah); saudara/i yang
+        tidak ada di dict terhalang setelah mu'addah
+    """
+    full = tuple(h for h in (HeirID.AKH_ABAWAYN, HeirID.UKHT_ABAWAYN) if counts.get(h))
+    paternal = tuple(h for h in (HeirID.AKH_AB, HeirID.UKHT_AB) if counts.get(h))
+    
+    if full and paternal and counts.get(HeirID.AKH_ABAWAYN):
+        return _split_by_heads(sisa, full, counts), "Saudara seayah dihitung lalu terhalang saudara kandung"
+    
+    if full and paternal:
+        num_ukht = counts[HeirID.UKHT_ABAWAYN]
+        batas = Fraction(1, 2) if num_ukht == 1 else Fraction(2, 3)
+        bagian_ukht = min(sisa, batas)
+        shares = {HeirID.UKHT_ABAWAYN: bagian_ukht}
+        if sisa > bagian_ukht:
+            shares.update(_split_by_heads(sisa - bagian_ukht, paternal, counts))
+        return shares, f"Saudari kandung mengambil hingga {batas}, kelebihannya untuk saudara/i seayah"
     
-    return has_jadd and has_siblings and not has_abb
+    return _split_by_heads(sisa, full or paternal, counts), ""
 
 
-def calculate_jadd_ikhwah(heirs: List[HeirInput], tirkah: float,
-                         notes: List[str]) -> CalculationResult:
+def _split_by_heads(sisa: Fraction, heir_ids: Tuple[int, ...],
+                    counts: Dict[int, int]) -> Dict[int, Fraction]:
+    """Bagi sisa dengan rasio 2:1 (laki-laki:perempuan)"""
+    weights = {h: counts[h] * (2 if h in MALE_SIBLING_IDS else 1) for h in heir_ids}
+    total = sum(weights.values())
+    return {h: sisa * weight / total for h, weight in weights.items()}
+
+
+def jadd_ikhwah_structure(heirs: List[HeirInput], notes: NoteLog):
     """
-    Hitung Jadd ma'al-Ikhwah
+    Engine Jadd ma'al-Ikhwah untuk FaroidCalculator (lihat SPECIAL_CASE_ENGINES)
     
     Kakek memilih yang lebih baik dari:
     1. Muqasamah (bagi bersama saudara seperti saudara laki-laki)
     2. 1/3 dari seluruh harta (jika tidak ada dzawil furudh lain)
     3. 1/3 dari sisa (jika ada dzawil furudh lain)
     4. 1/6 (jika jumlah saudara banyak)
+    
+    Pilihan hanya bergantung pada total fardh dzawil furudh lain dan jumlah
+    kepala saudara, sehingga diambil dari JADD_OPTION_TABLE. Jika ada anak
+    atau cucu laki-laki, saudara/i terhalang dan kakek mendapat 1/6.
+    
+    Returns:
+        SahamStructure atau None
     """
-    notes.append("🔄 Kasus Jadd ma'al-Ikhwah")
-    notes.append("   Kakek memilih opsi terbaik:")
-    notes.append("   1. Muqasamah dengan saudara")
-    notes.append("   2. 1/3 dari harta/sisa")
-    notes.append("   3. 1/6")
-    notes.append("")
+    from app.core.ashobah_engine import AshobahEngine
+    from app.core.calculator import SahamStructure
+    from app.core.furudh_engine import FurudhEngine, FurudhResult
     
-    # Untuk saat ini, implementasi sederhana: muqasamah
-    # TODO: Implement full logic dengan 3 opsi
+    notes.summary("🔄 Kasus Jadd ma'al-Ikhwah")
     
-    calc_input = CalculationInput(heirs=heirs, tirkah=tirkah)
-    calculator = FaroidCalculator(calc_input)
-    calculator.notes = notes
-    result = calculator._calculate_normal()
+    furudh_engine = FurudhEngine(heirs)
+    counts = {h.id: h.quantity for h in heirs}
+    others = [
+        f for f in furudh_engine.determine_furudh()
+        if f.heir_id != HeirID.JADD and f.heir_id not in SIBLING_IDS
+    ]
+    fixed = [(f, Fraction(f.numerator, f.denominator)) for f in others if not f.is_ashobah]
+    furudh_total = sum((share for _, share in fixed), Fraction(0))
+    
+    for furudh, share in fixed:
+        notes.add("  • {}: {}", HEIR_NAMES.get(furudh.heir_id, {}).get("id", "Unknown"), furudh.fardh)
+    
+    mahjub_reasons = dict(furudh_engine.mahjub)
+    residue: List[Tuple[FurudhResult, Fraction]] = []
+    
+    if any(counts.get(h) for h in MALE_DESCENDANT_IDS):
+        # Saudara/i terhalang anak/cucu laki-laki; kakek 1/6, sisa untuk ashobah
+        notes.add("   Ada anak/cucu laki-laki: saudara/i mahjub, kakek mendapat 1/6")
+        fixed.append((FurudhResult(
+            HeirID.JADD, 1, SEPERENAM, 1, 6,
+            "Kakek mendapat 1/6 karena ada anak/cucu laki-laki"
+        ), Fraction(1, 6)))
+        sisa = max(Fraction(1) - furudh_total - Fraction(1, 6), Fraction(0))
+        ashobah_engine = AshobahEngine(others)
+        for furudh, weight in ((f, ashobah_engine.group.weight(f.heir_id)) for f in ashobah_engine.ashobah):
+            residue.append((furudh, sisa * weight * furudh.quantity / ashobah_engine.ruus))
+        status = None
+    else:
+        for heir_id in SIBLING_IDS:
+            mahjub_reasons.pop(heir_id, None)
+        sibling_heads = sum(
+            counts.get(h, 0) * (2 if h in MALE_SIBLING_IDS else 1) for h in SIBLING_IDS
+        )
+        option, jadd_share = lookup_jadd_option(furudh_total, sibling_heads)
+        sisa = max(Fraction(1) - furudh_total, Fraction(0))
+        
+        if notes.full:
+            notes.add("   Sisa setelah dzawil furudh: {}", sisa)
+            notes.add("   Kepala saudara/i: {} (kakek = 2)", sibling_heads)
+            for name, share in jadd_options(furudh_total, sibling_heads).items():
+                notes.add("   Opsi {}: {}", name, share)
+        
+        if option == SEPERTIGA and furudh_total > 0:
+            jadd_fardh, jadd_reason = "1/3 sisa", "Kakek memilih 1/3 dari sisa (lebih baik dari muqasamah dan 1/6)"
+        elif option == SEPERTIGA:
+            jadd_fardh, jadd_reason = SEPERTIGA, "Kakek memilih 1/3 dari seluruh harta (lebih baik dari muqasamah)"
+        elif option == SEPERENAM:
+            jadd_fardh, jadd_reason = SEPERENAM, "Kakek memilih 1/6 dari seluruh harta (lebih baik dari muqasamah dan 1/3 sisa)"
+        else:
+            jadd_fardh, jadd_reason = MUQASAMAH, "Kakek bermuqasamah dengan saudara/i sebagai saudara laki-laki (bagian 2)"
+        notes.summary("   Kakek: {} = {}", jadd_fardh, jadd_share)
+        
+        jadd = FurudhResult(
+            HeirID.JADD, 1, jadd_fardh, jadd_share.numerator, jadd_share.denominator, jadd_reason
+        )
+        sibling_shares, muaddah = _split_siblings(max(sisa - jadd_share, Fraction(0)), counts)
+        if muaddah:
+            notes.add("   Mu'addah: {}", muaddah)
+        
+        sibling_fardh = MUQASAMAH if option == MUQASAMAH else "Ashobah"
+        sibling_results = []
+        for heir_id in SIBLING_IDS:
+            quantity = counts.get(heir_id, 0)
+            if not quantity:
+                continue
+            if heir_id not in sibling_shares:
+                mahjub_reasons[heir_id] = furudh_engine.mahjub.get(
+                    heir_id,
+                    f"{HEIR_NAMES[heir_id]['id']} terhalang (mahjub) oleh saudara kandung "
+                    f"setelah dihitung bersama kakek (mu'addah)."
+                )
+                continue
+            if not sibling_shares[heir_id]:
+                mahjub_reasons[heir_id] = (
+                    f"{HEIR_NAMES[heir_id]['id']} tidak mendapat bagian karena harta habis "
+                    f"untuk dzawil furudh dan kakek (tidak ada sisa untuk ashobah)."
+                )
+                continue
+            sibling_results.append((FurudhResult(
+                heir_id, quantity, sibling_fardh, 0, 0,
+                f"{HEIR_NAMES[heir_id]['id']} mendapat sisa bersama kakek (Jadd ma'al-Ikhwah)"
+            ), sibling_shares[heir_id]))
+        
+        fixed.append((jadd, jadd_share))
+        residue.extend(sibling_results)
+        status = "Ashobah" if option == MUQASAMAH and furudh_total == 0 else None
+    
+    shares = fixed + residue
+    total = sum((share for _, share in shares), Fraction(0))
+    is_aul = total > 1
+    if is_aul:
+        shares = [(furudh, share / total) for furudh, share in shares]
+    if status is None:
+        status = "Aul" if is_aul else "Adil"
+    
+    # Ashl awal dari pecahan bagian kelompok, ashl akhir setelah 'aul dan inkisar per orang
+    ashl_awal = lcm_multiple([share.denominator for _, share in fixed + residue])
+    ashl_akhir = lcm_multiple(
+        [int(ashl_awal * total) if is_aul else ashl_awal]
+        + [(share / furudh.quantity).denominator for furudh, share in shares]
+    )
+    saham = tuple((furudh, int(share * ashl_akhir)) for furudh, share in shares)
+    
+    notes.summary("   Ashl awal: {}, Ashl akhir: {} ({})", ashl_awal, ashl_akhir, status)
+    if notes.full:
+        for furudh, value in saham:
+            notes.add("   • {}: {}/{}", HEIR_NAMES.get(furudh.heir_id, {}).get("id", "Unknown"), value, ashl_akhir)
+    notes.add("")
     
-    result.is_special_case = True
-    result.special_case_name = "Jadd ma'al-Ikhwah"
+    mahjub = tuple(
+        (heir.id, heir.quantity, mahjub_reasons[heir.id])
+        for heir in heirs if heir.id in mahjub_reasons
+    )
     
-    return result
+    return SahamStructure(
+        ashl_awal=ashl_awal,
+        ashl_akhir=ashl_akhir,
+        status=status,
+        shares=saham,
+        notes=notes.events(),
+        mahjub=mahjub,
+        special_case_name=SPECIAL_CASE_NAME,
+        aul_type=classify_aul(ashl_awal, int(ashl_awal * total)).name if is_aul else None,
+    )
+
+
+def calculate_jadd_ikhwah(heirs: List[HeirInput], tirkah: float,
+                         notes: List[str]) -> CalculationResult:
+    """Hitung Jadd ma'al-Ikhwah (lihat jadd_ikhwah_structure)"""
+    from app.core.calculator import FaroidCalculator
+    
+    calc_input = CalculationInput(heirs=heirs, tirkah=tirkah)
+    calculator = FaroidCalculator(calc_input, notes=NoteLog.from_lines(notes))
+    return calculator.calculate_case(SIGNATURE.case_id)
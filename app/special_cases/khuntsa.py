@@ -3,67 +3,312 @@ from __future__ import annotations
 """
 Perhitungan untuk Khuntsa (Hermafrodit/Banci)
 Ketika jenis kelamin ahli waris tidak jelas
+
+Setiap khuntsa dihitung sebagai laki-laki dan sebagai perempuan (pasangan
+ahli warisnya), sehingga k khuntsa menghasilkan 2^k skenario. Skenario yang
+susunan ahli warisnya sama (misalnya dua khuntsa sejenis: L+P dan P+L)
+hanya dihitung sekali. Penyelesaian dihitung dengan saham bulat pada
+jami'ah (KPK ashl semua skenario): khuntsa mendapat bagian terkecil, ahli
+waris lain bagian terbesar, dan sisanya ditahan (mauquf).
 """
 
-from typing import List, Dict
-from app.schemas.calculation import CalculationResult
-from app.schemas.heir import HeirInput
-from app.core.calculator import FaroidCalculator
-from app.schemas.calculation import CalculationInput
+from itertools import product
+from math import gcd
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+import logging
+
+from app.config import settings
+from app.core.result_cache import canonical_heirs
+from app.schemas.calculation import CalculationInput, CalculationResult, HeirShare
+from app.schemas.heir import HeirInput, HeirResponse
+from app.special_cases.registry import classify_special_case
+from app.utils.notes import NoteLog
+from app.utils.constants import HeirID, HEIR_NAMES
+from app.utils.math_helpers import lcm_multiple
+
+logger = logging.getLogger(__name__)
+
+
+# Pasangan (laki-laki, perempuan) untuk ahli waris yang bisa khuntsa.
+# None = versi perempuannya bukan ahli waris (dzawil arham)
+_PAIRS = (
+    (HeirID.IBN, HeirID.BINT),
+    (HeirID.IBN_IBN, HeirID.BINT_IBN),
+    (HeirID.AKH_ABAWAYN, HeirID.UKHT_ABAWAYN),
+    (HeirID.AKH_AB, HeirID.UKHT_AB),
+    (HeirID.AKH_UMM, HeirID.UKHT_UMM),
+    (HeirID.MUTIQ, HeirID.MUTIQAH),
+    (HeirID.IBN_AKH_ABAWAYN, None),
+    (HeirID.IBN_AKH_AB, None),
+    (HeirID.AMM_ABAWAYN, None),
+    (HeirID.AMM_AB, None),
+    (HeirID.IBN_AMM_ABAWAYN, None),
+    (HeirID.IBN_AMM_AB, None),
+)
+
+KHUNTSA_COUNTERPART: Dict[int, Tuple[int, Optional[int]]] = {}
+for _male, _female in _PAIRS:
+    KHUNTSA_COUNTERPART[_male] = (_male, _female)
+    if _female is not None:
+        KHUNTSA_COUNTERPART[_female] = (_male, _female)
+
+GENDER_NAMES = ("laki_laki", "perempuan")
+
+
+class KhuntsaEngine:
+    """
+    Engine skenario Khuntsa
+
+    Args:
+        heirs: Ahli waris (khuntsa termasuk dalam quantity ID-nya)
+        tirkah: Harta warisan
+        khuntsa_heir_ids: ID ahli waris untuk setiap orang khuntsa (ID yang
+            sama boleh diulang untuk beberapa khuntsa sejenis)
+        notes: Catatan awal (dipakai sebagai awalan catatan setiap skenario)
+
+    Raises:
+        ValueError: jika ID tidak bisa khuntsa, jumlah khuntsa melebihi
+            quantity, atau melebihi settings.KHUNTSA_MAX_HEIRS
+    """
+
+    def __init__(self, heirs: List[HeirInput], tirkah: float,
+                 khuntsa_heir_ids: Sequence[int], notes: List[str]):
+        self.tirkah = tirkah
+        self.notes = notes
+        self.khuntsa = [int(heir_id) for heir_id in khuntsa_heir_ids]
+        self.counts: Dict[int, int] = {}
+        for heir in heirs:
+            self.counts[heir.id] = self.counts.get(heir.id, 0) + heir.quantity
+
+        if not self.khuntsa:
+            raise ValueError("Minimal satu ahli waris khuntsa")
+        if len(self.khuntsa) > settings.KHUNTSA_MAX_HEIRS:
+            raise ValueError(f"Maksimal {settings.KHUNTSA_MAX_HEIRS} ahli waris khuntsa")
+        for heir_id in set(self.khuntsa):
+            if heir_id not in KHUNTSA_COUNTERPART:
+                raise ValueError(f"Ahli waris ID {heir_id} tidak bisa khuntsa")
+            if self.khuntsa.count(heir_id) > self.counts.get(heir_id, 0):
+                raise ValueError(f"Jumlah khuntsa untuk ID {heir_id} melebihi quantity")
+
+        # Ahli waris yang jelas jenis kelaminnya
+        self.known = dict(self.counts)
+        for heir_id in self.khuntsa:
+            self.known[heir_id] -= 1
+
+    def scenarios(self) -> List[Tuple[int, ...]]:
+        """Semua kombinasi jenis kelamin (0 = laki-laki, 1 = perempuan) per khuntsa"""
+        return list(product((0, 1), repeat=len(self.khuntsa)))
+
+    def _assigned_id(self, index: int, gender: int) -> Optional[int]:
+        """ID ahli waris khuntsa ke-index pada jenis kelamin tertentu"""
+        return KHUNTSA_COUNTERPART[self.khuntsa[index]][gender]
+
+    def _scenario_heirs(self, genders: Tuple[int, ...]) -> List[HeirInput]:
+        """Ahli waris untuk satu skenario (urutan input dipertahankan)"""
+        counts = dict(self.known)
+        for index, gender in enumerate(genders):
+            heir_id = self._assigned_id(index, gender)
+            if heir_id is not None:
+                counts[heir_id] = counts.get(heir_id, 0) + 1
+        return [HeirInput(id=heir_id, quantity=quantity) for heir_id, quantity in counts.items() if quantity > 0]
+
+    @staticmethod
+    def scenario_name(genders: Tuple[int, ...]) -> str:
+        return "_".join(GENDER_NAMES[gender] for gender in genders)
+
+    def calculate(self) -> Dict[str, CalculationResult]:
+        """
+        Hitung semua skenario dan penyelesaiannya
+
+        Returns:
+            Dict {nama skenario: CalculationResult} ditambah "penyelesaian"
+        """
+        from app.core.calculator import FaroidCalculator
+
+        results: Dict[str, CalculationResult] = {}
+        computed: Dict[Tuple, CalculationResult] = {}
+        scenario_results = []
+
+        for genders in self.scenarios():
+            heirs = self._scenario_heirs(genders)
+            key = canonical_heirs(heirs)
+            result = computed.get(key)
+            if result is None:
+                notes = NoteLog.from_lines(self.notes)
+                notes.summary("📘 SKENARIO: {}", ", ".join(
+                    f"khuntsa {i + 1} {GENDER_NAMES[gender].replace('_', '-')}"
+                    for i, gender in enumerate(genders)
+                ))
+                notes.add("")
+                calculator = FaroidCalculator(
+                    CalculationInput(heirs=heirs, tirkah=self.tirkah), notes=notes
+                )
+                result = calculator.calculate_case(classify_special_case(heirs))
+                computed[key] = result
+            else:
+                logger.debug("Khuntsa: skenario %s sama dengan skenario sebelumnya", genders)
+            results[self.scenario_name(genders)] = result
+            scenario_results.append((genders, result))
+
+        results["penyelesaian"] = self._settle(scenario_results)
+        return results
+
+    def _settle(self, scenario_results: List[Tuple[Tuple[int, ...], CalculationResult]]) -> CalculationResult:
+        """
+        Penyelesaian dengan saham bulat pada jami'ah
+
+        Khuntsa mendapat minimum, ahli waris lain maksimum. Jika hasilnya
+        melebihi jami'ah (beberapa maksimum berasal dari skenario berbeda),
+        semua ahli waris mendapat minimum.
+        """
+        # Skenario ERROR (misalnya tidak ada ahli waris tersisa) dihitung tanpa bagian
+        valid = [(g, r) for g, r in scenario_results if r.status != "ERROR"]
+        if not valid:
+            raise ValueError("Semua skenario khuntsa gagal dihitung")
+
+        jamiah = lcm_multiple([r.ashlul_masalah_akhir for _, r in valid])
+        for _, result in valid:
+            for share in result.shares:
+                if share.quantity and not share.is_mahjub:
+                    # Saham per orang harus bulat
+                    per_person = int(share.saham) * (jamiah // result.ashlul_masalah_akhir)
+                    if per_person % share.quantity:
+                        jamiah *= share.quantity // gcd(per_person, share.quantity)
+
+        # Saham per orang per skenario pada jami'ah: [{heir_id: saham}]
+        per_person_list = []
+        for genders, result in scenario_results:
+            if result.status == "ERROR":
+                per_person_list.append((genders, {}))
+                continue
+            scale = jamiah // result.ashlul_masalah_akhir
+            per_person_list.append((genders, {
+                share.heir.id: int(share.saham) * scale // share.quantity
+                for share in result.shares
+                if share.quantity and not share.is_mahjub
+            }))
+
+        known_ids = [heir_id for heir_id, quantity in self.known.items() if quantity > 0]
+        known_max = {
+            heir_id: max(pp.get(heir_id, 0) for _, pp in per_person_list) * self.known[heir_id]
+            for heir_id in known_ids
+        }
+        known_min = {
+            heir_id: min(pp.get(heir_id, 0) for _, pp in per_person_list) * self.known[heir_id]
+            for heir_id in known_ids
+        }
+        khuntsa_min = [
+            min(
+                pp.get(self._assigned_id(index, genders[index]), 0)
+                for genders, pp in per_person_list
+            )
+            for index in range(len(self.khuntsa))
+        ]
+        khuntsa_max = [
+            max(
+                pp.get(self._assigned_id(index, genders[index]), 0)
+                for genders, pp in per_person_list
+            )
+            for index in range(len(self.khuntsa))
+        ]
+
+        known_settled = known_max
+        fallback = sum(known_max.values()) + sum(khuntsa_min) > jamiah
+        if fallback:
+            logger.warning("Khuntsa: maksimum ahli waris lain melebihi jami'ah, semua memakai minimum")
+            known_settled = known_min
+        held = jamiah - sum(known_settled.values()) - sum(khuntsa_min)
+
+        tirkah = self.tirkah
+        shares = []
+        for heir_id in known_ids:
+            saham = known_settled[heir_id]
+            shares.append(self._share(
+                heir_id, self.known[heir_id], saham, jamiah,
+                f"Bagian {'terkecil' if fallback else 'terbesar'} dari {len(per_person_list)} skenario "
+                f"(terkecil {known_min[heir_id]}, terbesar {known_max[heir_id]} dari {jamiah})"
+            ))
+        for index, heir_id in enumerate(self.khuntsa):
+            shares.append(self._share(
+                heir_id, 1, khuntsa_min[index], jamiah,
+                f"Khuntsa {index + 1}: bagian terkecil dari {len(per_person_list)} skenario "
+                f"(terbesar {khuntsa_max[index]} dari {jamiah})"
+            ))
+
+        notes = list(self.notes)
+        notes.append("⚖️ KETENTUAN KHUNTSA:")
+        notes.append(f"   • Jami'ah (KPK ashl {len(per_person_list)} skenario): {jamiah}")
+        if fallback:
+            notes.append("   • Bagian terbesar ahli waris lain melebihi jami'ah,")
+            notes.append("     semua ahli waris mendapat bagian MINIMUM")
+        else:
+            notes.append("   • Khuntsa mendapat bagian MINIMUM")
+            notes.append("   • Ahli waris lain mendapat bagian MAKSIMUM")
+        notes.append(f"   • Ditahan (mauquf): {held}/{jamiah} = Rp {tirkah * held / jamiah:,.0f}")
+        notes.append("   • Jika jenis kelamin diketahui kemudian, dilakukan pembagian ulang")
+
+        return CalculationResult(
+            tirkah=tirkah,
+            ashlul_masalah_awal=jamiah,
+            ashlul_masalah_akhir=jamiah,
+            total_saham=float(jamiah - held),
+            status="Mauquf" if held else "Adil",
+            is_special_case=True,
+            special_case_name="Khuntsa",
+            shares=shares,
+            notes=notes,
+            calculation_metadata={
+                "jamiah": jamiah,
+                "mauquf_saham": held,
+                "mauquf": tirkah * held / jamiah,
+                "skenario": len(per_person_list),
+            }
+        )
+
+    def _share(self, heir_id: int, quantity: int, saham: int, jamiah: int, reason: str) -> HeirShare:
+        names = HEIR_NAMES.get(heir_id, {})
+        return HeirShare(
+            heir=HeirResponse(
+                id=heir_id,
+                name_id=names.get("id", "Unknown"),
+                name_ar=names.get("ar", "Unknown")
+            ),
+            quantity=quantity,
+            fardh=None,
+            share_fraction=f"{saham}/{jamiah}",
+            saham=float(saham),
+            reason=reason,
+            share_amount=self.tirkah * saham / jamiah,
+            percentage=f"{saham / jamiah * 100:.2f}%",
+            is_mahjub=saham == 0,
+            mahjub_reason=reason if saham == 0 else None
+        )
 
 
 def calculate_khuntsa(heirs: List[HeirInput], tirkah: float,
-                      khuntsa_heir_id: int, notes: List[str]) -> Dict[str, CalculationResult]:
+                      khuntsa_heir_id: Union[int, Sequence[int]],
+                      notes: List[str]) -> Dict[str, CalculationResult]:
     """
-    Hitung dua skenario untuk Khuntsa:
-    1. Skenario dianggap laki-laki
-    2. Skenario dianggap perempuan
-    
+    Hitung semua skenario Khuntsa (2^k untuk k khuntsa)
+
     Args:
         heirs: List ahli waris
         tirkah: Total harta
-        khuntsa_heir_id: ID ahli waris yang khuntsa
+        khuntsa_heir_id: ID ahli waris yang khuntsa, atau list ID untuk
+            beberapa khuntsa
         notes: Notes perhitungan
-        
+
     Returns:
-        Dict dengan key "laki_laki" dan "perempuan"
+        Dict {nama skenario: CalculationResult} (untuk satu khuntsa:
+        "laki_laki" dan "perempuan") ditambah "penyelesaian"
     """
+    khuntsa_ids = [khuntsa_heir_id] if isinstance(khuntsa_heir_id, int) else list(khuntsa_heir_id)
+
     notes.append("⚧ Kasus KHUNTSA (Hermafrodit)")
-    notes.append(f"   Ahli waris dengan ID {khuntsa_heir_id} jenis kelaminnya tidak jelas")
+    for heir_id in khuntsa_ids:
+        notes.append(f"   Ahli waris dengan ID {heir_id} jenis kelaminnya tidak jelas")
     notes.append("")
-    notes.append("📋 Perhitungan dibuat untuk 2 skenario:")
+    notes.append(f"📋 Perhitungan dibuat untuk {2 ** len(khuntsa_ids)} skenario")
     notes.append("")
-    
-    # Skenario 1: Dianggap Laki-laki
-    notes_laki = notes.copy()
-    notes_laki.append("📘 SKENARIO 1: Dianggap Laki-laki")
-    notes_laki.append("")
-    
-    calc_input_male = CalculationInput(heirs=heirs, tirkah=tirkah)
-    calculator_male = FaroidCalculator(calc_input_male)
-    calculator_male.notes = notes_laki
-    result_male = calculator_male._calculate_normal()
-    
-    # Skenario 2: Dianggap Perempuan
-    notes_perempuan = notes.copy()
-    notes_perempuan.append("📙 SKENARIO 2: Dianggap Perempuan")
-    notes_perempuan.append("")
-    
-    calc_input_female = CalculationInput(heirs=heirs, tirkah=tirkah)
-    calculator_female = FaroidCalculator(calc_input_female)
-    calculator_female.notes = notes_perempuan
-    result_female = calculator_female._calculate_normal()
-    
-    # Tambahkan catatan
-    result_male.notes.append("")
-    result_male.notes.append("⚖️ KETENTUAN KHUNTSA:")
-    result_male.notes.append("   • Khuntsa mendapat bagian MINIMUM dari 2 skenario")
-    result_male.notes.append("   • Ahli waris lain mendapat bagian MAKSIMUM dari 2 skenario")
-    result_male.notes.append("   • Jika jenis kelamin diketahui kemudian, dilakukan pembagian ulang")
-    
-    result_female.notes = result_male.notes.copy()
-    
-    return {
-        "laki_laki": result_male,
-        "perempuan": result_female
-    }
+
+    return KhuntsaEngine(heirs, tirkah, khuntsa_ids, notes).calculate()
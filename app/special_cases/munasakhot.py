@@ -5,71 +5,245 @@ Munasakhot (المناسخات) - Warisan Bertingkat
 Kasus: Ahli waris meninggal sebelum pembagian warisan selesai
 """
 
-from typing import List, Dict, Any
+from fractions import Fraction
+from typing import List, Dict, Any, Optional, Set, Tuple
+import logging
+
 from app.schemas.calculation import CalculationResult, HeirShare
 from app.schemas.heir import HeirInput, HeirResponse
-from app.core.calculator import FaroidCalculator
+from app.utils.notes import NoteLog
 from app.schemas.calculation import CalculationInput
 from app.utils.constants import HEIR_NAMES
+from app.utils.math_helpers import lcm_multiple
+
+logger = logging.getLogger(__name__)
 
 
 class MunasakhotCase:
-    """Class untuk menangani kasus Munasakhot"""
+    """
+    Engine Munasakhot berbentuk rantai (DAG) tingkat pewaris
+    
+    Setiap tingkat punya harta sendiri dan boleh menunjuk sumber warisan:
+    ahli waris (heir_id) pada tingkat sebelumnya yang meninggal dan menjadi
+    pewaris tingkat ini. Tirkah tingkat = harta sendiri + bagian per orang
+    dari setiap sumber, dihitung dengan pecahan eksak (Fraction).
+    
+    Mengubah satu tingkat (update_level) hanya menghitung ulang tingkat itu
+    dan tingkat-tingkat yang bergantung padanya.
+    """
     
     def __init__(self):
-        self.levels = []  # Tingkatan pewaris
-        self.results = {}  # Hasil perhitungan per tingkat
-        
-    def add_level(self, pewaris_name: str, tirkah: float, 
-                  heirs: List[HeirInput], level: int = 1):
+        self.levels: Dict[int, Dict[str, Any]] = {}  # Tingkatan pewaris
+        self.results: Dict[int, CalculationResult] = {}  # Hasil perhitungan per tingkat
+        self._estates: Dict[int, Fraction] = {}
+        self._portions: Dict[int, Dict[int, Fraction]] = {}
+        self._dirty: Set[int] = set()
+    
+    def add_level(self, pewaris_name: str, tirkah: float,
+                  heirs: List[HeirInput], level: int = 1,
+                  sumber: Optional[List[Tuple[int, int]]] = None):
         """
         Tambahkan tingkat pewaris
         
         Args:
             pewaris_name: Nama pewaris
-            tirkah: Harta yang akan dibagi
+            tirkah: Harta sendiri pewaris (tingkat 1: seluruh tirkah)
             heirs: Ahli waris
             level: Tingkat ke berapa (1, 2, 3, dst)
+            sumber: [(tingkat, heir_id), ...] posisi pewaris ini sebagai
+                ahli waris di tingkat sebelumnya (satu orang dari kelompok heir_id)
+        
+        Raises:
+            ValueError: jika tingkat sudah ada atau sumber tidak valid
         """
-        self.levels.append({
+        if level in self.levels:
+            raise ValueError(f"Tingkat {level} sudah ada")
+        sumber = [(int(src_level), int(heir_id)) for src_level, heir_id in (sumber or ())]
+        for src_level, _ in sumber:
+            if src_level >= level:
+                raise ValueError(f"Sumber tingkat {level} harus tingkat sebelumnya, bukan {src_level}")
+        
+        self.levels[level] = {
             "level": level,
             "pewaris": pewaris_name,
-            "tirkah": tirkah,
-            "heirs": heirs
-        })
+            "tirkah": _exact(tirkah),
+            "heirs": _heir_inputs(heirs),
+            "sumber": sumber,
+        }
+        self._dirty.add(level)
+    
+    def update_level(self, level: int, tirkah: Optional[float] = None,
+                     heirs: Optional[List[HeirInput]] = None):
+        """
+        Ubah harta sendiri dan/atau ahli waris satu tingkat
+        
+        Tingkat ini dan semua tingkat sesudahnya yang bergantung padanya
+        ditandai untuk dihitung ulang pada calculate() berikutnya.
+        """
+        level_data = self.levels[level]
+        if tirkah is not None:
+            level_data["tirkah"] = _exact(tirkah)
+        if heirs is not None:
+            level_data["heirs"] = _heir_inputs(heirs)
+        self._dirty.add(level)
+    
+    def _downstream(self, dirty: Set[int]) -> Set[int]:
+        """Tingkat yang harus dihitung ulang (dirty dan semua turunannya)"""
+        affected = set(dirty)
+        for level in sorted(self.levels):
+            if any(src_level in affected for src_level, _ in self.levels[level]["sumber"]):
+                affected.add(level)
+        return affected
+    
+    def _check_sources(self) -> None:
+        """Sumber harus menunjuk ahli waris yang ada, tidak melebihi jumlahnya"""
+        deaths: Dict[Tuple[int, int], int] = {}
+        for level, level_data in self.levels.items():
+            for src_level, heir_id in level_data["sumber"]:
+                if src_level not in self.levels:
+                    raise ValueError(f"Tingkat {level}: sumber tingkat {src_level} tidak ada")
+                deaths[(src_level, heir_id)] = deaths.get((src_level, heir_id), 0) + 1
+        for (src_level, heir_id), count in deaths.items():
+            quantity = sum(h.quantity for h in self.levels[src_level]["heirs"] if h.id == heir_id)
+            if count > quantity:
+                raise ValueError(
+                    f"Tingkat {src_level}: ahli waris ID {heir_id} hanya {quantity} orang, "
+                    f"tetapi menjadi sumber {count} tingkat"
+                )
     
     def calculate(self) -> Dict[str, CalculationResult]:
         """
-        Hitung munasakhot untuk semua tingkat
+        Hitung munasakhot untuk semua tingkat (hanya yang berubah)
         
         Returns:
-            Dict berisi hasil perhitungan per tingkat
+            Dict berisi hasil perhitungan per tingkat ditambah "jamiah"
         """
-        results = {}
+        from app.core.calculator import FaroidCalculator
+        
+        self._check_sources()
+        affected = self._downstream(self._dirty)
         
-        for level_data in self.levels:
-            level = level_data["level"]
+        for level in sorted(affected):
+            level_data = self.levels[level]
             pewaris = level_data["pewaris"]
-            tirkah = level_data["tirkah"]
-            heirs = level_data["heirs"]
             
-            # Hitung warisan untuk tingkat ini
+            # Tirkah = harta sendiri + bagian dari setiap sumber
+            estate = level_data["tirkah"]
             notes = []
             notes.append(f"{'='*60}")
             notes.append(f"📊 TINGKAT {level}: Warisan {pewaris}")
             notes.append(f"{'='*60}")
-            notes.append(f"Harta yang dibagi: Rp {tirkah:,.0f}")
+            notes.append(f"Harta sendiri: Rp {float(estate):,.0f}")
+            for src_level, heir_id in level_data["sumber"]:
+                inherited = self._estates[src_level] * self._portions[src_level].get(heir_id, Fraction(0))
+                estate += inherited
+                notes.append(
+                    f"Bagian dari {self.levels[src_level]['pewaris']} (tingkat {src_level}): "
+                    f"Rp {float(inherited):,.0f}"
+                )
+            notes.append(f"Harta yang dibagi: Rp {float(estate):,.0f}")
             notes.append("")
             
-            calc_input = CalculationInput(heirs=heirs, tirkah=tirkah)
-            calculator = FaroidCalculator(calc_input)
-            calculator.notes = notes
-            result = calculator._calculate_normal()
+            if estate <= 0:
+                raise ValueError(f"Tingkat {level} ({pewaris}): tidak ada harta untuk dibagi")
             
-            # Simpan hasil
-            results[f"tingkat_{level}_{pewaris}"] = result
+            calc_input = CalculationInput(heirs=level_data["heirs"], tirkah=float(estate))
+            result = FaroidCalculator(calc_input, notes=NoteLog.from_lines(notes)).calculate()
             
+            self._estates[level] = estate
+            self._portions[level] = _per_person_portions(result)
+            self.results[level] = result
+        
+        self._dirty.clear()
+        logger.debug("Munasakhot: %d dari %d tingkat dihitung ulang", len(affected), len(self.levels))
+        
+        results = {
+            f"tingkat_{level}_{self.levels[level]['pewaris']}": self.results[level]
+            for level in sorted(self.levels)
+        }
+        results["jamiah"] = self._jamiah()
         return results
+    
+    def _jamiah(self) -> CalculationResult:
+        """
+        Gabungan (jami'ah): bagian akhir setiap ahli waris yang masih hidup
+        
+        Bagian dinyatakan sebagai saham bulat dari seluruh harta (tirkah
+        tingkat 1 ditambah harta sendiri tingkat berikutnya). Jika hanya
+        tingkat 1 yang punya harta, ini sama dengan jami'ah klasik.
+        """
+        deaths: Dict[Tuple[int, int], int] = {}
+        for level_data in self.levels.values():
+            for source in level_data["sumber"]:
+                deaths[source] = deaths.get(source, 0) + 1
+        
+        total = sum((level_data["tirkah"] for level_data in self.levels.values()), Fraction(0))
+        recipients = []
+        for level in sorted(self.levels):
+            heirs = self.levels[level]["heirs"]
+            for heir_id in dict.fromkeys(h.id for h in heirs):
+                living = sum(h.quantity for h in heirs if h.id == heir_id) - deaths.get((level, heir_id), 0)
+                portion = self._portions[level].get(heir_id)
+                if living > 0 and portion:
+                    recipients.append((level, heir_id, living, self._estates[level] * portion * living / total))
+        
+        jamiah = lcm_multiple([share.denominator for *_, share in recipients])
+        tirkah = float(total)
+        shares = []
+        for level, heir_id, living, share in recipients:
+            saham = share.numerator * (jamiah // share.denominator)
+            names = HEIR_NAMES.get(heir_id, {})
+            shares.append(HeirShare(
+                heir=HeirResponse(id=heir_id, name_id=names.get("id", "Unknown"),
+                                  name_ar=names.get("ar", "Unknown")),
+                quantity=living,
+                fardh=None,
+                share_fraction=f"{saham}/{jamiah}",
+                saham=float(saham),
+                reason=f"Ahli waris {self.levels[level]['pewaris']} (tingkat {level})",
+                share_amount=float(share * total),
+                percentage=f"{float(share) * 100:.2f}%"
+            ))
+        
+        distributed = sum((share for *_, share in recipients), Fraction(0))
+        return CalculationResult(
+            tirkah=tirkah,
+            ashlul_masalah_awal=self.results[min(self.levels)].ashlul_masalah_akhir if self.levels else 1,
+            ashlul_masalah_akhir=jamiah,
+            total_saham=float(distributed * jamiah),
+            status="Munasakhot",
+            is_special_case=True,
+            special_case_name="Munasakhot",
+            shares=shares,
+            notes=[
+                f"Jami'ah: {jamiah} saham untuk {len(self.levels)} tingkat",
+                f"Total harta semua tingkat: Rp {tirkah:,.0f}",
+            ]
+        )
+
+
+def _exact(value) -> Fraction:
+    """Nilai rupiah sebagai pecahan eksak (float lewat representasi desimalnya)"""
+    if isinstance(value, Fraction):
+        return value
+    return Fraction(str(value))
+
+
+def _heir_inputs(heirs: List[Any]) -> List[HeirInput]:
+    """Terima HeirInput atau dict (dari JSON)"""
+    return [h if isinstance(h, HeirInput) else HeirInput(**h) for h in heirs]
+
+
+def _per_person_portions(result: CalculationResult) -> Dict[int, Fraction]:
+    """Bagian per orang (pecahan dari harta tingkat) per heir_id"""
+    if result.status == "ERROR" or not result.ashlul_masalah_akhir:
+        return {}
+    ashl = result.ashlul_masalah_akhir
+    return {
+        share.heir.id: Fraction(int(share.saham), ashl * share.quantity)
+        for share in result.shares
+        if share.quantity and not share.is_mahjub
+    }
 
 
 def calculate_munasakhot(levels_data: List[Dict[str, Any]], 
@@ -93,11 +267,14 @@ def calculate_munasakhot(levels_data: List[Dict[str, Any]],
                 },
                 {
                     "pewaris": "Budi (ahli waris Ahmad)",
-                    "tirkah": 50000000,  # Bagian dari Ahmad + harta sendiri
+                    "harta_sendiri": 20000000,
+                    "sumber": [{"level": 1, "heir_id": 1}],  # Budi = anak laki-laki Ahmad
                     "heirs": [...],
                     "level": 2
                 }
             ]
+            Tirkah tingkat dengan "sumber" dihitung otomatis: harta sendiri
+            ("harta_sendiri" atau "tirkah") + bagian dari setiap sumber.
         notes: List untuk catatan perhitungan
         
     Returns:
@@ -118,12 +295,13 @@ def calculate_munasakhot(levels_data: List[Dict[str, Any]],
     munasakhot = MunasakhotCase()
     
     # Tambahkan semua tingkat
-    for level_data in levels_data:
+    for index, level_data in enumerate(levels_data, 1):
         munasakhot.add_level(
             pewaris_name=level_data["pewaris"],
-            tirkah=level_data["tirkah"],
+            tirkah=level_data.get("harta_sendiri", level_data.get("tirkah", 0)),
             heirs=level_data["heirs"],
-            level=level_data.get("level", 1)
+            level=level_data.get("level", index),
+            sumber=[(src["level"], src["heir_id"]) for src in level_data.get("sumber", ())]
         )
     
     # Hitung
@@ -167,53 +345,37 @@ def calculate_munasakhot_simple(pewaris1_data: Dict, pewaris2_data: Dict,
         pewaris2_data: Data pewaris kedua (ahli waris dari pewaris 1)
             {
                 "name": "Budi",
-                "bagian_dari_pewaris1": 30000000,
+                "heir_id": 1,  # posisi Budi di antara ahli waris Ahmad
                 "harta_sendiri": 20000000,
                 "heirs": [...]
             }
+            Tanpa "heir_id", "bagian_dari_pewaris1" (jika ada) ditambahkan
+            ke harta sendiri seperti sebelumnya.
         notes: List catatan
         
     Returns:
         Dict hasil perhitungan
     """
-    # Tingkat 1: Pewaris pertama
     notes.append("🔗 MUNASAKHOT SEDERHANA (2 Tingkat)")
     notes.append("")
-    notes.append("="*60)
-    notes.append(f"📊 TINGKAT 1: {pewaris1_data['name']}")
-    notes.append("="*60)
     
-    calc_input_1 = CalculationInput(
-        heirs=pewaris1_data["heirs"],
-        tirkah=pewaris1_data["tirkah"]
-    )
-    calculator_1 = FaroidCalculator(calc_input_1)
-    result_1 = calculator_1.calculate()
+    munasakhot = MunasakhotCase()
+    munasakhot.add_level(pewaris1_data["name"], pewaris1_data["tirkah"], pewaris1_data["heirs"], level=1)
     
-    # Tingkat 2: Ahli waris yang meninggal
-    bagian_dari_pewaris1 = pewaris2_data.get("bagian_dari_pewaris1", 0)
-    harta_sendiri = pewaris2_data.get("harta_sendiri", 0)
-    tirkah_2 = bagian_dari_pewaris1 + harta_sendiri
+    harta_sendiri = _exact(pewaris2_data.get("harta_sendiri", 0))
+    sumber = []
+    if "heir_id" in pewaris2_data:
+        sumber.append((1, pewaris2_data["heir_id"]))
+    else:
+        harta_sendiri += _exact(pewaris2_data.get("bagian_dari_pewaris1", 0))
+    munasakhot.add_level(pewaris2_data["name"], harta_sendiri, pewaris2_data["heirs"],
+                         level=2, sumber=sumber)
     
-    notes.append("")
-    notes.append("="*60)
-    notes.append(f"📊 TINGKAT 2: {pewaris2_data['name']}")
-    notes.append("="*60)
-    notes.append(f"Bagian dari {pewaris1_data['name']}: Rp {bagian_dari_pewaris1:,.0f}")
-    notes.append(f"Harta sendiri: Rp {harta_sendiri:,.0f}")
-    notes.append(f"Total Tirkah: Rp {tirkah_2:,.0f}")
-    notes.append("")
-    
-    calc_input_2 = CalculationInput(
-        heirs=pewaris2_data["heirs"],
-        tirkah=tirkah_2
-    )
-    calculator_2 = FaroidCalculator(calc_input_2)
-    result_2 = calculator_2.calculate()
+    munasakhot.calculate()
     
     return {
-        "pewaris_1": result_1,
-        "pewaris_2": result_2
+        "pewaris_1": munasakhot.results[1],
+        "pewaris_2": munasakhot.results[2]
     }
 
 
@@ -228,6 +390,8 @@ def example_munasakhot():
     - Sebelum warisan dibagi, Budi meninggal
     - Budi memiliki harta sendiri Rp 30.000.000
     - Ahli waris Budi: Istri dan 1 anak laki-laki
+    
+    Bagian Budi dari Ahmad dihitung otomatis dari tingkat pertama.
     """
     from app.utils.constants import HeirID
     
@@ -242,15 +406,10 @@ def example_munasakhot():
         ]
     }
     
-    # Hitung dulu untuk tahu bagian Budi
-    # Istri = 1/8, Budi:Siti = 2:1
-    # Ashl = 8, Istri=1, Sisa=7, Budi=7*2/3=14/3, Siti=7*1/3=7/3
-    bagian_budi = (120_000_000 * 14/3) / 8  # Sekitar 70 juta
-    
     # Data pewaris kedua (Budi)
     pewaris2 = {
         "name": "Budi (anak Ahmad)",
-        "bagian_dari_pewaris1": bagian_budi,
+        "heir_id": HeirID.IBN,
         "harta_sendiri": 30_000_000,
         "heirs": [
             HeirInput(id=HeirID.ZAWJAH, quantity=1),  # Istri Budi
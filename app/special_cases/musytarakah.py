@@ -5,67 +5,134 @@ Al-Musytarakah / Al-Himariyyah (المشتركة / الحمارية)
 Kasus: Suami/Istri + Ibu/Nenek + Saudara seibu + Saudara kandung/seayah
 """
 
+from fractions import Fraction
 from typing import List
-from app.schemas.calculation import CalculationResult
+from app.schemas.calculation import CalculationInput, CalculationResult
 from app.schemas.heir import HeirInput
-from app.utils.constants import HeirID
+from app.utils.constants import HeirID, HEIR_NAMES
+from app.utils.math_helpers import lcm_multiple
+from app.special_cases.registry import CaseSignature
+from app.utils.notes import NoteLog
+
+
+SPECIAL_CASE_NAME = "Al-Musytarakah (Al-Himariyyah)"
+
+# Syarat (definisi klasik):
+# - Ada Zauj (suami); dengan zaujah (1/4) masih ada sisa untuk saudara
+#   kandung sehingga tidak terjadi musytarakah
+# - Ada Ibu atau Nenek (1/6)
+# - Minimal 2 saudara seibu (bersama mendapat 1/3)
+# - Minimal 1 saudara laki-laki kandung (ashobah yang kehabisan sisa)
+# - Tidak ada anak/cucu, Ayah, maupun Kakek
+SIGNATURE = CaseSignature(
+    "musytarakah",
+    required=(HeirID.ZAWJ, HeirID.AKH_ABAWAYN),
+    required_any=(
+        (HeirID.UMM, HeirID.JADDAH_UMM, HeirID.JADDAH_ABB),
+        (HeirID.AKH_UMM, HeirID.UKHT_UMM),
+    ),
+    forbidden=(
+        HeirID.IBN, HeirID.BINT, HeirID.IBN_IBN, HeirID.BINT_IBN,
+        HeirID.ABB, HeirID.JADD,
+    ),
+    counts={(HeirID.AKH_UMM, HeirID.UKHT_UMM): (2, None)},
+)
 
 
 def is_musytarakah(heirs: List[HeirInput]) -> bool:
+    """Cek apakah kasus Musytarakah (lihat SIGNATURE)"""
+    return SIGNATURE.matches(heirs)
+
+
+# Saudara/i yang berserikat pada 1/3, dibagi rata per kepala (laki-laki = perempuan)
+UTERINE_IDS = (HeirID.AKH_UMM, HeirID.UKHT_UMM)
+SHARING_IDS = UTERINE_IDS + (HeirID.AKH_ABAWAYN, HeirID.UKHT_ABAWAYN)
+
+
+def musytarakah_structure(heirs: List[HeirInput], notes: NoteLog):
     """
-    Cek apakah kasus Musytarakah
+    Engine Musytarakah untuk FaroidCalculator (lihat SPECIAL_CASE_ENGINES)
+    
+    Dalam kasus ini, saudara kandung berserikat dengan saudara seibu pada
+    bagian 1/3, padahal normalnya mereka tidak mendapat sisa. Ini adalah
+    pengecualian berdasarkan keputusan Umar bin Khattab RA.
     
-    Syarat:
-    - Ada Suami atau Istri
-    - Ada Ibu atau Nenek
-    - Ada Saudara seibu
-    - Ada Saudara kandung atau seayah
+    Aturan:
+    - Ashl 6: Zauj 1/2 = 3, Ibu/Nenek 1/6 = 1, saudara/i 1/3 = 2
+    - Bagian 1/3 dibagi rata per kepala antara saudara/i seibu dan
+      saudara/i kandung, tanpa membedakan laki-laki dan perempuan
+    - Ashl dinaikkan (inkisar) agar saham setiap orang utuh
+    
+    Returns:
+        SahamStructure
     """
-    heir_dict = {h.id: h.quantity for h in heirs}
+    from app.core.calculator import SahamStructure
+    from app.core.furudh_engine import FurudhEngine, FurudhResult
+    from app.special_cases.gharrawin import share_jaddah_furudh
+    
+    notes.summary("🤝 Kasus Al-Musytarakah (Al-Himariyyah)")
+    notes.add("   Saudara kandung berserikat dengan saudara seibu")
+    notes.add("   pada bagian 1/3 (pengecualian)")
     
-    has_spouse = (heir_dict.get(HeirID.ZAWJ, 0) > 0 or 
-                  heir_dict.get(HeirID.ZAWJAH, 0) > 0)
+    furudh_engine = FurudhEngine(heirs)
+    counts = {h.id: h.quantity for h in heirs}
     
-    has_mother = (heir_dict.get(HeirID.UMM, 0) > 0 or
-                  heir_dict.get(HeirID.JADDAH_UMM, 0) > 0 or
-                  heir_dict.get(HeirID.JADDAH_ABB, 0) > 0)
+    # Zauj 1/2 dan Ibu 1/6 (atau nenek-nenek berbagi 1/6) dari FurudhEngine
+    fixed = [
+        (f, Fraction(f.numerator, f.denominator))
+        for f in share_jaddah_furudh(furudh_engine.determine_furudh())
+        if not f.is_ashobah and f.heir_id not in SHARING_IDS
+    ]
     
-    has_sibling_umm = (heir_dict.get(HeirID.AKH_UMM, 0) > 0 or
-                       heir_dict.get(HeirID.UKHT_UMM, 0) > 0)
+    heads = sum(counts.get(h, 0) for h in SHARING_IDS)
+    pooled = []
+    for heir_id in SHARING_IDS:
+        quantity = counts.get(heir_id, 0)
+        if not quantity:
+            continue
+        share = Fraction(quantity, 3 * heads)
+        pooled.append((FurudhResult(
+            heir_id, quantity, "1/3", share.numerator, share.denominator,
+            f"{HEIR_NAMES[heir_id]['id']} berserikat pada 1/3 bersama saudara/i lain "
+            f"({heads} orang), dibagi rata tanpa membedakan laki-laki dan perempuan "
+            f"(Musytarakah, keputusan Umar bin Khattab RA)."
+        ), share))
     
-    has_sibling_full = (heir_dict.get(HeirID.AKH_ABAWAYN, 0) > 0 or
-                        heir_dict.get(HeirID.UKHT_ABAWAYN, 0) > 0 or
-                        heir_dict.get(HeirID.AKH_AB, 0) > 0 or
-                        heir_dict.get(HeirID.UKHT_AB, 0) > 0)
+    shares = fixed + pooled
+    ashl_awal = 6
+    ashl_akhir = lcm_multiple(
+        [ashl_awal] + [(share / furudh.quantity).denominator for furudh, share in shares]
+    )
+    saham = tuple((furudh, int(share * ashl_akhir)) for furudh, share in shares)
     
-    return has_spouse and has_mother and has_sibling_umm and has_sibling_full
+    notes.add("   Saudara/i yang berserikat: {} orang", heads)
+    notes.summary("   Ashl awal: {}, Ashl akhir: {}", ashl_awal, ashl_akhir)
+    if notes.full:
+        for furudh, value in saham:
+            notes.add("   • {}: {}/{}", HEIR_NAMES.get(furudh.heir_id, {}).get("id", "Unknown"), value, ashl_akhir)
+    notes.add("")
+    
+    mahjub = tuple(
+        (heir.id, heir.quantity, furudh_engine.mahjub[heir.id])
+        for heir in heirs if heir.id in furudh_engine.mahjub
+    )
+    
+    return SahamStructure(
+        ashl_awal=ashl_awal,
+        ashl_akhir=ashl_akhir,
+        status="Adil",
+        shares=saham,
+        notes=notes.events(),
+        mahjub=mahjub,
+        special_case_name=SPECIAL_CASE_NAME,
+    )
 
 
 def calculate_musytarakah(heirs: List[HeirInput], tirkah: float,
                          notes: List[str]) -> CalculationResult:
-    """
-    Hitung Musytarakah
-    
-    Dalam kasus ini, saudara kandung/seayah berserikat dengan saudara seibu
-    pada bagian 1/3, padahal normalnya mereka mahjub.
-    
-    Ini adalah pengecualian berdasarkan keputusan Umar bin Khattab RA
-    """
-    notes.append("🤝 Kasus Al-Musytarakah (Al-Himariyyah)")
-    notes.append("   Saudara kandung/seayah berserikat dengan saudara seibu")
-    notes.append("   pada bagian 1/3 (pengecualian)")
-    notes.append("")
-    
-    # Implementation lengkap
+    """Hitung Musytarakah (lihat musytarakah_structure)"""
     from app.core.calculator import FaroidCalculator
-    from app.schemas.calculation import CalculationInput
     
     calc_input = CalculationInput(heirs=heirs, tirkah=tirkah)
-    calculator = FaroidCalculator(calc_input)
-    calculator.notes = notes
-    result = calculator._calculate_normal()
-    
-    result.is_special_case = True
-    result.special_case_name = "Al-Musytarakah (Al-Himariyyah)"
-    
-    return result
+    calculator = FaroidCalculator(calc_input, notes=NoteLog.from_lines(notes))
+    return calculator.calculate_case(SIGNATURE.case_id)
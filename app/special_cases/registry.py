@@ -0,0 +1,176 @@
+"""
+Registry kasus khusus
+
+Setiap kasus khusus mendeklarasikan signature: ahli waris yang wajib ada,
+kelompok yang minimal salah satunya ada, ahli waris yang tidak boleh ada,
+dan batas jumlah orang. Registry mengompilasi semua signature menjadi satu
+lookup: klasifikasi cukup menghitung satu bitmask (ditambah jumlah orang
+untuk ahli waris yang dibatasi) lalu mencari di tabel, berapa pun jumlah
+kasus yang terdaftar.
+
+Menambah kasus baru (misalnya mafqud atau takharuj):
+    special_case_registry.register(CaseSignature("mafqud", required=(...)))
+"""
+from __future__ import annotations
+from functools import lru_cache
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+import logging
+
+from app.schemas.heir import HeirInput
+from app.utils.bitmask import ids_to_mask
+
+logger = logging.getLogger(__name__)
+
+# Kunci batas jumlah: satu heir_id, atau tuple heir_id yang jumlahnya digabung
+CountKey = Union[int, Tuple[int, ...]]
+
+
+class CaseSignature:
+    """
+    Signature satu kasus khusus
+
+    Args:
+        case_id: ID kasus (dipakai sebagai kunci dispatch)
+        required: Ahli waris yang semuanya wajib ada
+        required_any: Kelompok ahli waris; dari setiap kelompok minimal satu ada
+        forbidden: Ahli waris yang tidak boleh ada
+        counts: {heir_id atau tuple heir_id: (min, max)} batas jumlah orang
+            (max None = tanpa batas); untuk tuple, jumlah orang semua ID
+            di dalamnya dijumlahkan
+    """
+
+    def __init__(self, case_id: str, required: Iterable[int] = (),
+                 required_any: Iterable[Iterable[int]] = (),
+                 forbidden: Iterable[int] = (),
+                 counts: Optional[Dict[CountKey, Tuple[int, Optional[int]]]] = None):
+        self.case_id = case_id
+        self.required_mask = ids_to_mask(required)
+        self.any_masks = tuple(ids_to_mask(group) for group in required_any)
+        self.forbidden_mask = ids_to_mask(forbidden)
+        self.counts: Dict[Tuple[int, ...], Tuple[int, Optional[int]]] = {
+            (tuple(int(heir_id) for heir_id in key) if isinstance(key, tuple) else (int(key),)): limits
+            for key, limits in (counts or {}).items()
+        }
+        self.count_ids = frozenset(heir_id for key in self.counts for heir_id in key)
+
+    @property
+    def relevant_mask(self) -> int:
+        """Semua bit yang mempengaruhi signature ini"""
+        mask = self.required_mask | self.forbidden_mask | ids_to_mask(self.count_ids)
+        for any_mask in self.any_masks:
+            mask |= any_mask
+        return mask
+
+    def matches_mask(self, mask: int, counts: Dict[int, int]) -> bool:
+        """
+        Cek signature terhadap bitmask dan jumlah orang
+
+        Args:
+            mask: Bitmask ahli waris yang ada
+            counts: {heir_id: quantity} untuk ahli waris yang dibatasi jumlahnya
+        """
+        if mask & self.required_mask != self.required_mask:
+            return False
+        if mask & self.forbidden_mask:
+            return False
+        for any_mask in self.any_masks:
+            if not mask & any_mask:
+                return False
+        for heir_ids, (minimum, maximum) in self.counts.items():
+            quantity = sum(counts.get(heir_id, 0) for heir_id in heir_ids)
+            if quantity < minimum or (maximum is not None and quantity > maximum):
+                return False
+        return True
+
+    def matches(self, heirs: List[HeirInput]) -> bool:
+        """Cek signature langsung dari daftar ahli waris"""
+        mask, counts = _heir_mask_and_counts(heirs, self.count_ids)
+        return self.matches_mask(mask, counts)
+
+
+def _heir_mask_and_counts(heirs: List[HeirInput],
+                          count_ids: Iterable[int]) -> Tuple[int, Dict[int, int]]:
+    """Bitmask ahli waris (quantity > 0) dan jumlah orang untuk count_ids"""
+    mask = 0
+    counts: Dict[int, int] = {}
+    for heir in heirs:
+        if heir.quantity > 0:
+            mask |= 1 << int(heir.id)
+            if heir.id in count_ids:
+                counts[heir.id] = counts.get(heir.id, 0) + heir.quantity
+    return mask, counts
+
+
+class SpecialCaseRegistry:
+    """
+    Registry signature kasus khusus dengan lookup terkompilasi
+
+    Urutan pendaftaran = prioritas: kasus pertama yang cocok dipakai.
+    """
+
+    def __init__(self):
+        self._signatures: List[CaseSignature] = []
+        self._lock = Lock()
+        self._compile()
+
+    def register(self, signature: CaseSignature) -> None:
+        """Daftarkan kasus khusus (ID kasus harus unik)"""
+        with self._lock:
+            if any(s.case_id == signature.case_id for s in self._signatures):
+                raise ValueError(f"Kasus khusus '{signature.case_id}' sudah terdaftar")
+            self._signatures.append(signature)
+            self._compile()
+
+    @property
+    def case_ids(self) -> Tuple[str, ...]:
+        return tuple(s.case_id for s in self._signatures)
+
+    def _compile(self) -> None:
+        """Bangun ulang mask gabungan dan tabel lookup"""
+        signatures = tuple(self._signatures)
+        relevant_mask = 0
+        caps: Dict[int, int] = {}
+        for signature in signatures:
+            relevant_mask |= signature.relevant_mask
+            for heir_ids, (minimum, maximum) in signature.counts.items():
+                # Jumlah di atas batas terbesar tidak mengubah hasil (juga
+                # untuk jumlah gabungan: setiap ID dibatasi dengan batas grup)
+                cap = max(minimum, maximum if maximum is not None else 0) + 1
+                for heir_id in heir_ids:
+                    caps[heir_id] = max(caps.get(heir_id, 0), cap)
+
+        @lru_cache(maxsize=4096)
+        def lookup(mask: int, counts: Tuple[int, ...]) -> Optional[str]:
+            count_map = dict(zip(count_ids, counts))
+            for signature in signatures:
+                if signature.matches_mask(mask, count_map):
+                    return signature.case_id
+            return None
+
+        count_ids = tuple(sorted(caps))
+        # Satu atribut supaya pembaca tidak pernah melihat kompilasi setengah jadi
+        self._compiled = (
+            relevant_mask, count_ids, tuple(caps[heir_id] for heir_id in count_ids), lookup
+        )
+
+    def classify(self, heirs: List[HeirInput]) -> Optional[str]:
+        """
+        Tentukan kasus khusus untuk daftar ahli waris
+
+        Returns:
+            ID kasus khusus atau None
+        """
+        relevant_mask, count_ids, caps, lookup = self._compiled
+        mask, counts = _heir_mask_and_counts(heirs, count_ids)
+        key = tuple(min(counts.get(heir_id, 0), cap) for heir_id, cap in zip(count_ids, caps))
+        return lookup(mask & relevant_mask, key)
+
+
+# Registry global; kasus bawaan didaftarkan di app.special_cases
+special_case_registry = SpecialCaseRegistry()
+
+
+def classify_special_case(heirs: List[HeirInput]) -> Optional[str]:
+    """Fungsi helper untuk klasifikasi kasus khusus"""
+    return special_case_registry.classify(heirs)
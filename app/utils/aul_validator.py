@@ -1,13 +1,18 @@
 """
 Validator untuk 'Aul (العول) - Kenaikan Ashl
+
+Klasifikasi 'aul memakai tabel yang dibangun sekali saat modul di-import:
+(ashl, total saham furudh) → ashl setelah 'aul, nama 'aul, valid atau tidak.
+Pasangan di luar tabel diklasifikasikan dengan aturan yang sama.
 """
+from __future__ import annotations
+from typing import Dict, Optional, Tuple
+
+from app.utils.constants import VALID_AUL
 
 # Mapping 'Aul yang valid menurut kitab
-AUL_VALID_CASES = {
-    6: [7, 8, 9, 10],     # Ashl 6 bisa naik ke 7,8,9,10
-    12: [13, 15, 17],     # Ashl 12 bisa naik ke 13,15,17
-    24: [27]              # Ashl 24 bisa naik ke 27
-}
+# Ashl 6 bisa naik ke 7,8,9,10; ashl 12 ke 13,15,17; ashl 24 ke 27
+AUL_VALID_CASES = VALID_AUL
 
 # Nama 'Aul
 AUL_NAMES = {
@@ -21,13 +26,72 @@ AUL_NAMES = {
     (24, 27): "Al-'Aul min Arba'ah wa 'Isyrin"
 }
 
+# Semua ashl al-mas'alah yang mungkin dari penyebut furudh (2, 3, 4, 6, 8)
+ASHL_VALUES = (2, 3, 4, 6, 8, 12, 24)
+
+
+class AulClass:
+    """
+    Hasil klasifikasi 'aul
+
+    Attributes:
+        ashl_akhir: Ashl setelah 'aul (= total saham jika terjadi 'aul)
+        name: Nama 'aul dari AUL_NAMES, None jika tidak standar
+        valid: True jika 'aul sesuai kitab
+        message: Pesan validasi untuk catatan perhitungan
+    """
+
+    __slots__ = ("ashl_akhir", "name", "valid", "message")
+
+    def __init__(self, ashl_akhir: int, name: Optional[str], valid: bool, message: str):
+        self.ashl_akhir = ashl_akhir
+        self.name = name
+        self.valid = valid
+        self.message = message
+
+
+def _classify(ashl: int, total_saham: int) -> AulClass:
+    """Klasifikasi satu pasangan (ashl, total saham furudh)"""
+    if total_saham <= ashl:
+        return AulClass(ashl, None, False, f"Tidak terjadi 'aul pada ashl {ashl}")
+    if ashl not in AUL_VALID_CASES:
+        return AulClass(total_saham, None, False, f"Ashl {ashl} tidak pernah mengalami 'aul")
+    if total_saham not in AUL_VALID_CASES[ashl]:
+        return AulClass(total_saham, None, False, f"'Aul dari {ashl} ke {total_saham} tidak valid")
+    name = AUL_NAMES.get((ashl, total_saham), "")
+    return AulClass(total_saham, name, True, f"✅ Valid: {name}")
+
+
+def _build_aul_table() -> Dict[Tuple[int, int], AulClass]:
+    """Tabel 'aul untuk setiap ashl dan total saham sampai dua kali ashl"""
+    return {
+        (ashl, total): _classify(ashl, total)
+        for ashl in ASHL_VALUES
+        for total in range(ashl + 1, 2 * ashl + 1)
+    }
+
+
+AUL_TABLE = _build_aul_table()
+
+
+def classify_aul(ashl: int, total_saham: int) -> AulClass:
+    """
+    Klasifikasi 'aul dengan satu lookup tabel
+
+    Args:
+        ashl: Ashl al-mas'alah sebelum 'aul (sebelum inkisar)
+        total_saham: Total saham furudh pada ashl tersebut
+
+    Returns:
+        AulClass
+    """
+    aul = AUL_TABLE.get((ashl, total_saham))
+    if aul is None:
+        aul = _classify(ashl, total_saham)
+    return aul
+
+
 def validate_aul(ashl_awal: int, ashl_akhir: int) -> tuple[bool, str]:
     """Validasi apakah 'aul yang terjadi sesuai dengan kitab"""
-    if ashl_awal not in AUL_VALID_CASES:
-        return False, f"Ashl {ashl_awal} tidak pernah mengalami 'aul"
-    
-    if ashl_akhir not in AUL_VALID_CASES[ashl_awal]:
-        return False, f"'Aul dari {ashl_awal} ke {ashl_akhir} tidak valid"
-    
-    aul_name = AUL_NAMES.get((ashl_awal, ashl_akhir), "")
-    return True, f"✅ Valid: {aul_name}"
+    aul = classify_aul(ashl_awal, ashl_akhir)
+    return aul.valid, aul.message
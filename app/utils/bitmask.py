@@ -0,0 +1,54 @@
+"""
+Helper bitmask untuk keberadaan ahli waris
+
+Setiap HeirID (1-25) dipetakan ke satu bit, sehingga himpunan ahli waris
+yang ada cukup disimpan dalam satu integer dan syarat-syarat aturan furudh
+bisa dicek dengan operasi AND.
+"""
+from __future__ import annotations
+from typing import Dict, Iterable
+from app.utils.constants import HeirID
+
+
+def heir_bit(heir_id: int) -> int:
+    """Bit untuk satu ahli waris"""
+    return 1 << int(heir_id)
+
+
+def ids_to_mask(heir_ids: Iterable[int]) -> int:
+    """
+    Konversi daftar HeirID menjadi bitmask
+
+    Args:
+        heir_ids: Daftar ID ahli waris
+
+    Returns:
+        Integer dengan bit ahli waris yang ada
+    """
+    mask = 0
+    for heir_id in heir_ids:
+        mask |= 1 << int(heir_id)
+    return mask
+
+
+def quantities_to_mask(heir_dict: Dict[int, int]) -> int:
+    """Bitmask dari dict {heir_id: quantity}, hanya yang quantity > 0"""
+    mask = 0
+    for heir_id, quantity in heir_dict.items():
+        if quantity > 0:
+            mask |= 1 << int(heir_id)
+    return mask
+
+
+# Saudara/i semua jenis (kandung, seayah, seibu)
+SIBLING_IDS = (
+    HeirID.AKH_ABAWAYN, HeirID.AKH_AB, HeirID.AKH_UMM,
+    HeirID.UKHT_ABAWAYN, HeirID.UKHT_AB, HeirID.UKHT_UMM,
+)
+SIBLING_MASK = ids_to_mask(SIBLING_IDS)
+
+# Anak dan cucu dari anak laki-laki (far'u warits)
+DESCENDANT_IDS = (HeirID.IBN, HeirID.BINT, HeirID.IBN_IBN, HeirID.BINT_IBN)
+DESCENDANT_MASK = ids_to_mask(DESCENDANT_IDS)
+
+SPOUSE_MASK = ids_to_mask((HeirID.ZAWJ, HeirID.ZAWJAH))
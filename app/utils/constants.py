@@ -3,7 +3,7 @@ Konstanta untuk Kalkulator Faroid
 Berdasarkan Kitab Zahrotul Faridhah dan Rumus Faroidh
 """
 
-from enum import IntEnum
+from enum import Enum, IntEnum
 from typing import Dict, List
 
 
@@ -41,6 +41,18 @@ class HeirID(IntEnum):
     MUTIQAH = 25               # Perempuan pembebas budak
 
 
+class NoteVerbosity(str, Enum):
+    """Tingkat detail catatan perhitungan"""
+    NONE = "none"              # Tanpa catatan
+    SUMMARY = "summary"        # Ringkasan langkah utama
+    FULL = "full"              # Semua langkah perhitungan
+
+
+# Versi ruleset engine. Naikkan setiap kali aturan atau hasil perhitungan
+# berubah agar tabel/cache hasil yang dibangun dengan versi lama tidak dipakai.
+RULESET_VERSION = "2025.10.11"
+
+
 # Nama ahli waris dalam bahasa Indonesia dan Arab
 HEIR_NAMES = {
     HeirID.IBN: {"id": "Anak Laki-laki", "ar": "ابن"},
@@ -311,14 +323,16 @@ FURUDH_RULES = {
             "kondisi": "Satu saudari kandung tanpa ashib",
             "alasan": "Saudari kandung tunggal mendapat 1/2 (setengah) ketika tidak ada anak, cucu, ayah, kakek, saudara laki-laki kandung, dan tidak ada ashib yang menjadikannya ashobah. Dasar hukum: QS. An-Nisa ayat 176.",
             "jumlah": 1,
-            "syarat_tidak_ada": [HeirID.IBN, HeirID.IBN_IBN, HeirID.ABB, HeirID.JADD, HeirID.AKH_ABAWAYN]
+            "syarat_tidak_ada": [HeirID.IBN, HeirID.IBN_IBN, HeirID.ABB, HeirID.JADD, HeirID.AKH_ABAWAYN,
+                                 HeirID.BINT, HeirID.BINT_IBN]
         },
         {
             "fardh": "2/3",
             "kondisi": "Dua atau lebih saudari kandung tanpa ashib",
             "alasan": "Dua saudari kandung atau lebih mendapat 2/3 (dua pertiga) untuk dibagi rata ketika tidak ada anak, cucu, ayah, kakek, dan saudara laki-laki kandung. Dasar hukum: QS. An-Nisa ayat 176.",
             "jumlah_min": 2,
-            "syarat_tidak_ada": [HeirID.IBN, HeirID.IBN_IBN, HeirID.ABB, HeirID.JADD, HeirID.AKH_ABAWAYN]
+            "syarat_tidak_ada": [HeirID.IBN, HeirID.IBN_IBN, HeirID.ABB, HeirID.JADD, HeirID.AKH_ABAWAYN,
+                                 HeirID.BINT, HeirID.BINT_IBN]
         },
         {
             "fardh": "Ashobah bil-ghair",
@@ -351,14 +365,16 @@ FURUDH_RULES = {
             "kondisi": "Satu saudari seayah tanpa saudara kandung dan ashib",
             "alasan": "Saudari seayah tunggal mendapat 1/2 (setengah) ketika tidak ada saudara kandung (laki-laki atau perempuan), tidak ada anak, cucu, ayah, dan ashib lainnya. Posisinya seperti saudari kandung. Dasar hukum: QS. An-Nisa ayat 176 (analogi).",
             "jumlah": 1,
-            "syarat_tidak_ada": [HeirID.IBN, HeirID.IBN_IBN, HeirID.ABB, HeirID.JADD, HeirID.AKH_ABAWAYN, HeirID.UKHT_ABAWAYN, HeirID.AKH_AB]
+            "syarat_tidak_ada": [HeirID.IBN, HeirID.IBN_IBN, HeirID.ABB, HeirID.JADD, HeirID.AKH_ABAWAYN, HeirID.UKHT_ABAWAYN, HeirID.AKH_AB,
+                                 HeirID.BINT, HeirID.BINT_IBN]
         },
         {
             "fardh": "2/3",
             "kondisi": "Dua atau lebih saudari seayah tanpa saudara kandung",
             "alasan": "Dua saudari seayah atau lebih mendapat 2/3 (dua pertiga) untuk dibagi rata ketika tidak ada saudara kandung dan ashib yang menghalangi. Dasar hukum: Analogi dengan saudari kandung.",
             "jumlah_min": 2,
-            "syarat_tidak_ada": [HeirID.IBN, HeirID.IBN_IBN, HeirID.ABB, HeirID.JADD, HeirID.AKH_ABAWAYN, HeirID.UKHT_ABAWAYN, HeirID.AKH_AB]
+            "syarat_tidak_ada": [HeirID.IBN, HeirID.IBN_IBN, HeirID.ABB, HeirID.JADD, HeirID.AKH_ABAWAYN, HeirID.UKHT_ABAWAYN, HeirID.AKH_AB,
+                                 HeirID.BINT, HeirID.BINT_IBN]
         },
         {
             "fardh": "1/6",
@@ -1,270 +1,229 @@
 """
 Module untuk menangani Inkisar (Tashih) sesuai dengan kitab Faroidh.
+
+عدد المضروب setiap kelompok adalah ruus ÷ GCD(ruus, saham), dan hasil
+perbandingan (mumatsalah/mudakholah/mubayanah/muwafaqoh) antar عدد المضروب
+selalu sama dengan KPK-nya. Karena itu multiplier dihitung dengan satu kali
+lipatan GCD/KPK atas semua kelompok, di-cache per pola (ruus, saham) dan
+ashl bersama langkah penjelasannya.
 """
 
-from typing import List, Tuple
+from functools import lru_cache
+from typing import List, Sequence, Tuple
 from math import gcd
 
-
-def _relation(a: int, b: int) -> str:
-    """Menentukan hubungan perbandingan antara dua bilangan"""
-    # ✅ FIX: Convert to INT
-    a = int(a)
-    b = int(b)
-    
-    if a == b:
-        return "mumatsalah"
-    if a % b == 0 or b % a == 0:
-        return "mudakholah"
-    g = gcd(a, b)
-    if g == 1:
-        return "mubayanah"
-    return "muwafaqoh"
-
-
-def _single_group_adad_madhrub(ruus: int, saham: int) -> Tuple[int, str]:
-    """Hitung عدد المضروب untuk 1 kelompok"""
-    # ✅ FIX: Convert to INT
-    ruus = int(ruus)
-    saham = int(saham)
-    
-    rel = _relation(ruus, saham)
-    
-    if rel == "mubayanah":
-        return ruus, rel
-    if rel == "muwafaqoh":
-        g = gcd(ruus, saham)
-        return ruus // g, rel
-    return 1, rel
+from app.utils.notes import NoteLog
 
 
-def _compare_madhrub(madhrub_list: List[int]) -> int:
-    """Bandingkan semua عدد المضروب"""
-    if not madhrub_list:
-        return 1
-    
-    filtered = [m for m in madhrub_list if m > 1]
-    if not filtered:
-        return 1
-    if len(filtered) == 1:
-        return filtered[0]
-    
-    result = filtered[0]
-    for i in range(1, len(filtered)):
-        current = filtered[i]
-        rel = _relation(result, current)
-        
-        if rel == "mumatsalah":
-            result = result
-        elif rel == "mudakholah":
-            result = max(result, current)
-        elif rel == "mubayanah":
-            result = result * current
-        elif rel == "muwafaqoh":
-            g = gcd(result, current)
-            result = (result * current) // g
-    
-    return result
+# Langkah penjelasan: (jenis, template, args)
+#   "summary" → NoteLog.summary, "add" → NoteLog.add,
+#   "group"   → NoteLog.add dengan nama kelompok ke-args[0] disisipkan
+InkisarStep = Tuple[str, str, tuple]
+InkisarGroup = Tuple[int, int]  # (ruus, saham)
 
 
-def compute_inkisar_single_group(ruus: int, saham: int, ashl: int, notes: List[str]) -> Tuple[int, List[str]]:
-    """KASUS 1: Hanya 1 kelompok yang tidak bisa dibagi utuh"""
-    ruus = int(ruus)
-    saham = int(saham)
-    ashl = int(ashl)
-    
-    if saham % ruus == 0:
-        return ashl, notes
-    
-    # Detail analysis
-    notes.append(f"   📊 ANALISIS DETAIL:")
-    notes.append(f"   عدد الرؤوس : Saham = {ruus} : {saham}")
-    notes.append(f"   Pembagian: {saham} ÷ {ruus} = {saham/ruus:.3f} ❌ (tidak utuh)")
-    
+def _single_group_steps(ruus: int, saham: int, ashl: int) -> Tuple[int, Tuple[InkisarStep, ...]]:
+    """Multiplier dan langkah penjelasan untuk 1 kelompok"""
+    steps: List[InkisarStep] = [
+        ("add", "   📊 ANALISIS DETAIL:", ()),
+        ("add", "   عدد الرؤوس : Saham = {} : {}", (ruus, saham)),
+        ("add", "   Pembagian: {} ÷ {} = {:.3f} ❌ (tidak utuh)", (saham, ruus, saham / ruus)),
+    ]
     g = gcd(ruus, saham)
-    notes.append(f"   GCD({ruus}, {saham}) = {g}")
-    
-    rel = _relation(ruus, saham)
-    
-    if rel == "mubayanah":
-        ashl_baru = ashl * ruus
-        notes.append(f"   Hubungan: MUBAYANAH (مباينة)")
-        notes.append(f"   عدد المضروب = عدد الرؤوس = {ruus}")
-        notes.append(f"   Ashl baru = {ashl} × {ruus} = {ashl_baru}")
-    elif rel == "muwafaqoh":
-        wafq = ruus // g
-        ashl_baru = ashl * wafq
-        notes.append(f"   Hubungan: MUWAFAQOH (موافقة)")
-        notes.append(f"   عدد المضروب = {ruus} ÷ {g} = {wafq}")
-        notes.append(f"   Ashl baru = {ashl} × {wafq} = {ashl_baru}")
-    elif rel == "mudakholah":
-        if saham < ruus:
-            multiplier = ruus // saham
-            ashl_baru = ashl * multiplier
-            notes.append(f"   Hubungan: MUDAKHOLAH (تداخل)")
-            notes.append(f"   عدد المضروب = {ruus} ÷ {saham} = {multiplier}")
-            notes.append(f"   Ashl baru = {ashl} × {multiplier} = {ashl_baru}")
-        else:
-            ashl_baru = ashl
-            notes.append(f"   Hubungan: MUDAKHOLAH (تداخل) - sudah bisa dibagi")
-    else:
-        ashl_baru = ashl
-        notes.append(f"   Hubungan: MUMATSALAH (متماثلة) - sudah bisa dibagi")
-    
-    return ashl_baru, notes
-
-
+    steps.append(("add", "   GCD({}, {}) = {}", (ruus, saham, g)))
 
+    multiplier = ruus // g
+    ashl_baru = ashl * multiplier
+    if ruus % saham == 0:
+        steps.append(("add", "   Hubungan: MUDAKHOLAH (تداخل)", ()))
+        steps.append(("add", "   عدد المضروب = {} ÷ {} = {}", (ruus, saham, multiplier)))
+    elif g == 1:
+        steps.append(("add", "   Hubungan: MUBAYANAH (مباينة)", ()))
+        steps.append(("add", "   عدد المضروب = عدد الرؤوس = {}", (ruus,)))
+    else:
+        steps.append(("add", "   Hubungan: MUWAFAQOH (موافقة)", ()))
+        steps.append(("add", "   عدد المضروب = {} ÷ {} = {}", (ruus, g, multiplier)))
+    steps.append(("summary", "   Ashl baru = {} × {} = {}", (ashl, multiplier, ashl_baru)))
+    return multiplier, tuple(steps)
+
+
+def _multiple_groups_steps(groups: Tuple[InkisarGroup, ...],
+                           ashl: int) -> Tuple[int, Tuple[InkisarStep, ...]]:
+    """Multiplier dan langkah penjelasan untuk lebih dari 1 kelompok"""
+    steps: List[InkisarStep] = [
+        ("add", "🔹 INKISAR - Kasus Banyak Kelompok", ()),
+        ("add", "   Jumlah kelompok: {}", (len(groups),)),
+        ("add", "", ()),
+        ("add", "   📊 STEP A: Analisis Individual per Kelompok", ()),
+    ]
 
-def compute_inkisar_multiple_groups(groups: List[Tuple[str, int, int]], ashl: int, notes: List[str]) -> Tuple[int, List[str]]:
-    """KASUS 2: Lebih dari 1 kelompok yang tidak bisa dibagi utuh"""
-    # ✅ FIX: Convert to INT
-    ashl = int(ashl)
-    
-    notes.append(f"🔹 INKISAR - Kasus Banyak Kelompok")
-    notes.append(f"   Jumlah kelompok: {len(groups)}")
-    notes.append("")
-    
-    # STEP A: Detail perbandingan individual
+    # STEP A: عدد المضروب per kelompok
     madhrub_list = []
-    notes.append(f"   📊 STEP A: Analisis Individual per Kelompok")
-    
-    for i, (nama, ruus, saham) in enumerate(groups, 1):
-        ruus = int(ruus)  
-        saham = int(saham)  
-        
-        notes.append(f"   ┌─ Kelompok {i}: {nama}")
-        notes.append(f"   │  عدد الرؤوس : Saham = {ruus} : {saham}")
-        notes.append(f"   │  Pembagian: {saham} ÷ {ruus} = {saham/ruus:.3f} ❌ (tidak utuh)")
-        
-        # Hitung GCD dan relasi
+    for i, (ruus, saham) in enumerate(groups, 1):
         g = gcd(ruus, saham)
-        notes.append(f"   │  GCD({ruus}, {saham}) = {g}")
-        
-        # Tentukan relasi
+        madhrub = ruus // g
+        steps.append(("group", "   ┌─ Kelompok {}: {}", (i,)))
+        steps.append(("add", "   │  عدد الرؤوس : Saham = {} : {}", (ruus, saham)))
+        steps.append(("add", "   │  Pembagian: {} ÷ {} = {:.3f} ❌ (tidak utuh)", (saham, ruus, saham / ruus)))
+        steps.append(("add", "   │  GCD({}, {}) = {}", (ruus, saham, g)))
         if g == 1:
-            rel = "MUBAYANAH"
-            madhrub = ruus
-            notes.append(f"   │  Hubungan: {rel} (مباينة)")
-            notes.append(f"   │  عدد المضروب = عدد الرؤوس = {madhrub}")
-        elif ruus % saham == 0 or saham % ruus == 0:
-            rel = "MUDAKHOLAH" 
-            if ruus > saham:
-                madhrub = ruus // g
-                notes.append(f"   │  Hubungan: {rel} (تداخل)")
-                notes.append(f"   │  عدد المضروب = {ruus} ÷ {g} = {madhrub}")
-            else:
-                madhrub = saham // g
-                notes.append(f"   │  Hubungan: {rel} (تداخل)")
-                notes.append(f"   │  عدد المضروب = {saham} ÷ {g} = {madhrub}")
+            steps.append(("add", "   │  Hubungan: {} (مباينة)", ("MUBAYANAH",)))
+            steps.append(("add", "   │  عدد المضروب = عدد الرؤوس = {}", (madhrub,)))
+        elif ruus % saham == 0:
+            steps.append(("add", "   │  Hubungan: {} (تداخل)", ("MUDAKHOLAH",)))
+            steps.append(("add", "   │  عدد المضروب = {} ÷ {} = {}", (ruus, g, madhrub)))
         else:
-            rel = "MUWAFAQOH"
-            madhrub = ruus // g
-            notes.append(f"   │  Hubungan: {rel} (موافقة)")
-            notes.append(f"   │  عدد المضروب = {ruus} ÷ {g} = {madhrub}")
-        
+            steps.append(("add", "   │  Hubungan: {} (موافقة)", ("MUWAFAQOH",)))
+            steps.append(("add", "   │  عدد المضروب = {} ÷ {} = {}", (ruus, g, madhrub)))
         madhrub_list.append(madhrub)
-        notes.append(f"   └─ Hasil: عدد المضروب = {madhrub}")
-        notes.append("")
-    
-    # STEP B: Perbandingan عدد المضروب
-    notes.append(f"   🔄 STEP B: Perbandingan عدد المضروب")
-    notes.append(f"   Daftar عدد المضروب: {madhrub_list}")
-    notes.append("")
-    
-    # Proses perbandingan bertingkat
+        steps.append(("add", "   └─ Hasil: عدد المضروب = {}", (madhrub,)))
+        steps.append(("add", "", ()))
+
+    # STEP B: satu lipatan KPK atas semua عدد المضروب
+    steps.append(("add", "   🔄 STEP B: Perbandingan عدد المضروب", ()))
+    steps.append(("add", "   Daftar عدد المضروب: {}", (str(madhrub_list),)))
+    steps.append(("add", "", ()))
+
     if len(madhrub_list) == 2:
-        a, b = madhrub_list[0], madhrub_list[1]
-        notes.append(f"   Bandingkan: {a} dengan {b}")
-        
-        g_final = gcd(a, b)
-        notes.append(f"   GCD({a}, {b}) = {g_final}")
-        
+        a, b = madhrub_list
+        g = gcd(a, b)
+        steps.append(("add", "   Bandingkan: {} dengan {}", (a, b)))
+        steps.append(("add", "   GCD({}, {}) = {}", (a, b, g)))
+        multiplier = a * b // g
         if a == b:
-            multiplier = a
-            notes.append(f"   Hubungan: MUMATSALAH (متماثلة)")
-            notes.append(f"   Multiplier = {a}")
+            steps.append(("add", "   Hubungan: MUMATSALAH (متماثلة)", ()))
+            steps.append(("add", "   Multiplier = {}", (a,)))
         elif a % b == 0 or b % a == 0:
-            multiplier = max(a, b)
-            notes.append(f"   Hubungan: MUDAKHOLAH (تداخل)")
-            notes.append(f"   Multiplier = max({a}, {b}) = {multiplier}")
-        elif g_final == 1:
-            multiplier = a * b
-            notes.append(f"   Hubungan: MUBAYANAH (مباينة)")
-            notes.append(f"   Multiplier = {a} × {b} = {multiplier}")
+            steps.append(("add", "   Hubungan: MUDAKHOLAH (تداخل)", ()))
+            steps.append(("add", "   Multiplier = max({}, {}) = {}", (a, b, multiplier)))
+        elif g == 1:
+            steps.append(("add", "   Hubungan: MUBAYANAH (مباينة)", ()))
+            steps.append(("add", "   Multiplier = {} × {} = {}", (a, b, multiplier)))
         else:
-            multiplier = (a * b) // g_final
-            notes.append(f"   Hubungan: MUWAFAQOH (موافقة)")
-            notes.append(f"   Multiplier = ({a} × {b}) ÷ {g_final} = {multiplier}")
-            
+            steps.append(("add", "   Hubungan: MUWAFAQOH (موافقة)", ()))
+            steps.append(("add", "   Multiplier = ({} × {}) ÷ {} = {}", (a, b, g, multiplier)))
     else:
-        # Lebih dari 2 kelompok - proses bertahap
-        notes.append(f"   Proses bertahap untuk {len(madhrub_list)} kelompok:")
+        steps.append(("add", "   Proses bertahap untuk {} kelompok:", (len(madhrub_list),)))
         multiplier = madhrub_list[0]
-        
-        for i in range(1, len(madhrub_list)):
-            current = madhrub_list[i]
-            g_step = gcd(multiplier, current)
-            
-            notes.append(f"   Langkah {i}: {multiplier} dengan {current}")
-            notes.append(f"   GCD({multiplier}, {current}) = {g_step}")
-            
+        for i, current in enumerate(madhrub_list[1:], 1):
+            g = gcd(multiplier, current)
+            steps.append(("add", "   Langkah {}: {} dengan {}", (i, multiplier, current)))
+            steps.append(("add", "   GCD({}, {}) = {}", (multiplier, current, g)))
             if multiplier == current:
-                notes.append(f"   Hubungan: MUMATSALAH → Result = {multiplier}")
+                relation = "MUMATSALAH"
             elif multiplier % current == 0 or current % multiplier == 0:
-                multiplier = max(multiplier, current)
-                notes.append(f"   Hubungan: MUDAKHOLAH → Result = {multiplier}")
-            elif g_step == 1:
-                multiplier = multiplier * current
-                notes.append(f"   Hubungan: MUBAYANAH → Result = {multiplier}")
+                relation = "MUDAKHOLAH"
+            elif g == 1:
+                relation = "MUBAYANAH"
             else:
-                multiplier = (multiplier * current) // g_step
-                notes.append(f"   Hubungan: MUWAFAQOH → Result = {multiplier}")
+                relation = "MUWAFAQOH"
+            multiplier = multiplier * current // g
+            steps.append(("add", "   Hubungan: {} → Result = {}", (relation, multiplier)))
+
+    steps.append(("add", "", ()))
+    steps.append(("add", "   🎯 HASIL AKHIR:", ()))
+    steps.append(("add", "   Multiplier final = {}", (multiplier,)))
+    steps.append(("summary", "   Ashl baru = {} × {} = {}", (ashl, multiplier, ashl * multiplier)))
+    return multiplier, tuple(steps)
+
+
+@lru_cache(maxsize=4096)
+def resolve_inkisar(groups: Tuple[InkisarGroup, ...], ashl: int) -> Tuple[int, Tuple[InkisarStep, ...]]:
+    """
+    Multiplier inkisar untuk kelompok yang sahamnya tidak habis dibagi ruus
+
+    Biaya linear terhadap jumlah kelompok (satu lipatan GCD/KPK), hasil
+    di-cache per pola kelompok dan ashl.
+
+    Args:
+        groups: Tuple (ruus, saham) per kelompok yang tidak habis dibagi
+        ashl: Ashl sebelum inkisar (hanya untuk langkah penjelasan)
+
+    Returns:
+        Tuple (multiplier, langkah penjelasan); multiplier 1 jika groups kosong
+    """
+    if not groups:
+        return 1, ()
+    if len(groups) == 1:
+        return _single_group_steps(groups[0][0], groups[0][1], ashl)
+    return _multiple_groups_steps(groups, ashl)
+
+
+def replay_inkisar_steps(steps: Sequence[InkisarStep], notes: NoteLog,
+                         names: Sequence[str] = ()) -> None:
+    """
+    Catat langkah penjelasan inkisar ke NoteLog
+
+    Args:
+        steps: Langkah dari resolve_inkisar
+        notes: NoteLog tujuan
+        names: Nama kelompok sesuai urutan groups (untuk langkah "group")
+    """
+    if not notes.enabled:
+        return
+    for kind, template, args in steps:
+        if kind == "summary":
+            notes.summary(template, *args)
+        elif kind == "group":
+            index = args[0]
+            notes.add(template, index, names[index - 1] if index <= len(names) else "")
+        else:
+            notes.add(template, *args)
+
+
+def compute_inkisar_single_group(ruus: int, saham: int, ashl: int, notes: NoteLog) -> Tuple[int, NoteLog]:
+    """KASUS 1: Hanya 1 kelompok yang tidak bisa dibagi utuh"""
+    ruus = int(ruus)
+    saham = int(saham)
+    ashl = int(ashl)
     
-    ashl_baru = ashl * multiplier
-    notes.append("")
-    notes.append(f"   🎯 HASIL AKHIR:")
-    notes.append(f"   Multiplier final = {multiplier}")
-    notes.append(f"   Ashl baru = {ashl} × {multiplier} = {ashl_baru}")
+    if saham % ruus == 0:
+        return ashl, notes
     
-    return ashl_baru, notes
+    multiplier, steps = resolve_inkisar(((ruus, saham),), ashl)
+    replay_inkisar_steps(steps, notes)
+    return ashl * multiplier, notes
 
 
+def compute_inkisar_multiple_groups(groups: List[Tuple[str, int, int]], ashl: int, notes: NoteLog) -> Tuple[int, NoteLog]:
+    """KASUS 2: Lebih dari 1 kelompok yang tidak bisa dibagi utuh"""
+    ashl = int(ashl)
+    
+    multiplier, steps = resolve_inkisar(
+        tuple((int(ruus), int(saham)) for _, ruus, saham in groups), ashl
+    )
+    replay_inkisar_steps(steps, notes, [nama for nama, _, _ in groups])
+    return ashl * multiplier, notes
+
+
+
+def check_and_apply_inkisar(furudh_saham: List[Tuple], ashl: int, notes: NoteLog) -> Tuple[int, List[Tuple], NoteLog]:
+    """
+    Main function: Cek apakah perlu Inkisar dan apply jika diperlukan
 
-def check_and_apply_inkisar(furudh_saham: List[Tuple], ashl: int, notes: List[str]) -> Tuple[int, List[Tuple], List[str]]:
-    """Main function: Cek apakah perlu Inkisar dan apply jika diperlukan"""
+    Saham di furudh_saham dikalikan di tempat (list yang sama dikembalikan).
+    """
     from app.utils.constants import HEIR_NAMES
     
-    # ✅ FIX: Convert to INT
     ashl = int(ashl)
     
-    groups_need_inkisar = []
-    
+    groups = []
+    names = []
     for furudh, saham in furudh_saham:
-        saham = int(saham)  # ✅ FIX
-        if furudh.quantity > 1:
-            if saham % furudh.quantity != 0:
+        if furudh.quantity > 1 and saham % furudh.quantity != 0:
+            groups.append((furudh.quantity, int(saham)))
+            if notes.full:
                 heir_name = HEIR_NAMES.get(furudh.heir_id, {}).get("id", "Unknown")
-                groups_need_inkisar.append((
-                    f"{furudh.quantity} {heir_name}",
-                    furudh.quantity,
-                    saham
-                ))
+                names.append(f"{furudh.quantity} {heir_name}")
     
-    if not groups_need_inkisar:
-        notes.append("✅ Tidak perlu Inkisar (semua saham bisa dibagi utuh)")
+    if not groups:
+        notes.summary("✅ Tidak perlu Inkisar (semua saham bisa dibagi utuh)")
         return ashl, furudh_saham, notes
     
-    if len(groups_need_inkisar) == 1:
-        nama, ruus, saham_k = groups_need_inkisar[0]
-        ashl_baru, notes = compute_inkisar_single_group(ruus, saham_k, ashl, notes)
-    else:
-        ashl_baru, notes = compute_inkisar_multiple_groups(groups_need_inkisar, ashl, notes)
+    multiplier, steps = resolve_inkisar(tuple(groups), ashl)
+    replay_inkisar_steps(steps, notes, names)
     
-    multiplier = ashl_baru // ashl
-    furudh_saham_updated = [
-        (furudh, int(saham * multiplier))  # ✅ FIX
-        for furudh, saham in furudh_saham
-    ]
+    for i, (furudh, saham) in enumerate(furudh_saham):
+        furudh_saham[i] = (furudh, saham * multiplier)
     
-    return ashl_baru, furudh_saham_updated, notes
+    return ashl * multiplier, furudh_saham, notes
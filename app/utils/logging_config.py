@@ -0,0 +1,194 @@
+"""
+Konfigurasi logging aplikasi
+
+Semua handler (stderr dan file opsional) dijalankan oleh QueueListener di
+thread terpisah, sehingga kode perhitungan hanya memasukkan record ke queue
+dan tidak pernah menulis ke file/terminal secara langsung. Level bisa diatur
+per modul, dan debug trace bisa diaktifkan hanya untuk setiap request ke-N
+(sampling) supaya tidak membanjiri log di production.
+
+Contoh .env:
+    LOG_LEVEL=WARNING
+    LOG_MODULE_LEVELS={"app.core.calculator": "INFO"}
+    LOG_FORMAT=json
+    LOG_DEBUG_SAMPLE_RATE=100
+"""
+from __future__ import annotations
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from itertools import count
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+from typing import Dict, Iterator, List, Optional
+import json
+import logging
+import sys
+
+
+APP_LOGGER = "app"
+
+_TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Request yang sedang di-trace (debug sampling)
+_trace_active: ContextVar[bool] = ContextVar("faraid_debug_trace", default=False)
+
+
+class JsonFormatter(logging.Formatter):
+    """Formatter log satu baris JSON per record"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "trace", False):
+            payload["trace"] = True
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False)
+
+
+class ModuleLevelFilter(logging.Filter):
+    """
+    Filter level per modul
+
+    Record lolos jika levelnya >= level modul (prefix nama logger terpanjang),
+    atau jika request yang sedang berjalan sedang di-trace.
+    """
+
+    def __init__(self, default_level: int, module_levels: Dict[str, int]):
+        super().__init__()
+        self.default_level = default_level
+        self.module_levels = module_levels
+        self._resolved: Dict[str, int] = {}
+
+    def level_for(self, name: str) -> int:
+        level = self._resolved.get(name)
+        if level is None:
+            level = self.default_level
+            best = -1
+            for prefix, prefix_level in self.module_levels.items():
+                if (name == prefix or name.startswith(prefix + ".")) and len(prefix) > best:
+                    level, best = prefix_level, len(prefix)
+            self._resolved[name] = level
+        return level
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= self.level_for(record.name):
+            return True
+        if _trace_active.get():
+            record.trace = True
+            return True
+        return False
+
+
+class DebugSampler:
+    """Pilih setiap request ke-N untuk debug trace (0 = nonaktif)"""
+
+    def __init__(self, every: int = 0):
+        self.every = every
+        self._counter = count(1)
+
+    def should_trace(self) -> bool:
+        if self.every <= 0:
+            return False
+        return next(self._counter) % self.every == 0
+
+
+_listener: Optional[QueueListener] = None
+_sampler = DebugSampler()
+
+
+def _parse_level(level) -> int:
+    if isinstance(level, int):
+        return level
+    value = logging.getLevelName(str(level).upper())
+    if not isinstance(value, int):
+        raise ValueError(f"Level logging tidak dikenal: {level}")
+    return value
+
+
+def setup_logging(settings=None) -> None:
+    """
+    Pasang pipeline logging aplikasi sesuai Settings
+
+    Aman dipanggil berkali-kali; konfigurasi sebelumnya dilepas dulu.
+
+    Args:
+        settings: Instance Settings (default: app.config.settings)
+    """
+    global _listener, _sampler
+
+    if settings is None:
+        from app.config import settings
+
+    shutdown_logging()
+
+    default_level = _parse_level(settings.LOG_LEVEL)
+    module_levels = {
+        name: _parse_level(level) for name, level in settings.LOG_MODULE_LEVELS.items()
+    }
+    _sampler = DebugSampler(settings.LOG_DEBUG_SAMPLE_RATE)
+
+    if settings.LOG_FORMAT == "json":
+        formatter: logging.Formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(_TEXT_FORMAT)
+
+    handlers: List[logging.Handler] = [logging.StreamHandler(sys.stderr)]
+    if settings.LOG_FILE:
+        handlers.append(logging.FileHandler(settings.LOG_FILE, encoding="utf-8"))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    queue: SimpleQueue = SimpleQueue()
+    queue_handler = QueueHandler(queue)
+    queue_handler.addFilter(ModuleLevelFilter(default_level, module_levels))
+
+    # Logger hanya meloloskan level terendah yang mungkin dibutuhkan,
+    # sisanya diputuskan oleh filter (murah: tanpa format, tanpa I/O)
+    lowest = min([default_level, *module_levels.values()])
+    if _sampler.every > 0:
+        lowest = logging.DEBUG
+
+    app_logger = logging.getLogger(APP_LOGGER)
+    app_logger.handlers = [queue_handler]
+    app_logger.setLevel(lowest)
+    app_logger.propagate = False
+
+    _listener = QueueListener(queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """Hentikan listener dan flush record yang tersisa"""
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+@contextmanager
+def request_trace() -> Iterator[bool]:
+    """
+    Tandai satu request; setiap request ke-N mendapat debug trace penuh
+
+    Yields:
+        True jika request ini di-trace
+    """
+    traced = _sampler.should_trace()
+    if not traced:
+        yield False
+        return
+
+    token = _trace_active.set(True)
+    try:
+        yield True
+    finally:
+        _trace_active.reset(token)
@@ -204,17 +204,9 @@ def check_aul_valid(ashl: int, total_shares: int) -> bool:
     Returns:
         True jika terjadi 'Aul
     """
-    from app.utils.constants import VALID_AUL
+    from app.utils.aul_validator import classify_aul
     
-    if total_shares <= ashl:
-        return False
-    
-    # Cek apakah ashl ada di tabel 'Aul
-    if ashl not in VALID_AUL:
-        return False
-    
-    # Cek apakah total_shares adalah nilai 'Aul yang valid
-    return total_shares in VALID_AUL[ashl]
+    return classify_aul(ashl, total_shares).valid
 
 
 def calculate_aul(ashl: int, total_shares: int) -> int:
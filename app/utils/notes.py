@@ -0,0 +1,82 @@
+"""
+Catatan perhitungan (notes) yang dirender hanya jika diminta
+
+Engine mencatat langkah perhitungan sebagai event ringkas berupa
+(template, args). String baru diformat saat render(), dan jika verbosity
+"none" event tidak dicatat sama sekali.
+"""
+from __future__ import annotations
+from typing import Iterable, List, Tuple
+
+from app.utils.constants import NoteVerbosity
+
+
+NoteEvent = Tuple[str, tuple]
+
+
+class NoteLog:
+    """
+    Log catatan perhitungan dengan tingkat verbosity
+
+    - summary(): dicatat untuk verbosity "summary" dan "full"
+    - add()    : hanya dicatat untuk verbosity "full"
+    """
+
+    def __init__(self, verbosity: NoteVerbosity = NoteVerbosity.FULL):
+        self.verbosity = NoteVerbosity(verbosity)
+        self.enabled = self.verbosity != NoteVerbosity.NONE
+        self.full = self.verbosity == NoteVerbosity.FULL
+        self._events: List[NoteEvent] = []
+
+    @classmethod
+    def from_lines(cls, lines: Iterable[str],
+                   verbosity: NoteVerbosity = NoteVerbosity.FULL) -> NoteLog:
+        """Buat NoteLog dari list string yang sudah jadi"""
+        log = cls(verbosity)
+        log.extend(lines)
+        return log
+
+    def add(self, template: str, *args) -> None:
+        """Catat langkah detail (hanya verbosity full)"""
+        if self.full:
+            self._events.append((template, args))
+
+    def summary(self, template: str, *args) -> None:
+        """Catat langkah utama (verbosity summary dan full)"""
+        if self.enabled:
+            self._events.append((template, args))
+
+    def append(self, line: str) -> None:
+        """Catat satu baris jadi (kompatibel dengan API list)"""
+        if self.full:
+            self._events.append((line, ()))
+
+    def extend(self, lines: Iterable[str]) -> None:
+        """Catat beberapa baris jadi"""
+        if self.full:
+            self._events.extend((line, ()) for line in lines)
+
+    def extend_events(self, events: Iterable[NoteEvent]) -> None:
+        """Salin event dari NoteLog lain (misal dari cache)"""
+        if self.enabled:
+            self._events.extend(events)
+
+    def events(self) -> Tuple[NoteEvent, ...]:
+        """Event yang sudah dicatat"""
+        return tuple(self._events)
+
+    def copy(self) -> NoteLog:
+        """Salinan NoteLog dengan verbosity dan event yang sama"""
+        log = NoteLog(self.verbosity)
+        log._events = list(self._events)
+        return log
+
+    def render(self) -> List[str]:
+        """Format semua event menjadi list string"""
+        return [
+            template.format(*args) if args else template
+            for template, args in self._events
+        ]
+
+    def __len__(self) -> int:
+        return len(self._events)
@@ -0,0 +1,70 @@
+"""
+Pengukuran waktu per tahap perhitungan
+
+Setiap tahap (misalnya struktur saham, kasus khusus, pembentukan hasil)
+dibungkus dengan stage_timer(). Durasi dicatat ke log level DEBUG dan
+diakumulasi per nama tahap untuk endpoint /health.
+"""
+from __future__ import annotations
+from contextlib import contextmanager
+from threading import Lock
+from typing import Dict, Iterator
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class StageStats:
+    """Akumulator durasi per tahap (thread-safe)"""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._stages: Dict[str, list] = {}
+
+    def record(self, stage: str, elapsed_ns: int) -> None:
+        with self._lock:
+            entry = self._stages.get(stage)
+            if entry is None:
+                self._stages[stage] = [1, elapsed_ns, elapsed_ns]
+            else:
+                entry[0] += 1
+                entry[1] += elapsed_ns
+                if elapsed_ns > entry[2]:
+                    entry[2] = elapsed_ns
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Statistik per tahap: jumlah panggilan, rata-rata dan maksimum (ms)"""
+        with self._lock:
+            return {
+                stage: {
+                    "count": count,
+                    "avg_ms": total / count / 1e6,
+                    "max_ms": maximum / 1e6,
+                }
+                for stage, (count, total, maximum) in self._stages.items()
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stages.clear()
+
+
+stage_stats = StageStats()
+
+
+@contextmanager
+def stage_timer(stage: str) -> Iterator[None]:
+    """
+    Ukur durasi satu tahap
+
+    Args:
+        stage: Nama tahap, misalnya "saham" atau "special.akdariyyah"
+    """
+    started = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter_ns() - started
+        stage_stats.record(stage, elapsed)
+        logger.debug("Tahap %s: %.3f ms", stage, elapsed / 1e6)
@@ -0,0 +1,129 @@
+"""
+Pengukuran alokasi memori dan GC untuk satu batch perhitungan
+
+Menjalankan FaroidCalculator pada keluarga acak (deterministik) dengan
+cache struktur kosong lalu mencatat:
+- puncak memori (tracemalloc) selama batch
+- memori yang tertahan di saham_cache setelah batch
+- jumlah koleksi GC per generasi selama batch
+- ukuran satu FurudhResult (termasuk __dict__ jika ada)
+
+Untuk membandingkan sebelum/sesudah, jalankan skrip yang sama terhadap
+checkout lain (misalnya git worktree dari commit lama):
+
+    git worktree add /tmp/faraid-lama <commit>
+    python benchmark_alloc.py --repo /tmp/faraid-lama
+    python benchmark_alloc.py
+"""
+import argparse
+import gc
+import json
+import logging
+import random
+import sys
+import time
+import tracemalloc
+
+
+def _random_inputs(count, verbosity, seed):
+    """Keluarga acak (deterministik), sama untuk setiap checkout"""
+    from pydantic import ValidationError
+    from app.schemas.calculation import CalculationInput
+    from app.schemas.heir import HeirInput
+    from app.utils.constants import HeirID
+
+    multiple = {HeirID.IBN, HeirID.BINT, HeirID.IBN_IBN, HeirID.BINT_IBN, HeirID.ZAWJAH,
+                HeirID.AKH_ABAWAYN, HeirID.UKHT_ABAWAYN, HeirID.AKH_AB, HeirID.UKHT_AB}
+    rng = random.Random(seed)
+    heir_ids = [heir_id for heir_id in HeirID if heir_id != HeirID.ZAWJ]
+    inputs = []
+    while len(inputs) < count:
+        heirs = [
+            HeirInput(id=heir_id, quantity=rng.randint(1, 4) if heir_id in multiple else 1)
+            for heir_id in rng.sample(heir_ids, rng.randint(1, 6))
+        ]
+        try:
+            inputs.append(CalculationInput(
+                heirs=heirs, tirkah=float(rng.randint(1, 10_000)) * 1000, notes_verbosity=verbosity
+            ))
+        except ValidationError:
+            continue
+    return inputs
+
+
+def _gc_collections():
+    return [stats["collections"] for stats in gc.get_stats()]
+
+
+def measure_batch(inputs):
+    """
+    Ukur satu batch dengan cache struktur kosong
+
+    Returns:
+        Dict hasil pengukuran
+    """
+    from app.core.calculator import FaroidCalculator
+    from app.core.result_cache import saham_cache
+
+    saham_cache.clear()
+    gc.collect()
+    collections_before = _gc_collections()
+    tracemalloc.start()
+    started = time.perf_counter()
+
+    for item in inputs:
+        FaroidCalculator(item).calculate()
+
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    collections = [after - before for before, after in zip(collections_before, _gc_collections())]
+
+    return {
+        "items": len(inputs),
+        "us_per_item": round(elapsed * 1e6 / len(inputs), 1),
+        "peak_mb": round(peak / 1e6, 2),
+        "retained_cache_mb": round(retained / 1e6, 2),
+        "gc_collections": collections,
+    }
+
+
+def furudh_result_bytes():
+    """Ukuran satu FurudhResult (objek + __dict__ jika ada)"""
+    from app.core.furudh_engine import FurudhEngine
+    from app.schemas.heir import HeirInput
+
+    furudh = FurudhEngine([HeirInput(id=1, quantity=2), HeirInput(id=18, quantity=1)]).determine_furudh()[0]
+    size = sys.getsizeof(furudh)
+    if hasattr(furudh, "__dict__"):
+        size += sys.getsizeof(furudh.__dict__)
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ukur alokasi memori dan GC satu batch perhitungan")
+    parser.add_argument("--repo", default=".", help="Checkout yang diukur (default: direktori ini)")
+    parser.add_argument("--items", type=int, default=3000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    sys.path.insert(0, args.repo)
+    logging.disable(logging.CRITICAL)
+
+    from app.core.result_cache import saham_cache
+    # Semua struktur batch muat di cache agar memori tertahan ikut terukur
+    saham_cache.maxsize = max(saham_cache.maxsize, args.items)
+
+    report = {}
+    for verbosity in ("none", "full"):
+        inputs = _random_inputs(args.items, verbosity, args.seed)
+        measure_batch(inputs)  # pemanasan import dan lru_cache
+        report[verbosity] = measure_batch(inputs)
+    report["furudh_result_bytes"] = furudh_result_bytes()
+    print(json.dumps(report, indent=1))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""
+Test endpoint API
+"""
+
+import asyncio
+import json
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.core import executor as executor_module
+from app.core import outcome_table
+from app.core.executor import CalculationExecutor
+from app.core.single_flight import SingleFlight
+from app.main import app
+
+
+CALCULATE_URL = f"{settings.API_V1_PREFIX}/calculation/calculate"
+
+HEIRS = [{"id": 1, "quantity": 2}, {"id": 18, "quantity": 1}]
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture
+def table_path(tmp_path, monkeypatch):
+    """Outcome table kecil yang dipasang lewat OUTCOME_TABLE_PATH"""
+    path = str(tmp_path / "outcomes.bin")
+    outcome_table.build_outcome_table(path, max_types=2, max_quantity=2)
+    monkeypatch.setattr(settings, "OUTCOME_TABLE_PATH", path)
+    monkeypatch.setattr(outcome_table, "_loaded_table", None)
+    monkeypatch.setattr(outcome_table, "_loaded_path", None)
+    return path
+
+
+def test_default_request_keeps_full_notes_with_outcome_table(client, table_path):
+    response = client.post(CALCULATE_URL, json={"heirs": HEIRS, "tirkah": 1_200_000})
+
+    assert response.status_code == 200
+    notes = response.json()["data"]["notes"]
+    assert "=== MULAI PERHITUNGAN WARISAN ===" in notes
+    assert len(notes) > 5
+
+
+def test_outcome_table_answers_requests_without_notes(client, table_path, monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("engine tidak boleh dipanggil untuk hit outcome table")
+
+    monkeypatch.setattr("app.api.v1.endpoints.calculation.calculate_inheritance", fail)
+    response = client.post(
+        CALCULATE_URL, json={"heirs": HEIRS, "tirkah": 1_200_000, "notes_verbosity": "none"}
+    )
+
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert data["notes"] == []
+    assert data["ashlul_masalah_akhir"] == 12
+
+
+MUNASAKHOT_LEVEL = {"pewaris": "Ahmad", "tirkah": 1_000_000, "level": 1,
+                    "heirs": [{"id": 1, "quantity": 1}, {"id": 4, "quantity": 1}]}
+
+
+def test_munasakhot_invalid_chain_is_bad_request(client):
+    response = client.post(
+        f"{settings.API_V1_PREFIX}/calculation/calculate/munasakhot",
+        json=[MUNASAKHOT_LEVEL, dict(MUNASAKHOT_LEVEL)]
+    )
+
+    assert response.status_code == 400
+    assert "sudah ada" in response.json()["detail"]
+
+
+def test_munasakhot_simple_invalid_source_is_bad_request(client):
+    response = client.post(
+        f"{settings.API_V1_PREFIX}/calculation/calculate/munasakhot-simple",
+        json={
+            "pewaris1": {"name": "Ahmad", "tirkah": 1_000_000, "heirs": [{"id": 1, "quantity": 1}]},
+            "pewaris2": {"name": "Budi", "heir_id": 16, "heirs": [{"id": 1, "quantity": 1}]},
+        }
+    )
+
+    assert response.status_code == 400
+
+
+@pytest.fixture
+def small_executor(monkeypatch):
+    """Executor 1 worker / 2 job in-flight yang dipakai semua endpoint"""
+    executor = CalculationExecutor(kind="thread", workers=1, max_in_flight=2, retry_after=7)
+    monkeypatch.setattr(executor_module, "_executor", executor)
+    yield executor
+    executor.shutdown()
+
+
+def test_full_executor_returns_503_with_retry_after(client, small_executor):
+    small_executor.in_flight = small_executor.max_in_flight
+
+    response = client.post(CALCULATE_URL, json={"heirs": HEIRS, "tirkah": 1_200_000})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "7"
+    assert small_executor.stats()["rejected"] == 1
+
+
+def test_health_reports_executor_queue_depth(client, small_executor):
+    small_executor.in_flight = 2
+
+    executor_stats = client.get("/health").json()["executor"]
+
+    assert executor_stats["in_flight"] == 2
+    assert executor_stats["queue_depth"] == 1
+
+
+def test_waiting_job_is_woken_when_a_slot_frees():
+    executor = CalculationExecutor(kind="thread", workers=1, max_in_flight=1)
+    started, release = threading.Event(), threading.Event()
+
+    def blocking():
+        started.set()
+        release.wait(5)
+        return "pertama"
+
+    async def scenario():
+        first = asyncio.ensure_future(executor.run(blocking))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        second = asyncio.ensure_future(executor.run(lambda: "kedua", wait=True))
+        await asyncio.sleep(0)
+        # Job kedua menunggu future, bukan polling
+        assert len(executor._waiters) == 1 and not second.done()
+        release.set()
+        return await asyncio.wait_for(asyncio.gather(first, second), 5)
+
+    try:
+        assert asyncio.run(scenario()) == ["pertama", "kedua"]
+        assert executor.stats()["in_flight"] == 0
+        assert executor.stats()["completed"] == 2
+    finally:
+        executor.shutdown()
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    executor = CalculationExecutor(kind="thread", workers=1, max_in_flight=1)
+
+    async def scenario():
+        executor.in_flight = 1
+        waiter = asyncio.ensure_future(executor.run(lambda: None, wait=True))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return len(executor._waiters)
+
+    assert asyncio.run(scenario()) == 0
+
+
+def test_identical_concurrent_requests_are_coalesced():
+    flight = SingleFlight()
+    computations = []
+
+    async def compute():
+        computations.append(1)
+        await asyncio.sleep(0.01)
+        return {"hasil": 42}
+
+    async def scenario():
+        return await asyncio.gather(*(flight.do("kunci", compute) for _ in range(5)))
+
+    results = asyncio.run(scenario())
+
+    assert len(computations) == 1
+    assert all(result is results[0] for result in results)
+    assert flight.stats() == {"calls": 5, "coalesced": 4, "in_flight": 0}
+
+
+def test_coalesced_exception_reaches_every_waiter():
+    flight = SingleFlight()
+    computations = []
+
+    async def compute():
+        computations.append(1)
+        await asyncio.sleep(0.01)
+        raise ValueError("gagal")
+
+    async def scenario():
+        return await asyncio.gather(*(flight.do("kunci", compute) for _ in range(4)),
+                                    return_exceptions=True)
+
+    results = asyncio.run(scenario())
+
+    assert len(computations) == 1
+    assert all(isinstance(result, ValueError) and str(result) == "gagal" for result in results)
+    assert flight.coalesced == 3 and flight.stats()["in_flight"] == 0
+
+
+def test_gharqa_on_full_executor_returns_503(client, small_executor):
+    small_executor.in_flight = small_executor.max_in_flight
+
+    response = client.post(
+        f"{settings.API_V1_PREFIX}/calculation/calculate/gharqa",
+        json=[{"name": "Ahmad", "tirkah": 1_000_000, "heirs": [{"id": 1, "quantity": 1}]}]
+    )
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "7"
+
+
+def test_batch_stream_returns_one_ndjson_line_per_input(client, monkeypatch):
+    monkeypatch.setattr(settings, "BATCH_STREAM_CHUNK", 2)
+    lines = [
+        json.dumps({"heirs": HEIRS, "tirkah": 1_200_000, "notes_verbosity": "none"}),
+        json.dumps({"heirs": [{"id": 3, "quantity": 1}, {"id": 16, "quantity": 1}], "tirkah": 400_000}),
+        "{bukan json",
+        json.dumps({"heirs": HEIRS, "tirkah": 600_000, "notes_verbosity": "none"}),
+        "",
+        json.dumps({"heirs": [{"id": 18, "quantity": 1}], "tirkah": 300_000}),
+    ]
+
+    response = client.post(
+        f"{settings.API_V1_PREFIX}/calculation/calculate/batch/stream",
+        content="\n".join(lines) + "\n",
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    items = [json.loads(line) for line in response.text.splitlines()]
+    assert [item["index"] for item in items] == [0, 1, 2, 3, 4]
+    assert [item["status"] for item in items] == ["success", "success", "error", "success", "success"]
+    assert items[2]["error"].startswith("Input tidak valid")
+    assert items[0]["result"]["ashlul_masalah_akhir"] == 12
+    assert items[3]["result"]["tirkah"] == 600_000
+
+
+def test_batch_on_process_executor_reuses_its_workers(client, monkeypatch):
+    process_executor = CalculationExecutor(kind="process", workers=2, max_in_flight=4)
+    monkeypatch.setattr(executor_module, "_executor", process_executor)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("process pool batch tidak boleh dibuat untuk executor process")
+
+    monkeypatch.setattr("app.core.batch._get_pool", fail)
+    items = [
+        {"heirs": HEIRS, "tirkah": 1_200_000, "notes_verbosity": "none"},
+        {"heirs": [{"id": 3, "quantity": 1}, {"id": 16, "quantity": 1}], "tirkah": 400_000},
+        {"heirs": HEIRS, "tirkah": 600_000, "notes_verbosity": "none"},
+        {"heirs": [], "tirkah": 100_000},
+    ]
+    try:
+        response = client.post(f"{settings.API_V1_PREFIX}/calculation/calculate/batch",
+                               json={"items": items})
+    finally:
+        process_executor.shutdown()
+
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert [item["index"] for item in data["items"]] == [0, 1, 2, 3]
+    assert [item["status"] for item in data["items"]] == ["success", "success", "success", "error"]
+    assert data["items"][2]["result"]["tirkah"] == 600_000
+    assert (data["unique_shapes"], data["deduplicated"], data["failed"]) == (2, 1, 1)
+    assert process_executor.completed == 2  # tiga kelompok bentuk dibagi ke dua worker
+
+
+def test_khuntsa_accepts_repeated_ids_and_rejects_over_limit(client):
+    url = f"{settings.API_V1_PREFIX}/calculation/calculate/khuntsa"
+    body = {"heirs": [{"id": 1, "quantity": 5}, {"id": 3, "quantity": 1}], "tirkah": 2400}
+
+    response = client.post(url, params={"khuntsa_heir_id": [1, 1]}, json=body)
+    assert response.status_code == 200
+    assert len(response.json()["data"]) == 5  # 4 skenario + penyelesaian
+
+    over_limit = [1] * (settings.KHUNTSA_MAX_HEIRS + 1)
+    response = client.post(url, params={"khuntsa_heir_id": over_limit}, json=body)
+    assert response.status_code == 400
+    assert f"Maksimal {settings.KHUNTSA_MAX_HEIRS}" in response.json()["detail"]
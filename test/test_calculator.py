@@ -0,0 +1,657 @@
+"""
+Test FaroidCalculator
+"""
+
+import logging
+import random
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from itertools import combinations, product
+
+import pytest
+from pydantic import ValidationError
+
+from app.core import batch as batch_module
+from app.core import calculator as calculator_module
+from app.core import result_cache as result_cache_module
+from app.core.ashobah_engine import BI_NAFSIH, BI_SABAB, BIL_GHAIR, MAAL_GHAIR, resolve_ashobah
+from app.core.batch import calculate_batch, merge_batch_results, split_batch
+from app.core.calculator import FaroidCalculator, calculate_inheritance
+from app.core.fast_path import trivial_result
+from app.core.furudh_engine import COMPILED_FURUDH_RULES, FurudhEngine
+from app.core.hijab_engine import HIJAB_BLOCKERS, compute_hijab, hijab_mask
+from app.core.result_cache import LRUCache, make_cache_key, saham_cache
+from app.schemas.calculation import CalculationInput
+from app.schemas.heir import HeirInput
+from app.special_cases.registry import classify_special_case
+from app.utils.constants import FURUDH_RULES, HEIR_NAMES, HeirID, MALE_ASHOBAH, NoteVerbosity
+from app.utils.aul_validator import AUL_NAMES, AulClass, classify_aul
+from app.utils.inkisar import replay_inkisar_steps, resolve_inkisar
+from app.utils.notes import NoteLog
+
+
+TIRKAH = 123_456_789.0
+
+SPOUSES = [None, (HeirID.ZAWJ, 1)] + [(HeirID.ZAWJAH, quantity) for quantity in range(1, 5)]
+
+
+def _trivial_shapes():
+    # Kakek sendirian mendapat fardh "Seperti Ayah", bukan ashobah
+    for ashobah_id in sorted(MALE_ASHOBAH - {HeirID.JADD}):
+        quantities = [1] if ashobah_id == HeirID.ABB else range(1, 7)
+        for quantity in quantities:
+            for spouse in SPOUSES:
+                heirs = [HeirInput(id=ashobah_id, quantity=quantity)]
+                if spouse is not None:
+                    heirs.append(HeirInput(id=spouse[0], quantity=spouse[1]))
+                yield heirs
+
+
+def _full_path(monkeypatch, calculation_input):
+    """Hitung lewat jalur lengkap (jalur cepat dimatikan, cache kosong)"""
+    with monkeypatch.context() as patch:
+        patch.setattr(calculator_module, "trivial_result", lambda heirs, tirkah: None)
+        saham_cache.clear()
+        return FaroidCalculator(calculation_input).calculate()
+
+
+@pytest.mark.parametrize("heirs", list(_trivial_shapes()), ids=str)
+def test_fast_path_matches_full_path(monkeypatch, heirs):
+    calculation_input = CalculationInput(heirs=heirs, tirkah=TIRKAH, notes_verbosity="none")
+
+    fast = trivial_result(heirs, TIRKAH)
+    full = _full_path(monkeypatch, calculation_input)
+
+    assert fast is not None
+    assert fast.model_dump() == full.model_dump()
+    assert FaroidCalculator(calculation_input).calculate().model_dump() == full.model_dump()
+
+
+@pytest.mark.parametrize("heirs", [
+    [HeirInput(id=HeirID.IBN, quantity=2), HeirInput(id=HeirID.BINT, quantity=1)],
+    [HeirInput(id=HeirID.ZAWJ, quantity=1)],
+    [HeirInput(id=HeirID.BINT, quantity=2)],
+    [HeirInput(id=HeirID.ZAWJAH, quantity=1), HeirInput(id=HeirID.UMM, quantity=1)],
+    [HeirInput(id=HeirID.ABB, quantity=1), HeirInput(id=HeirID.IBN, quantity=1)],
+    [HeirInput(id=HeirID.JADD, quantity=1)],
+    [HeirInput(id=HeirID.JADD, quantity=1), HeirInput(id=HeirID.AKH_ABAWAYN, quantity=1)],
+    [HeirInput(id=HeirID.IBN, quantity=1), HeirInput(id=HeirID.ZAWJ, quantity=1),
+     HeirInput(id=HeirID.UMM, quantity=1)],
+], ids=str)
+def test_fast_path_skips_non_trivial_estates(heirs):
+    assert trivial_result(heirs, TIRKAH) is None
+
+
+def test_fast_path_not_used_when_notes_requested(monkeypatch):
+    heirs = [HeirInput(id=HeirID.IBN, quantity=3)]
+    monkeypatch.setattr(calculator_module, "trivial_result", pytest.fail)
+
+    result = FaroidCalculator(CalculationInput(heirs=heirs, tirkah=TIRKAH)).calculate()
+
+    assert result.notes
+    assert result.ashlul_masalah_akhir == 3
+
+
+MULTIPLE_HEIRS = {HeirID.IBN, HeirID.BINT, HeirID.IBN_IBN, HeirID.BINT_IBN, HeirID.ZAWJAH,
+                  HeirID.AKH_ABAWAYN, HeirID.UKHT_ABAWAYN, HeirID.AKH_AB, HeirID.UKHT_AB}
+
+
+def _random_inputs(count, seed=2025):
+    """Keluarga acak (deterministik) dengan verbosity dan tirkah bervariasi"""
+    rng = random.Random(seed)
+    heir_ids = [heir_id for heir_id in HeirID if heir_id != HeirID.ZAWJ]
+    inputs = []
+    while len(inputs) < count:
+        heirs = [
+            HeirInput(id=heir_id, quantity=rng.randint(1, 4) if heir_id in MULTIPLE_HEIRS else 1)
+            for heir_id in rng.sample(heir_ids, rng.randint(1, 6))
+        ]
+        try:
+            inputs.append(CalculationInput(
+                heirs=heirs,
+                tirkah=float(rng.randint(1, 10_000)) * 1000,
+                notes_verbosity=rng.choice(["none", "summary", "full"]),
+            ))
+        except ValidationError:
+            continue
+    return inputs
+
+
+RADD_RECIPIENTS = [HeirID.BINT, HeirID.BINT_IBN, HeirID.UMM, HeirID.JADDAH_UMM,
+                   HeirID.UKHT_ABAWAYN, HeirID.UKHT_AB, HeirID.UKHT_UMM]
+
+
+def _radd_estates():
+    """Zauj/zaujah (atau tanpa) bersama 1-2 jenis dzawil furudh tanpa ashobah"""
+    for spouse in SPOUSES:
+        for size in (1, 2):
+            for heir_ids in combinations(RADD_RECIPIENTS, size):
+                ranges = [range(1, 5) if heir_id in MULTIPLE_HEIRS else [1] for heir_id in heir_ids]
+                for quantities in product(*ranges):
+                    heirs = [HeirInput(id=heir_id, quantity=quantity)
+                             for heir_id, quantity in zip(heir_ids, quantities)]
+                    if spouse is not None:
+                        heirs.append(HeirInput(id=spouse[0], quantity=spouse[1]))
+                    yield heirs
+
+
+@pytest.mark.parametrize("heirs, ashl_akhir", [
+    ([HeirInput(id=HeirID.ZAWJ, quantity=1), HeirInput(id=HeirID.BINT, quantity=4)], 16),
+    ([HeirInput(id=HeirID.ZAWJAH, quantity=4), HeirInput(id=HeirID.JADDAH_UMM, quantity=1)], 16),
+    ([HeirInput(id=HeirID.ZAWJAH, quantity=1), HeirInput(id=HeirID.BINT_IBN, quantity=3)], 24),
+], ids=str)
+def test_radd_applies_inkisar(heirs, ashl_akhir):
+    result = FaroidCalculator(CalculationInput(heirs=heirs, tirkah=TIRKAH)).calculate()
+
+    assert result.is_radd
+    assert result.ashlul_masalah_akhir == ashl_akhir
+    assert all(share.saham % share.quantity == 0 for share in result.shares)
+
+
+def test_radd_saham_divisible_per_person():
+    checked = 0
+    for heirs in _radd_estates():
+        result = FaroidCalculator(
+            CalculationInput(heirs=heirs, tirkah=TIRKAH, notes_verbosity="none")
+        ).calculate()
+        if not result.is_radd:
+            continue
+        checked += 1
+        for share in result.shares:
+            assert share.saham % share.quantity == 0, (heirs, share)
+        assert sum(share.saham for share in result.shares) == result.ashlul_masalah_akhir, heirs
+
+    assert checked > 400
+
+
+def test_saham_whole_per_person_for_every_estate():
+    # Semua tahap (inkisar furudh, 'aul, radd, ashobah, kasus khusus) menghasilkan saham integer
+    for item in _random_inputs(600, seed=10):
+        result = FaroidCalculator(item).calculate()
+        for share in result.shares:
+            assert share.saham == int(share.saham), (item.heirs, share)
+            assert int(share.saham) % share.quantity == 0 or share.is_mahjub, (item.heirs, share)
+        assert sum(share.saham for share in result.shares) == result.ashlul_masalah_akhir, item.heirs
+
+
+@pytest.fixture
+def short_switch_interval():
+    """Perbanyak pergantian thread supaya race condition lebih mudah muncul"""
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+# Build free-threaded (3.13t ke atas) dengan GIL nonaktif: thread benar-benar paralel
+FREE_THREADED = not getattr(sys, "_is_gil_enabled", lambda: True)()
+
+
+def test_concurrent_calculations_match_sequential(short_switch_interval, record_property):
+    record_property("free_threaded", FREE_THREADED)
+    inputs = _random_inputs(150)
+    saham_cache.clear()
+    expected = [FaroidCalculator(item).calculate().model_dump() for item in inputs]
+
+    saham_cache.clear()
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(lambda item: FaroidCalculator(item).calculate().model_dump(),
+                                inputs * 4))
+
+    assert results == expected * 4
+
+
+@pytest.mark.skipif(not FREE_THREADED, reason="butuh CPython free-threaded dengan GIL nonaktif")
+def test_concurrent_calculations_without_gil():
+    inputs = _random_inputs(400, seed=24)
+    saham_cache.clear()
+    expected = [FaroidCalculator(item).calculate().model_dump() for item in inputs]
+
+    for _ in range(3):
+        saham_cache.clear()
+        with ThreadPoolExecutor(max_workers=32) as pool:
+            results = list(pool.map(lambda item: FaroidCalculator(item).calculate().model_dump(),
+                                    inputs * 8))
+        assert results == expected * 8
+
+
+def test_shared_calculator_is_thread_safe(short_switch_interval):
+    heirs = [HeirInput(id=HeirID.ZAWJ, quantity=1), HeirInput(id=HeirID.UMM, quantity=1),
+             HeirInput(id=HeirID.BINT, quantity=2), HeirInput(id=HeirID.IBN, quantity=1)]
+    prefix = NoteLog.from_lines(["Catatan awal"])
+    calculator = FaroidCalculator(CalculationInput(heirs=heirs, tirkah=TIRKAH), notes=prefix)
+    saham_cache.clear()
+    expected = calculator.calculate().model_dump()
+
+    saham_cache.clear()
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(lambda _: calculator.calculate().model_dump(), range(400)))
+
+    assert all(result == expected for result in results)
+    assert expected["notes"][0] == "Catatan awal"
+    assert prefix.render() == ["Catatan awal"]
+
+
+def _batch_inputs():
+    """Keluarga acak dengan bentuk berulang (tirkah berbeda) dan satu item kosong"""
+    inputs = _random_inputs(40, seed=6)
+    repeated = [item.model_copy(update={"tirkah": item.tirkah + 1000}) for item in inputs[:15]]
+    empty = CalculationInput.model_construct(heirs=[], tirkah=TIRKAH, notes_verbosity="full")
+    items = inputs + repeated + [empty]
+    random.Random(6).shuffle(items)
+    return items
+
+
+def _expected_batch(items):
+    expected = []
+    for item in items:
+        if not item.heirs:
+            expected.append(("error", None))
+        else:
+            expected.append(("success", calculate_inheritance(item).model_dump()))
+    return expected
+
+
+def _batch_items(result):
+    return [(item.status, item.result.model_dump() if item.result else None) for item in result.items]
+
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_batch_matches_per_item_calculation_in_input_order(workers):
+    items = _batch_inputs()
+    saham_cache.clear()
+    expected = _expected_batch(items)
+
+    saham_cache.clear()
+    result = calculate_batch(items, workers=workers)
+
+    assert [item.index for item in result.items] == list(range(len(items)))
+    assert _batch_items(result) == expected
+    assert result.failed == 1
+
+
+def test_batch_deduplicates_repeated_shapes():
+    items = _batch_inputs()
+    shapes = {
+        make_cache_key(item.heirs, item.notes_verbosity, classify_special_case(item.heirs))
+        for item in items if item.heirs
+    }
+
+    result = calculate_batch(items)
+
+    assert result.total_items == len(items)
+    assert result.unique_shapes == len(shapes)
+    assert result.deduplicated == len(items) - 1 - len(shapes)
+    assert result.deduplicated >= 15
+
+
+def test_batch_warms_shapes_in_chunks_when_cache_is_small(monkeypatch):
+    items = _batch_inputs()
+    saham_cache.clear()
+    expected = _expected_batch(items)
+    warmed = []
+    original = batch_module._warm_structures
+    monkeypatch.setattr(batch_module, "_warm_structures",
+                        lambda shapes, workers: (warmed.append(len(shapes)), original(shapes, workers)))
+    monkeypatch.setattr(saham_cache, "maxsize", 8)
+
+    saham_cache.clear()
+    result = calculate_batch(items, workers=2)
+
+    assert _batch_items(result) == expected
+    assert max(warmed) == 8 and sum(warmed) == result.unique_shapes
+    assert len(warmed) > 1
+
+
+def test_split_batch_keeps_shapes_together_and_merges_in_order():
+    items = _batch_inputs()
+    saham_cache.clear()
+    expected = _expected_batch(items)
+    whole = calculate_batch(items)
+
+    parts = split_batch(items, 3)
+    assert sorted(index for part in parts for index in part) == list(range(len(items)))
+    merged = merge_batch_results(
+        len(items), [(part, calculate_batch([items[index] for index in part])) for part in parts], 0.0
+    )
+
+    assert [item.index for item in merged.items] == list(range(len(items)))
+    assert _batch_items(merged) == expected
+    assert (merged.unique_shapes, merged.deduplicated, merged.failed) == \
+        (whole.unique_shapes, whole.deduplicated, whole.failed)
+
+
+# Referensi hijab berbasis list (sebelum kompilasi bitmask): penghalang
+# langsung dicek satu per satu, syarat jumlah dan ma'al-ghair sebagai if biasa
+_BELOW_AKH_AB = (HeirID.IBN_AKH_ABAWAYN, HeirID.IBN_AKH_AB, HeirID.AMM_ABAWAYN, HeirID.AMM_AB,
+                 HeirID.IBN_AMM_ABAWAYN, HeirID.IBN_AMM_AB, HeirID.MUTIQ, HeirID.MUTIQAH)
+
+
+def _reference_hijab(heir_dict):
+    present = [heir_id for heir_id, quantity in sorted(heir_dict.items()) if quantity > 0]
+    female_descendant = HeirID.BINT in present or HeirID.BINT_IBN in present
+    reasons = {}
+    for heir_id in present:
+        blocker = next((HEIR_NAMES[b]["id"] for b in HIJAB_BLOCKERS.get(heir_id, ()) if b in present), None)
+        if blocker is None and heir_id == HeirID.BINT_IBN:
+            if heir_dict.get(HeirID.BINT, 0) >= 2 and HeirID.IBN_IBN not in present:
+                blocker = "dua Anak Perempuan atau lebih (tidak ada Cucu Laki-laki sebagai mu'ashshib)"
+        if blocker is None and heir_id == HeirID.UKHT_AB:
+            if heir_dict.get(HeirID.UKHT_ABAWAYN, 0) >= 2 and HeirID.AKH_AB not in present:
+                blocker = ("dua Saudari Kandung atau lebih "
+                           "(tidak ada Saudara Laki-laki Seayah sebagai mu'ashshib)")
+        if blocker is None and heir_id in (HeirID.UKHT_AB, HeirID.AKH_AB) + _BELOW_AKH_AB:
+            if HeirID.UKHT_ABAWAYN in present and female_descendant:
+                blocker = "Saudari Kandung yang menjadi ashobah ma'al-ghair (bersama anak/cucu perempuan)"
+        if blocker is None and heir_id in _BELOW_AKH_AB:
+            if HeirID.UKHT_AB in present and female_descendant:
+                blocker = "Saudari Seayah yang menjadi ashobah ma'al-ghair (bersama anak/cucu perempuan)"
+        if blocker is not None:
+            reasons[heir_id] = f"{HEIR_NAMES[heir_id]['id']} terhalang (mahjub) oleh {blocker}."
+    return reasons
+
+
+def _assert_hijab_matches_reference(heir_dict):
+    mahjub_mask, reasons = compute_hijab(hijab_mask(heir_dict))
+    expected = _reference_hijab(heir_dict)
+
+    assert list(reasons) == list(expected.items()), heir_dict
+    assert mahjub_mask == sum(1 << heir_id for heir_id in expected), heir_dict
+
+
+def test_hijab_matches_list_rules_for_enumerated_heirs():
+    # Semua kombinasi ahli waris yang terlibat syarat jumlah dan ma'al-ghair;
+    # BINT dan UKHT_ABAWAYN 0/1/2 orang untuk bit jamak 26/27
+    flags = (HeirID.IBN, HeirID.IBN_IBN, HeirID.BINT_IBN, HeirID.ABB, HeirID.AKH_ABAWAYN,
+             HeirID.AKH_AB, HeirID.UKHT_AB, HeirID.IBN_AKH_AB, HeirID.AMM_ABAWAYN, HeirID.MUTIQAH)
+    for bint, ukht_abawayn in product(range(3), repeat=2):
+        for present in product((0, 1), repeat=len(flags)):
+            heir_dict = dict(zip(flags, present))
+            heir_dict[HeirID.BINT] = bint
+            heir_dict[HeirID.UKHT_ABAWAYN] = ukht_abawayn
+            _assert_hijab_matches_reference(heir_dict)
+
+
+def test_hijab_matches_list_rules_for_random_heirs():
+    rng = random.Random(11)
+    heir_ids = list(HeirID)
+    for _ in range(5000):
+        chosen = rng.sample(heir_ids, rng.randint(1, 10))
+        _assert_hijab_matches_reference({heir_id: rng.randint(1, 3) for heir_id in chosen})
+
+
+# Referensi pencocokan aturan berbasis dict (pemindaian FURUDH_RULES asli),
+# dengan syarat min_saudara Ibu hanya berlaku tanpa anak/cucu
+_SIBLINGS = (HeirID.AKH_ABAWAYN, HeirID.AKH_AB, HeirID.AKH_UMM,
+             HeirID.UKHT_ABAWAYN, HeirID.UKHT_AB, HeirID.UKHT_UMM)
+_DESCENDANTS = (HeirID.IBN, HeirID.BINT, HeirID.IBN_IBN, HeirID.BINT_IBN)
+
+
+def _reference_rule_matches(rule, heir_dict, quantity):
+    def has_any(heir_ids):
+        return any(heir_dict.get(heir_id, 0) > 0 for heir_id in heir_ids)
+
+    sibling_count = sum(heir_dict.get(heir_id, 0) for heir_id in _SIBLINGS)
+    if "syarat_mahjub" in rule and has_any(rule["syarat_mahjub"]):
+        return False
+    if "syarat_ada" in rule:
+        if "min_saudara" in rule and not has_any(_DESCENDANTS) and sibling_count < rule["min_saudara"]:
+            return False
+        if not has_any(rule["syarat_ada"]):
+            return False
+    if "syarat_tidak_ada" in rule and has_any(rule["syarat_tidak_ada"]):
+        return False
+    if "jumlah_min" in rule and quantity < rule["jumlah_min"]:
+        return False
+    if "jumlah" in rule and quantity != rule["jumlah"]:
+        return False
+    if "max_saudara" in rule and sibling_count > rule["max_saudara"]:
+        return False
+    return True
+
+
+def test_compiled_rules_match_furudh_rules_scan():
+    rng = random.Random(1)
+    heir_ids = list(HeirID)
+    checked = 0
+    for _ in range(3000):
+        heir_dict = {heir_id: rng.randint(1, 3) for heir_id in rng.sample(heir_ids, rng.randint(1, 8))}
+        engine = FurudhEngine([HeirInput(id=heir_id, quantity=q) for heir_id, q in heir_dict.items()])
+        for heir_id, quantity in heir_dict.items():
+            rules = [rule for rule in FURUDH_RULES.get(heir_id, ()) if "kasus_khusus" not in rule]
+            compiled = [rule for rule in COMPILED_FURUDH_RULES.get(heir_id, ()) if rule.kasus_khusus is None]
+            for rule, compiled_rule in zip(rules, compiled):
+                assert compiled_rule.rule is rule
+                expected = _reference_rule_matches(rule, heir_dict, quantity)
+                assert compiled_rule.matches(engine.heir_mask, quantity, engine.sibling_count) == expected, \
+                    (heir_id, rule["fardh"], heir_dict)
+                checked += 1
+
+    assert checked > 5000
+
+
+# ===== Ashobah =====
+
+def _calculate(entries, tirkah=1200):
+    return calculate_inheritance(CalculationInput(
+        heirs=[HeirInput(id=heir_id, quantity=quantity) for heir_id, quantity in entries], tirkah=tirkah
+    ))
+
+
+@pytest.mark.parametrize("pattern, winners", [
+    (((HeirID.AKH_ABAWAYN, 1), (HeirID.IBN, 1), (HeirID.AMM_AB, 1)), [HeirID.IBN]),
+    (((HeirID.AMM_ABAWAYN, 1), (HeirID.IBN_IBN, 2)), [HeirID.IBN_IBN]),
+    (((HeirID.AKH_AB, 1), (HeirID.AKH_ABAWAYN, 1)), [HeirID.AKH_ABAWAYN]),
+    (((HeirID.IBN_AMM_AB, 1), (HeirID.IBN_AMM_ABAWAYN, 1), (HeirID.AMM_AB, 1)), [HeirID.AMM_AB]),
+    (((HeirID.MUTIQ, 1), (HeirID.IBN_AMM_AB, 1)), [HeirID.IBN_AMM_AB]),
+])
+def test_ashobah_priority_order(pattern, winners):
+    group = resolve_ashobah(pattern)
+
+    assert [heir_id for heir_id, _, _ in group.members] == winners
+    assert sorted(group.excluded) == sorted(heir_id for heir_id, _ in pattern if heir_id not in winners)
+    assert group.kind == BI_NAFSIH
+
+
+def test_ashobah_bil_ghair_splits_two_to_one():
+    group = resolve_ashobah(((HeirID.BINT, 3), (HeirID.IBN, 2)))
+
+    assert group.kind == BIL_GHAIR
+    assert (group.weight(HeirID.IBN), group.weight(HeirID.BINT)) == (2, 1)
+    assert group.ruus == 7
+    assert group.split(21) == {HeirID.BINT: 9, HeirID.IBN: 12}
+
+
+def test_ashobah_maal_ghair_sister_with_daughter():
+    group = resolve_ashobah(((HeirID.UKHT_ABAWAYN, 2),))
+
+    assert group.kind == MAAL_GHAIR
+    assert group.split(4) == {HeirID.UKHT_ABAWAYN: 4}
+
+    result = _calculate([(HeirID.BINT, 1), (HeirID.UKHT_ABAWAYN, 2), (HeirID.AMM_ABAWAYN, 1)])
+    shares = {share.heir.id: share for share in result.shares}
+    assert result.ashlul_masalah_akhir == 4
+    assert (shares[HeirID.BINT].fardh, shares[HeirID.BINT].saham) == ("1/2", 2)
+    assert (shares[HeirID.UKHT_ABAWAYN].fardh, shares[HeirID.UKHT_ABAWAYN].saham) == (None, 2)
+    assert shares[HeirID.AMM_ABAWAYN].is_mahjub
+
+
+def test_ashobah_bi_sabab_only_without_nasab_ashobah():
+    group = resolve_ashobah(((HeirID.MUTIQAH, 1), (HeirID.MUTIQ, 1)))
+
+    assert group.kind == BI_SABAB
+    assert [heir_id for heir_id, _, _ in group.members] == [HeirID.MUTIQ]
+    assert group.excluded == (HeirID.MUTIQAH,)
+
+    result = _calculate([(HeirID.ZAWJAH, 1), (HeirID.MUTIQ, 1)])
+    assert {share.heir.id: share.saham for share in result.shares} == {HeirID.ZAWJAH: 1, HeirID.MUTIQ: 3}
+
+
+# ===== Inkisar =====
+
+@pytest.mark.parametrize("ruus, saham, multiplier, relation", [
+    (4, 2, 2, "MUDAKHOLAH"),
+    (3, 2, 3, "MUBAYANAH"),
+    (4, 6, 2, "MUWAFAQOH"),
+    (6, 4, 3, "MUWAFAQOH"),
+])
+def test_inkisar_single_group_multiplier(ruus, saham, multiplier, relation):
+    result, steps = resolve_inkisar(((ruus, saham),), 12)
+
+    assert result == multiplier
+    assert any(relation in template for _, template, _ in steps)
+    assert steps[-1] == ("summary", "   Ashl baru = {} × {} = {}", (12, multiplier, 12 * multiplier))
+
+
+@pytest.mark.parametrize("groups, multiplier, relation", [
+    (((2, 1), (2, 3)), 2, "MUMATSALAH"),
+    (((2, 1), (4, 1)), 4, "MUDAKHOLAH"),
+    (((4, 1), (6, 1)), 12, "MUWAFAQOH"),
+    (((2, 1), (3, 1)), 6, "MUBAYANAH"),
+    (((2, 1), (3, 1), (4, 1)), 12, None),
+])
+def test_inkisar_multiple_groups_multiplier(groups, multiplier, relation):
+    result, steps = resolve_inkisar(groups, 6)
+
+    assert result == multiplier
+    if relation is not None:
+        assert any(relation in template for _, template, _ in steps)
+    assert steps[-1] == ("summary", "   Ashl baru = {} × {} = {}", (6, multiplier, 6 * multiplier))
+
+
+def test_replay_inkisar_steps_renders_group_names():
+    _, steps = resolve_inkisar(((2, 1), (3, 1)), 6)
+
+    notes = NoteLog()
+    replay_inkisar_steps(steps, notes, ["2 Anak Perempuan", "3 Saudari Seibu"])
+    lines = notes.render()
+    assert "   ┌─ Kelompok 1: 2 Anak Perempuan" in lines
+    assert "   ┌─ Kelompok 2: 3 Saudari Seibu" in lines
+    assert "   Multiplier = 2 × 3 = 6" in lines
+    assert lines[-1] == "   Ashl baru = 6 × 6 = 36"
+
+    summary = NoteLog(NoteVerbosity.SUMMARY)
+    replay_inkisar_steps(steps, summary)
+    assert summary.render() == ["   Ashl baru = 6 × 6 = 36"]
+
+    silent = NoteLog(NoteVerbosity.NONE)
+    replay_inkisar_steps(steps, silent)
+    assert silent.render() == []
+
+
+# ===== 'Aul =====
+
+@pytest.mark.parametrize("ashl, total", [
+    (6, 7), (6, 8), (6, 9), (6, 10), (12, 13), (12, 15), (12, 17), (24, 27),
+])
+def test_classify_aul_standard_cases(ashl, total):
+    aul = classify_aul(ashl, total)
+
+    assert aul.valid
+    assert aul.ashl_akhir == total
+    assert aul.name == AUL_NAMES[(ashl, total)]
+
+
+@pytest.mark.parametrize("ashl, total, ashl_akhir", [
+    (6, 6, 6),      # tidak terjadi 'aul
+    (6, 11, 11),    # di luar 7-10
+    (12, 14, 14),   # 'aul genap dari 12 tidak ada
+    (24, 26, 26),
+    (8, 9, 9),      # ashl 8 tidak pernah 'aul
+    (6, 40, 40),    # di luar tabel, diklasifikasikan langsung
+])
+def test_classify_aul_non_standard_cases(ashl, total, ashl_akhir):
+    aul = classify_aul(ashl, total)
+
+    assert not aul.valid
+    assert aul.name is None
+    assert aul.ashl_akhir == ashl_akhir
+
+
+@pytest.mark.parametrize("entries, ashl_akhir", [
+    ([(HeirID.ZAWJ, 1), (HeirID.UKHT_ABAWAYN, 2)], 7),
+    ([(HeirID.ZAWJAH, 1), (HeirID.UKHT_ABAWAYN, 2), (HeirID.UMM, 1)], 13),
+    ([(HeirID.ZAWJAH, 1), (HeirID.UKHT_ABAWAYN, 2), (HeirID.UMM, 1), (HeirID.AKH_UMM, 2)], 17),
+])
+def test_calculation_reports_aul_name(entries, ashl_akhir):
+    result = _calculate(entries)
+
+    assert result.is_aul
+    assert result.ashlul_masalah_akhir == ashl_akhir
+    assert result.aul_type == AUL_NAMES[(result.ashlul_masalah_awal, ashl_akhir)]
+
+
+def test_non_standard_aul_is_logged(monkeypatch, caplog):
+    monkeypatch.setattr(calculator_module, "classify_aul",
+                        lambda ashl, total: AulClass(total, None, False, "tidak valid"))
+    calculator_logger = logging.getLogger(calculator_module.__name__)
+    calculator_logger.addHandler(caplog.handler)
+    saham_cache.clear()
+    try:
+        with caplog.at_level(logging.WARNING, logger=calculator_module.__name__):
+            result = _calculate([(HeirID.ZAWJ, 1), (HeirID.UKHT_ABAWAYN, 2)])
+    finally:
+        calculator_logger.removeHandler(caplog.handler)
+        saham_cache.clear()
+
+    assert result.is_aul and result.aul_type is None
+    assert "Non-standard aul case" in [record.getMessage() for record in caplog.records]
+    assert "   ⚠️ PERINGATAN: Kasus 'aul ini tidak standar!" in result.notes
+
+
+# ===== Cache struktur saham =====
+
+def test_lru_cache_counts_hits_misses_and_evictions():
+    cache = LRUCache(maxsize=2)
+
+    assert cache.get("a") is None
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1      # "a" jadi paling baru
+    cache.put("c", 3)               # "b" dibuang
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["size"]) == (3, 2, 1, 2)
+    cache.resize(1)
+    assert len(cache) == 1 and cache.evictions == 2
+    cache.clear()
+    assert (len(cache), cache.hits, cache.misses, cache.evictions) == (0, 0, 0, 0)
+
+
+def test_cache_key_ignores_heir_order_and_merges_duplicates():
+    heirs = [HeirInput(id=HeirID.UMM, quantity=1), HeirInput(id=HeirID.BINT, quantity=2),
+             HeirInput(id=HeirID.ZAWJ, quantity=1)]
+    reordered = [heirs[2], HeirInput(id=HeirID.BINT, quantity=1), heirs[0], HeirInput(id=HeirID.BINT, quantity=1)]
+
+    assert make_cache_key(heirs, "full") == make_cache_key(reordered, "full")
+    assert make_cache_key(heirs, "full") != make_cache_key(heirs, "none")
+    assert make_cache_key(heirs) != make_cache_key(heirs[:2])
+
+
+def test_reordered_heirs_reuse_cached_structure():
+    heirs = [HeirInput(id=HeirID.ZAWJ, quantity=1), HeirInput(id=HeirID.UMM, quantity=1),
+             HeirInput(id=HeirID.BINT, quantity=2)]
+    saham_cache.clear()
+    first = FaroidCalculator(CalculationInput(heirs=heirs, tirkah=TIRKAH)).calculate()
+    second = FaroidCalculator(CalculationInput(heirs=heirs[::-1], tirkah=TIRKAH)).calculate()
+
+    assert saham_cache.hits == 1 and len(saham_cache) == 1
+    assert {s.heir.id: s.saham for s in first.shares} == {s.heir.id: s.saham for s in second.shares}
+
+
+def test_ruleset_version_change_invalidates_cache(monkeypatch):
+    heirs = [HeirInput(id=HeirID.ZAWJ, quantity=1), HeirInput(id=HeirID.BINT, quantity=2)]
+    saham_cache.clear()
+    FaroidCalculator(CalculationInput(heirs=heirs, tirkah=TIRKAH)).calculate()
+    old_key = make_cache_key(heirs)
+
+    monkeypatch.setattr(result_cache_module, "RULESET_VERSION", "versi-baru")
+    assert make_cache_key(heirs) != old_key
+    FaroidCalculator(CalculationInput(heirs=heirs, tirkah=TIRKAH)).calculate()
+
+    assert saham_cache.hits == 0 and saham_cache.misses == 2
+    assert len(saham_cache) == 2
+    assert saham_cache.stats()["ruleset"] == "versi-baru"
+    saham_cache.clear()
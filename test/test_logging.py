@@ -0,0 +1,143 @@
+"""
+Test konfigurasi logging
+"""
+
+import json
+import logging
+import sys
+from logging.handlers import QueueHandler
+from types import SimpleNamespace
+
+import pytest
+
+from app.utils import logging_config
+from app.utils.logging_config import (
+    DebugSampler, JsonFormatter, ModuleLevelFilter, request_trace, setup_logging, shutdown_logging
+)
+
+
+def _record(name="app.core.calculator", level=logging.INFO, msg="pesan %s", args=("satu",), exc_info=None):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, exc_info)
+
+
+def _settings(**overrides):
+    values = {
+        "LOG_LEVEL": "WARNING",
+        "LOG_MODULE_LEVELS": {},
+        "LOG_FORMAT": "json",
+        "LOG_FILE": None,
+        "LOG_DEBUG_SAMPLE_RATE": 0,
+    }
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+@pytest.fixture
+def restore_logging():
+    """Kembalikan konfigurasi logging aplikasi setelah test"""
+    yield
+    from app.config import settings
+    setup_logging(settings)
+
+
+def test_json_formatter_fields():
+    payload = json.loads(JsonFormatter().format(_record()))
+
+    assert set(payload) == {"time", "level", "logger", "message"}
+    assert (payload["level"], payload["logger"], payload["message"]) == \
+        ("INFO", "app.core.calculator", "pesan satu")
+    assert payload["time"].endswith("+00:00")
+
+
+def test_json_formatter_adds_trace_and_exception():
+    try:
+        raise ValueError("rusak")
+    except ValueError:
+        record = _record(level=logging.ERROR, exc_info=sys.exc_info())
+    record.trace = True
+
+    payload = json.loads(JsonFormatter().format(record))
+
+    assert payload["trace"] is True
+    assert "ValueError: rusak" in payload["exc_info"]
+
+
+def test_module_level_filter_uses_longest_prefix():
+    level_filter = ModuleLevelFilter(logging.WARNING, {
+        "app.core": logging.INFO,
+        "app.core.calculator": logging.ERROR,
+    })
+
+    assert level_filter.level_for("app.core.calculator") == logging.ERROR
+    assert level_filter.level_for("app.core.calculator_extra") == logging.INFO
+    assert level_filter.level_for("app.core.radd") == logging.INFO
+    assert level_filter.level_for("app.api") == logging.WARNING
+    assert not level_filter.filter(_record("app.core.calculator", logging.WARNING))
+    assert level_filter.filter(_record("app.core.radd", logging.INFO))
+    assert not level_filter.filter(_record("app.api", logging.INFO))
+
+
+def test_module_level_filter_passes_traced_requests(monkeypatch):
+    level_filter = ModuleLevelFilter(logging.WARNING, {})
+    record = _record(level=logging.DEBUG)
+    monkeypatch.setattr(logging_config, "_sampler", DebugSampler(1))
+
+    with request_trace() as traced:
+        assert traced
+        assert level_filter.filter(record)
+    assert record.trace is True
+    assert not level_filter.filter(_record(level=logging.DEBUG))
+
+
+def test_debug_sampler_traces_every_nth_request():
+    sampler = DebugSampler(3)
+    assert [sampler.should_trace() for _ in range(7)] == [False, False, True, False, False, True, False]
+    disabled = DebugSampler(0)
+    assert not any(disabled.should_trace() for _ in range(10))
+
+
+def test_setup_logging_routes_through_queue_listener(tmp_path, restore_logging):
+    log_file = tmp_path / "faraid.log"
+    setup_logging(_settings(
+        LOG_MODULE_LEVELS={"app.core.calculator": "INFO"}, LOG_FILE=str(log_file)
+    ))
+
+    app_logger = logging.getLogger("app")
+    assert [type(handler) for handler in app_logger.handlers] == [QueueHandler]
+    assert app_logger.level == logging.INFO and not app_logger.propagate
+    listener = logging_config._listener
+    assert listener is not None
+    assert {type(handler) for handler in listener.handlers} == {logging.StreamHandler, logging.FileHandler}
+
+    logging.getLogger("app.core.calculator").info("info kalkulator")
+    logging.getLogger("app.core.radd").info("info radd dibuang")
+    logging.getLogger("app.core.radd").warning("peringatan radd")
+    shutdown_logging()
+
+    lines = [json.loads(line) for line in log_file.read_text(encoding="utf-8").splitlines()]
+    assert [(line["logger"], line["message"]) for line in lines] == [
+        ("app.core.calculator", "info kalkulator"),
+        ("app.core.radd", "peringatan radd"),
+    ]
+    assert logging_config._listener is None
+
+
+def test_setup_logging_samples_debug_traces(tmp_path, restore_logging):
+    log_file = tmp_path / "faraid.log"
+    setup_logging(_settings(LOG_FILE=str(log_file), LOG_DEBUG_SAMPLE_RATE=2))
+
+    assert logging.getLogger("app").level == logging.DEBUG
+    for request in range(1, 5):
+        with request_trace():
+            logging.getLogger("app.core.calculator").debug("request %d", request)
+    shutdown_logging()
+
+    lines = [json.loads(line) for line in log_file.read_text(encoding="utf-8").splitlines()]
+    assert [(line["message"], line.get("trace")) for line in lines] == [
+        ("request 2", True), ("request 4", True),
+    ]
+
+
+def test_setup_logging_rejects_unknown_level(restore_logging):
+    with pytest.raises(ValueError):
+        setup_logging(_settings(LOG_LEVEL="BERISIK"))
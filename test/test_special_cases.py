@@ -0,0 +1,364 @@
+"""
+Test kasus khusus
+"""
+
+import pytest
+
+from app.schemas.heir import HeirInput
+from app.special_cases import (
+    AKDARIYYAH_SIGNATURE,
+    GHARRAWIN_SIGNATURE,
+    JADD_IKHWAH_SIGNATURE,
+    MUSYTARAKAH_SIGNATURE,
+    classify_special_case,
+)
+from app.special_cases.registry import CaseSignature, SpecialCaseRegistry
+from app.utils.constants import HeirID
+
+
+def _heirs(*entries):
+    return [HeirInput(id=heir_id, quantity=quantity) for heir_id, quantity in entries]
+
+
+# ===== CaseSignature / SpecialCaseRegistry =====
+
+def test_registration_order_is_priority():
+    registry = SpecialCaseRegistry()
+    registry.register(CaseSignature("umum", required=(HeirID.JADD,)))
+    registry.register(CaseSignature("khusus", required=(HeirID.JADD, HeirID.UKHT_ABAWAYN)))
+
+    assert registry.classify(_heirs((HeirID.JADD, 1), (HeirID.UKHT_ABAWAYN, 1))) == "umum"
+
+
+def test_duplicate_case_id_is_rejected():
+    registry = SpecialCaseRegistry()
+    registry.register(CaseSignature("kasus", required=(HeirID.JADD,)))
+
+    with pytest.raises(ValueError):
+        registry.register(CaseSignature("kasus", required=(HeirID.UMM,)))
+
+
+def test_forbidden_heir_blocks_match():
+    registry = SpecialCaseRegistry()
+    registry.register(CaseSignature("kasus", required=(HeirID.JADD,), forbidden=(HeirID.ABB,)))
+
+    assert registry.classify(_heirs((HeirID.JADD, 1))) == "kasus"
+    assert registry.classify(_heirs((HeirID.JADD, 1), (HeirID.ABB, 1))) is None
+
+
+def test_counts_limit_quantity():
+    registry = SpecialCaseRegistry()
+    registry.register(CaseSignature(
+        "kasus", required=(HeirID.UKHT_ABAWAYN,), counts={HeirID.UKHT_ABAWAYN: (2, 3)}
+    ))
+
+    assert [
+        registry.classify(_heirs((HeirID.UKHT_ABAWAYN, quantity))) for quantity in range(1, 6)
+    ] == [None, "kasus", "kasus", None, None]
+
+
+def test_group_counts_sum_quantities():
+    registry = SpecialCaseRegistry()
+    registry.register(CaseSignature(
+        "kasus", counts={(HeirID.AKH_UMM, HeirID.UKHT_UMM): (2, None)}
+    ))
+
+    assert registry.classify(_heirs((HeirID.AKH_UMM, 1))) is None
+    assert registry.classify(_heirs((HeirID.AKH_UMM, 1), (HeirID.UKHT_UMM, 1))) == "kasus"
+    assert registry.classify(_heirs((HeirID.UKHT_UMM, 7))) == "kasus"
+
+
+def test_duplicate_heir_entries_are_merged_for_counts():
+    registry = SpecialCaseRegistry()
+    registry.register(CaseSignature("kasus", counts={HeirID.BINT: (2, 2)}))
+
+    assert registry.classify(_heirs((HeirID.BINT, 1), (HeirID.BINT, 1))) == "kasus"
+
+
+# ===== Signature bawaan =====
+
+@pytest.mark.parametrize("signature, heirs", [
+    (AKDARIYYAH_SIGNATURE, _heirs((HeirID.ZAWJ, 1), (HeirID.UMM, 1), (HeirID.JADD, 1),
+                                  (HeirID.UKHT_ABAWAYN, 1))),
+    (JADD_IKHWAH_SIGNATURE, _heirs((HeirID.JADD, 1), (HeirID.AKH_ABAWAYN, 2))),
+    (MUSYTARAKAH_SIGNATURE, _heirs((HeirID.ZAWJ, 1), (HeirID.UMM, 1), (HeirID.AKH_UMM, 2),
+                                   (HeirID.AKH_ABAWAYN, 1))),
+    (MUSYTARAKAH_SIGNATURE, _heirs((HeirID.ZAWJ, 1), (HeirID.JADDAH_UMM, 1),
+                                   (HeirID.AKH_UMM, 1), (HeirID.UKHT_UMM, 1),
+                                   (HeirID.AKH_ABAWAYN, 1), (HeirID.UKHT_ABAWAYN, 2))),
+    (GHARRAWIN_SIGNATURE, _heirs((HeirID.JADDAH_UMM, 1), (HeirID.JADDAH_ABB, 1), (HeirID.IBN, 1))),
+], ids=lambda value: getattr(value, "case_id", ""))
+def test_builtin_signature_matches(signature, heirs):
+    assert signature.matches(heirs)
+    assert classify_special_case(heirs) == signature.case_id
+
+
+@pytest.mark.parametrize("signature, heirs", [
+    # Akdariyyah: dua saudari kandung
+    (AKDARIYYAH_SIGNATURE, _heirs((HeirID.ZAWJ, 1), (HeirID.UMM, 1), (HeirID.JADD, 1),
+                                  (HeirID.UKHT_ABAWAYN, 2))),
+    # Akdariyyah: ada anak perempuan
+    (AKDARIYYAH_SIGNATURE, _heirs((HeirID.ZAWJ, 1), (HeirID.UMM, 1), (HeirID.JADD, 1),
+                                  (HeirID.UKHT_ABAWAYN, 1), (HeirID.BINT, 1))),
+    # Jadd ma'al-Ikhwah: kakek terhalang ayah
+    (JADD_IKHWAH_SIGNATURE, _heirs((HeirID.JADD, 1), (HeirID.ABB, 1), (HeirID.AKH_ABAWAYN, 1))),
+    # Musytarakah: semua saudara mahjub oleh anak laki-laki
+    (MUSYTARAKAH_SIGNATURE, _heirs((HeirID.ZAWJAH, 1), (HeirID.UMM, 1), (HeirID.AKH_UMM, 1),
+                                   (HeirID.AKH_ABAWAYN, 1), (HeirID.IBN, 1))),
+    # Musytarakah: ada anak perempuan
+    (MUSYTARAKAH_SIGNATURE, _heirs((HeirID.ZAWJ, 1), (HeirID.UMM, 1), (HeirID.AKH_UMM, 2),
+                                   (HeirID.AKH_ABAWAYN, 1), (HeirID.BINT, 1))),
+    # Musytarakah: hanya satu saudara seibu
+    (MUSYTARAKAH_SIGNATURE, _heirs((HeirID.ZAWJ, 1), (HeirID.UMM, 1), (HeirID.AKH_UMM, 1),
+                                   (HeirID.AKH_ABAWAYN, 1))),
+    # Musytarakah: istri, bukan suami (saudara kandung masih mendapat sisa)
+    (MUSYTARAKAH_SIGNATURE, _heirs((HeirID.ZAWJAH, 1), (HeirID.UMM, 1), (HeirID.AKH_UMM, 2),
+                                   (HeirID.AKH_ABAWAYN, 1))),
+    # Musytarakah: hanya saudari kandung (mendapat fardh, bukan ashobah)
+    (MUSYTARAKAH_SIGNATURE, _heirs((HeirID.ZAWJ, 1), (HeirID.UMM, 1), (HeirID.AKH_UMM, 2),
+                                   (HeirID.UKHT_ABAWAYN, 1))),
+    # Musytarakah: ada kakek
+    (MUSYTARAKAH_SIGNATURE, _heirs((HeirID.ZAWJ, 1), (HeirID.UMM, 1), (HeirID.AKH_UMM, 2),
+                                   (HeirID.AKH_ABAWAYN, 1), (HeirID.JADD, 1))),
+    # Gharrawin: nenek dari ibu terhalang ibu
+    (GHARRAWIN_SIGNATURE, _heirs((HeirID.JADDAH_UMM, 1), (HeirID.JADDAH_ABB, 1), (HeirID.UMM, 1))),
+    # Gharrawin: hanya satu nenek
+    (GHARRAWIN_SIGNATURE, _heirs((HeirID.JADDAH_UMM, 1), (HeirID.IBN, 1))),
+], ids=lambda value: getattr(value, "case_id", ""))
+def test_builtin_signature_rejects(signature, heirs):
+    assert not signature.matches(heirs)
+    assert classify_special_case(heirs) != signature.case_id
+
+
+def test_akdariyyah_takes_priority_over_jadd_ikhwah():
+    heirs = _heirs((HeirID.ZAWJ, 1), (HeirID.UMM, 1), (HeirID.JADD, 1), (HeirID.UKHT_ABAWAYN, 1))
+
+    assert JADD_IKHWAH_SIGNATURE.matches(heirs)
+    assert classify_special_case(heirs) == "akdariyyah"
+
+
+# ===== Engine kasus khusus =====
+
+def _calculate(entries, tirkah=1200):
+    from app.core.calculator import calculate_inheritance
+    from app.schemas.calculation import CalculationInput
+
+    return calculate_inheritance(CalculationInput(heirs=_heirs(*entries), tirkah=tirkah))
+
+
+def _saham(result):
+    return {share.heir.id: share.saham for share in result.shares if not share.is_mahjub}
+
+
+def test_musytarakah_full_brother_shares_the_third():
+    result = _calculate([(HeirID.ZAWJ, 1), (HeirID.UMM, 1), (HeirID.AKH_UMM, 2),
+                         (HeirID.AKH_ABAWAYN, 1)], tirkah=1800)
+
+    assert result.special_case_name == "Al-Musytarakah (Al-Himariyyah)"
+    assert (result.ashlul_masalah_awal, result.ashlul_masalah_akhir) == (6, 18)
+    assert _saham(result) == {HeirID.ZAWJ: 9, HeirID.UMM: 3, HeirID.AKH_UMM: 4, HeirID.AKH_ABAWAYN: 2}
+    amounts = {share.heir.id: share.share_amount for share in result.shares}
+    assert amounts[HeirID.AKH_ABAWAYN] == pytest.approx(200)
+
+
+def test_musytarakah_siblings_share_per_head_with_grandmothers():
+    result = _calculate([(HeirID.ZAWJ, 1), (HeirID.JADDAH_UMM, 1), (HeirID.JADDAH_ABB, 1),
+                         (HeirID.AKH_UMM, 1), (HeirID.UKHT_UMM, 1), (HeirID.AKH_ABAWAYN, 1),
+                         (HeirID.UKHT_ABAWAYN, 2), (HeirID.AKH_AB, 1)])
+
+    assert result.ashlul_masalah_akhir == 60
+    assert _saham(result) == {
+        HeirID.ZAWJ: 30, HeirID.JADDAH_UMM: 5, HeirID.JADDAH_ABB: 5,
+        HeirID.AKH_UMM: 4, HeirID.UKHT_UMM: 4, HeirID.AKH_ABAWAYN: 4, HeirID.UKHT_ABAWAYN: 8,
+    }
+    assert [share.heir.id for share in result.shares if share.is_mahjub] == [HeirID.AKH_AB]
+
+
+def test_gharrawin_grandmothers_split_one_sixth():
+    result = _calculate([(HeirID.JADDAH_UMM, 1), (HeirID.JADDAH_ABB, 1), (HeirID.IBN, 1)])
+
+    assert result.special_case_name == "Al-Gharrawin"
+    amounts = {share.heir.id: share.share_amount for share in result.shares}
+    assert amounts == pytest.approx({HeirID.JADDAH_UMM: 100, HeirID.JADDAH_ABB: 100, HeirID.IBN: 1000})
+
+
+# ===== Jadd ma'al-Ikhwah =====
+
+@pytest.mark.parametrize("entries, fardh, saham, ashl", [
+    # Muqasamah: 1/2 > 1/3
+    ([(HeirID.JADD, 1), (HeirID.AKH_ABAWAYN, 1)], "Muqasamah", 1, 2),
+    # 1/3 seluruh harta: muqasamah 1/4 < 1/3
+    ([(HeirID.JADD, 1), (HeirID.AKH_ABAWAYN, 3)], "1/3", 3, 9),
+    # 1/3 sisa: sisa 3/4, 1/3 sisa = 1/4 > muqasamah 3/16 > 1/6
+    ([(HeirID.ZAWJAH, 1), (HeirID.JADD, 1), (HeirID.AKH_ABAWAYN, 3)], "1/3 sisa", 3, 12),
+    # 1/6: sisa 1/3, muqasamah dan 1/3 sisa = 1/9
+    ([(HeirID.ZAWJ, 1), (HeirID.UMM, 1), (HeirID.JADD, 1), (HeirID.AKH_ABAWAYN, 2)], "1/6", 2, 12),
+], ids=["muqasamah", "sepertiga", "sepertiga_sisa", "seperenam"])
+def test_jadd_ikhwah_option_wins(entries, fardh, saham, ashl):
+    result = _calculate(entries)
+    jadd = next(share for share in result.shares if share.heir.id == HeirID.JADD)
+
+    assert result.special_case_name == "Jadd ma'al-Ikhwah"
+    assert (jadd.fardh, jadd.saham, result.ashlul_masalah_akhir) == (fardh, saham, ashl)
+
+
+def test_jadd_ikhwah_muaddah():
+    result = _calculate([(HeirID.JADD, 1), (HeirID.UKHT_ABAWAYN, 1), (HeirID.AKH_AB, 1)])
+
+    assert result.ashlul_masalah_akhir == 10
+    assert _saham(result) == {HeirID.JADD: 4, HeirID.UKHT_ABAWAYN: 5, HeirID.AKH_AB: 1}
+
+
+def test_jadd_ikhwah_sibling_without_residue_is_mahjub():
+    result = _calculate([(HeirID.ZAWJ, 1), (HeirID.UMM, 1), (HeirID.BINT, 2),
+                         (HeirID.JADD, 1), (HeirID.AKH_ABAWAYN, 1)])
+    brother = next(share for share in result.shares if share.heir.id == HeirID.AKH_ABAWAYN)
+
+    assert (result.ashlul_masalah_awal, result.ashlul_masalah_akhir) == (12, 15)
+    assert brother.is_mahjub
+    assert brother.saham == 0
+    assert brother.mahjub_reason
+
+
+def test_jadd_option_table_matches_direct_options():
+    from app.special_cases.jadd_ikhwah import JADD_OPTION_TABLE, jadd_options, lookup_jadd_option
+
+    for (furudh_total, heads), (option, share) in JADD_OPTION_TABLE.items():
+        options = jadd_options(furudh_total, heads)
+        assert share == max(options.values()), (furudh_total, heads)
+        assert options[option] == share
+        # Kepala lebih banyak dari baris tabel terakhir memakai baris tersebut
+        for more_heads in range(heads, heads + 4):
+            expected = max(jadd_options(furudh_total, more_heads).values())
+            assert lookup_jadd_option(furudh_total, more_heads)[1] == expected
+
+
+# ===== Gharqa =====
+
+GHARQA_DECEASED = [
+    {"name": "Ahmad", "tirkah": 120_000_000, "heirs": [{"id": 4, "quantity": 1}, {"id": 1, "quantity": 2}]},
+    {"name": "Fatimah", "tirkah": 60_000_000, "heirs": [{"id": 3, "quantity": 1}, {"id": 16, "quantity": 3}]},
+    {"tirkah": 30_000_000, "heirs": [{"id": 18, "quantity": 1}, {"id": 2, "quantity": 1}]},
+    {"name": "Umar", "tirkah": 90_000_000, "heirs": [{"id": 6, "quantity": 1}, {"id": 7, "quantity": 2}]},
+    {"name": "Zainab", "tirkah": 10_000_000, "heirs": [{"id": 16, "quantity": 1}]},
+]
+
+
+def test_gharqa_parallel_matches_sequential(monkeypatch):
+    import asyncio
+
+    from app.core import executor as executor_module
+    from app.core.executor import CalculationExecutor
+    from app.special_cases import calculate_gharqa, calculate_gharqa_parallel
+
+    # 2 worker: 5 pewaris dikirim dalam 3 gelombang
+    executor = CalculationExecutor(kind="thread", workers=2, max_in_flight=2)
+    monkeypatch.setattr(executor_module, "_executor", executor)
+    sequential_notes, parallel_notes = [], []
+    try:
+        sequential = calculate_gharqa(GHARQA_DECEASED, sequential_notes)
+        parallel = asyncio.run(calculate_gharqa_parallel(GHARQA_DECEASED, parallel_notes))
+    finally:
+        executor.shutdown()
+
+    assert list(parallel) == list(sequential) == ["Ahmad", "Fatimah", "Pewaris 3", "Umar", "Zainab"]
+    assert {name: result.model_dump() for name, result in parallel.items()} == \
+        {name: result.model_dump() for name, result in sequential.items()}
+    assert parallel_notes == sequential_notes
+    assert executor.stats()["completed"] == len(GHARQA_DECEASED)
+
+
+# ===== Khuntsa =====
+
+def _settled(results):
+    settlement = results["penyelesaian"]
+    return [(share.heir.id, share.share_fraction) for share in settlement.shares], \
+        settlement.calculation_metadata["mauquf_saham"]
+
+
+def test_khuntsa_son_gets_the_smaller_share():
+    from app.special_cases import calculate_khuntsa
+
+    results = calculate_khuntsa(_heirs((HeirID.IBN, 1), (HeirID.BINT, 1), (HeirID.ZAWJ, 1)),
+                                2400, HeirID.IBN, [])
+
+    assert list(results) == ["laki_laki", "perempuan", "penyelesaian"]
+    # Laki-laki: ibn 2/4, bint 1/4; perempuan: dua bint 6/8 → khuntsa 3/8, bint 3/8
+    assert _settled(results) == (
+        [(HeirID.BINT, "3/8"), (HeirID.ZAWJ, "2/8"), (HeirID.IBN, "3/8")], 0
+    )
+    amounts = [share.share_amount for share in results["penyelesaian"].shares]
+    assert amounts == pytest.approx([900, 600, 900])
+    assert results["penyelesaian"].status == "Adil"
+
+
+def test_two_khuntsa_children_hold_the_difference():
+    from app.special_cases import calculate_khuntsa
+
+    results = calculate_khuntsa(_heirs((HeirID.IBN, 2), (HeirID.ZAWJ, 1)),
+                                2400, [HeirID.IBN, HeirID.IBN], [])
+
+    assert list(results) == ["laki_laki_laki_laki", "laki_laki_perempuan",
+                             "perempuan_laki_laki", "perempuan_perempuan", "penyelesaian"]
+    # Skenario L+P dan P+L sama susunannya, cukup dihitung sekali
+    assert results["laki_laki_perempuan"] is results["perempuan_laki_laki"]
+    # Setiap khuntsa minimum 2/8 (sebagai bint di skenario L+P), 2/8 ditahan
+    assert _settled(results) == (
+        [(HeirID.ZAWJ, "2/8"), (HeirID.IBN, "2/8"), (HeirID.IBN, "2/8")], 2
+    )
+    assert results["penyelesaian"].status == "Mauquf"
+    assert results["penyelesaian"].calculation_metadata["mauquf"] == pytest.approx(600)
+
+
+def test_khuntsa_over_limit_is_rejected(monkeypatch):
+    from app.config import settings
+    from app.special_cases import calculate_khuntsa
+
+    monkeypatch.setattr(settings, "KHUNTSA_MAX_HEIRS", 2)
+
+    with pytest.raises(ValueError, match="Maksimal 2"):
+        calculate_khuntsa(_heirs((HeirID.IBN, 3)), 2400, [HeirID.IBN] * 3, [])
+
+
+# ===== Haml =====
+
+HAML_HEIRS = [(HeirID.ZAWJAH, 1), (HeirID.ABB, 1), (HeirID.UMM, 1)]
+
+
+def _without_notes(result):
+    dumped = result.model_dump()
+    del dumped["notes"]
+    return dumped
+
+
+def test_haml_scenarios_match_direct_calculation():
+    from app.core.calculator import calculate_inheritance
+    from app.schemas.calculation import CalculationInput
+    from app.special_cases import calculate_haml
+    from app.special_cases.haml import haml_scenarios
+
+    results = calculate_haml(_heirs(*HAML_HEIRS), 2400, [], max_fetuses=3)
+
+    scenarios = haml_scenarios(3)
+    assert list(results) == [name for name, _, _ in scenarios] + ["mauquf"]
+    for name, boys, girls in scenarios:
+        entries = list(HAML_HEIRS)
+        if boys:
+            entries.append((HeirID.IBN, boys))
+        if girls:
+            entries.append((HeirID.BINT, girls))
+        direct = calculate_inheritance(CalculationInput(heirs=_heirs(*entries), tirkah=2400))
+        assert _without_notes(results[name]) == _without_notes(direct), name
+
+
+def test_haml_mauquf_holds_the_largest_possible_fetus_share():
+    from app.special_cases import calculate_haml
+
+    mauquf = calculate_haml(_heirs(*HAML_HEIRS), 2400, [])["mauquf"]
+
+    # Minimum: zawjah 1/8, abb 1/24 (sisa saat dua bint), umm 1/6
+    amounts = {share.heir.id: share.share_amount for share in mauquf.shares}
+    assert amounts == pytest.approx({HeirID.ZAWJAH: 300, HeirID.ABB: 100, HeirID.UMM: 400})
+    assert mauquf.calculation_metadata["mauquf"] == pytest.approx(1600)
+    assert mauquf.calculation_metadata["mauquf_fraction"] == "16/24"
+    assert mauquf.status == "Mauquf"